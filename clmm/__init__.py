@@ -8,8 +8,11 @@ from .theory import (
     compute_3d_density, compute_surface_density, compute_excess_surface_density,
     compute_critical_surface_density,compute_tangential_shear, compute_convergence,
     compute_reduced_tangential_shear, compute_magnification, compute_magnification_bias,
+    convert_mass_concentration,
     Modeling, Cosmology
 )
+from .cosmology.batch import CosmologyBatch
+from .cosmology.lcdm import LCDMCosmology
 from . import support
 
 __version__ = '1.1.7'
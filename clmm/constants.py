@@ -41,3 +41,21 @@ class Constants(Enum):
 
     Source: IAU 2015/CODATA 2018
     """
+
+    STBOLTZ = 5.670374419e-8
+    """ Stefan-Boltzmann constant (W/m^2/K^4)
+
+    Source: CODATA 2018
+    """
+
+    KBOLTZ = 1.380649e-23
+    """ Boltzmann constant (J/K)
+
+    Source: CODATA 2018
+    """
+
+    EV_IN_J = 1.602176634e-19
+    """ Electronvolt (J)
+
+    Source: CODATA 2018
+    """
@@ -0,0 +1,225 @@
+"""@file background.py
+Background of a LambdaCDM cosmology with photons and neutrinos, vectorized over sets of
+cosmological parameters
+"""
+import numpy as np
+from scipy.integrate import simpson, solve_ivp
+from scipy.interpolate import CubicSpline
+from scipy.special import zeta
+
+from ..constants import Constants as const
+
+__all__ = []
+
+# Radiation and neutrinos of the cosmologies created by the back-ends from parameters (see the
+# `_init_from_params` of the CCL cosmology): CMB temperature, effective number of neutrinos,
+# masses of the massive neutrinos (in eV) and their temperature in units of the CMB temperature
+_T_CMB = 2.7255
+_NEFF = 3.046
+_M_NU = (0.06,)
+_T_NCDM = 0.71611
+
+# critical density today divided by h^2, in kg/m^3 and in M_sun/Mpc^3 (CODATA 2018+IAU 2015)
+_RHO_CRIT_H2_MKS = 3.0*(1.0e5/(1.0e6*const.PC_TO_METER.value))**2/(8.0*np.pi*const.GNEWT.value)
+_RHO_CRIT_H2 = _RHO_CRIT_H2_MKS*(1.0e6*const.PC_TO_METER.value)**3/const.SOLAR_MASS.value
+
+# density of a black body at the CMB temperature over the critical density (times h^2)
+_OMEGA_G_H2 = 4.0*const.STBOLTZ.value/const.CLIGHT.value**3*_T_CMB**4/_RHO_CRIT_H2_MKS
+# relativistic neutrinos, the massive ones contributing to Neff with their temperature
+_T_NU_CMB = (4.0/11.0)**(1.0/3.0)
+_OMEGA_NU_REL_H2 = (_NEFF-len(_M_NU)*(_T_NCDM/_T_NU_CMB)**4)*7.0/8.0*_T_NU_CMB**4*_OMEGA_G_H2
+# massive neutrinos in the relativistic limit, and their mass over temperature today
+_OMEGA_NU_MASS_REL_H2 = 7.0/8.0*_T_NCDM**4*_OMEGA_G_H2
+_Y_NU_MASS = np.array(_M_NU)*const.EV_IN_J.value/(const.KBOLTZ.value*_T_NCDM*_T_CMB)
+
+# table of the Fermi-Dirac energy integral (built when first needed)
+_FERMI_DIRAC_TABLE = {}
+
+
+def _eval_fermi_dirac_ratio(y_vals):
+    r"""Ratio of the energy density of a massive neutrino to the density of a massless one
+    with the same temperature
+
+    .. math::
+        \frac{F(y)}{F(0)}, \qquad F(y) = \int_0^\infty \frac{x^2\sqrt{x^2+y^2}}{e^x+1}dx,
+        \qquad F(0)=\frac{7\pi^4}{120},
+
+    with :math:`y=m_\nu c^2/(k_B T_\nu)`. It is computed from a spline of :math:`\ln F` in
+    :math:`\ln y` for :math:`10^{-3}<y<10^4` (relative precision :math:`\sim10^{-9}`), and from
+    the relativistic and non-relativistic limits outside.
+
+    Parameters
+    ----------
+    y_vals : array_like
+        Mass over temperature of the neutrinos.
+
+    Returns
+    -------
+    array_like
+        Ratio of the energy densities.
+    """
+    if 'spline' not in _FERMI_DIRAC_TABLE:
+        log_y = np.linspace(np.log(1e-3), np.log(1e4), 500)
+        x_vals = np.linspace(0., 60., 6001)[:, None]
+        integrand = x_vals**2*np.sqrt(x_vals**2+np.exp(2.*log_y))/(np.exp(x_vals)+1.)
+        log_ratio = np.log(simpson(integrand, x=x_vals[:, 0], axis=0)/(7.*np.pi**4/120.))
+        _FERMI_DIRAC_TABLE['spline'] = CubicSpline(log_y, log_ratio)
+    y_vals = np.array(y_vals, dtype=float)
+    log_y = np.log(np.clip(y_vals, 1e-3, 1e4))
+    return np.where(y_vals > 1e4, 180.*zeta(3)/(7.*np.pi**4)*y_vals,
+                    np.exp(_FERMI_DIRAC_TABLE['spline'](log_y)))
+
+
+def _get_omega_nu_mass_h2(z):
+    r"""Density of the massive neutrinos over the critical density today, times :math:`h^2`,
+    as a function of the redshift (:math:`\Omega_{\nu, m}(z)H(z)^2/H_0^2\;h^2`)"""
+    one_plus_z = 1.+np.array(z, dtype=float)
+    return _OMEGA_NU_MASS_REL_H2*one_plus_z**4*sum(
+        _eval_fermi_dirac_ratio(y_nu/one_plus_z) for y_nu in _Y_NU_MASS)
+
+
+def _get_density_params(h, Omega_b0, Omega_dm0, Omega_k0):
+    r"""Density parameters today of the components of the cosmology, given its input parameters
+    (vectorized)
+
+    Parameters
+    ----------
+    h, Omega_b0, Omega_dm0, Omega_k0 : array_like
+        Dimensionless Hubble parameter, and baryon, dark matter and curvature densities.
+
+    Returns
+    -------
+    dict
+        Density parameters of the baryons and dark matter (`Omega_cb0`), massive neutrinos
+        (`Omega_nu_mass0`), all matter (`Omega_m0`), photons and relativistic neutrinos
+        (`Omega_r0`), curvature (`Omega_k0`) and dark energy (`Omega_l0`).
+    """
+    h2 = np.array(h, dtype=float)**2
+    params = {'Omega_cb0': np.add(Omega_b0, Omega_dm0, dtype=float),
+              'Omega_nu_mass0': _get_omega_nu_mass_h2(0.)/h2,
+              'Omega_r0': (_OMEGA_G_H2+_OMEGA_NU_REL_H2)/h2,
+              'Omega_k0': np.array(Omega_k0, dtype=float)}
+    params['Omega_m0'] = params['Omega_cb0']+params['Omega_nu_mass0']
+    params['Omega_l0'] = 1.-params['Omega_m0']-params['Omega_r0']-params['Omega_k0']
+    return params
+
+
+def _get_E2(z, h, params):
+    r"""Square of the normalized Hubble parameter :math:`E(z)^2=H(z)^2/H_0^2`
+
+    Parameters
+    ----------
+    z : array_like
+        Redshift, broadcastable with the parameters.
+    h : array_like
+        Dimensionless Hubble parameter.
+    params : dict
+        Density parameters (see `_get_density_params`).
+
+    Returns
+    -------
+    array_like
+        :math:`E(z)^2`.
+    """
+    one_plus_z = 1.+np.array(z, dtype=float)
+    return (params['Omega_cb0']*one_plus_z**3+_get_omega_nu_mass_h2(z)/np.square(h)
+            +params['Omega_r0']*one_plus_z**4+params['Omega_k0']*one_plus_z**2
+            +params['Omega_l0'])
+
+
+def _get_rho_m(z, h, params):
+    r"""Physical matter density (with the massive neutrinos) in :math:`M_\odot\ Mpc^{-3}`"""
+    one_plus_z = 1.+np.array(z, dtype=float)
+    return _RHO_CRIT_H2*(params['Omega_cb0']*np.square(h)*one_plus_z**3
+                         +_get_omega_nu_mass_h2(z))
+
+
+def _get_comoving_distance_spline(h, params, zmax, npts):
+    r"""Spline of the line-of-sight comoving distance in units of the Hubble distance
+    :math:`D_H=c/H_0`,
+
+    .. math::
+        \frac{\chi(z)}{D_H} = \int_0^{\ln(1+z)}\frac{e^x}{E(e^x-1)}dx,
+
+    as a function of :math:`\ln(1+z)`, computed by integrating a cubic spline of the integrand
+    on `npts` points equally spaced in :math:`\ln(1+z)` up to `zmax`.
+
+    Parameters
+    ----------
+    h : array_like
+        Dimensionless Hubble parameter of each cosmology, shape (N,) or scalar.
+    params : dict
+        Density parameters of each cosmology (see `_get_density_params`).
+    zmax : float
+        Maximum redshift of the spline.
+    npts : int
+        Number of points of the spline.
+
+    Returns
+    -------
+    PPoly
+        Comoving distances as a function of :math:`\ln(1+z)`, evaluations have the shape of
+        the parameters followed by the shape of the redshifts.
+    """
+    log1p_z = np.linspace(0., np.log1p(zmax), npts)
+    shape = np.shape(h)+(1,)
+    h = np.reshape(h, shape)
+    params = {key: np.reshape(value, shape) for key, value in params.items()}
+    integrand = np.exp(log1p_z)/np.sqrt(_get_E2(np.expm1(log1p_z), h, params))
+    return CubicSpline(log1p_z, integrand, axis=-1).antiderivative()
+
+
+def _get_transverse_distance(chi, Omega_k0):
+    r"""Transverse comoving distance :math:`S_k(\chi)` from the line-of-sight comoving distance,
+    both in units of the Hubble distance: :math:`\sinh(\sqrt{\Omega_k}\chi)/\sqrt{\Omega_k}` for
+    :math:`\Omega_k>0`, :math:`\sin(\sqrt{-\Omega_k}\chi)/\sqrt{-\Omega_k}` for
+    :math:`\Omega_k<0` and :math:`\chi` for a flat universe (vectorized, `Omega_k0` must be
+    broadcastable with `chi`)."""
+    Omega_k0 = np.array(Omega_k0, dtype=float)
+    sqrt_ok = np.sqrt(np.abs(Omega_k0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(Omega_k0 > 0., np.sinh(sqrt_ok*chi)/sqrt_ok,
+                        np.where(Omega_k0 < 0., np.sin(sqrt_ok*chi)/sqrt_ok, chi))
+
+
+def _get_growth_factor_spline(h, params, amin=1.0e-3, npts=500):
+    r"""Spline of the logarithm of the linear growth factor :math:`D(a)`, normalized to
+    :math:`D(1)=1`, as a function of :math:`\ln a` for :math:`a_{min}<a<1`. It is the growing
+    solution of
+
+    .. math::
+        D''+\left(2+\frac{1}{2}\frac{d\ln E^2}{d\ln a}\right)D'
+        -\frac{3}{2}\Omega_m(a)D = 0,
+
+    with derivatives in :math:`\ln a` and the matter (including massive neutrinos) density
+    :math:`\Omega_m(a)`, started with :math:`D=D'=a_{min}`.
+
+    Parameters
+    ----------
+    h : float
+        Dimensionless Hubble parameter.
+    params : dict
+        Density parameters (see `_get_density_params`).
+    amin : float, optional
+        Minimum scale factor.
+    npts : int, optional
+        Number of points of the spline.
+
+    Returns
+    -------
+    CubicSpline
+        :math:`\ln D` as a function of :math:`\ln a`.
+    """
+    log_a = np.linspace(np.log(amin), 0., npts)
+    z_vals = np.expm1(-log_a)
+    log_e2 = CubicSpline(log_a, np.log(_get_E2(z_vals, h, params)))
+    omega_m = CubicSpline(log_a, (params['Omega_cb0']*(1.+z_vals)**3
+                                  +_get_omega_nu_mass_h2(z_vals)/h**2)
+                          /_get_E2(z_vals, h, params))
+
+    def derivatives(log_a_, growth):
+        return [growth[1],
+                -(2.+0.5*log_e2(log_a_, 1))*growth[1]+1.5*omega_m(log_a_)*growth[0]]
+    growth = solve_ivp(derivatives, (log_a[0], 0.), [amin, amin], t_eval=log_a,
+                       rtol=1.0e-10, atol=1.0e-14*amin).y[0]
+    return CubicSpline(log_a, np.log(growth/growth[-1]))
@@ -0,0 +1,262 @@
+"""@file batch.py
+Set of LambdaCDM cosmologies evaluated together
+"""
+import numpy as np
+
+from ..utils import validate_argument
+from ..constants import Constants as const
+from .parent_class import _SIGMA_CRIT_CONSTANT
+from .background import (
+    _get_density_params, _get_rho_m, _get_comoving_distance_spline, _get_transverse_distance)
+
+__all__ = ['CosmologyBatch']
+
+_BATCH_PARAMS = ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')
+
+
+class CosmologyBatch:
+    r"""
+    Set of N LambdaCDM cosmologies (flat or curved), e.g. samples of the cosmological parameters,
+    whose distances, critical surface densities and matter densities are computed for all of
+    them at once, as arrays of shape (N,) followed by the shape of the redshifts.
+
+    The background includes the photons and neutrinos of the cosmologies created from
+    parameters by the back-ends (:math:`T_{CMB}=2.7255`, :math:`N_{eff}=3.046`, one massive
+    neutrino of 0.06 eV, see `clmm.cosmology.background`), and agrees with CCL to
+    :math:`\sim10^{-7}`. The cosmology objects of the back-end are only created when a
+    back-end-specific quantity is needed (e.g. `eval_linear_matter_powerspectrum` or
+    `get_cosmo`).
+
+    Attributes
+    ----------
+    H0, Omega_b0, Omega_dm0, Omega_k0: numpy.ndarray
+        Parameters of each cosmology, see `CLMMCosmology.init_from_params`.
+    cosmo_class: type
+        Class of the back-end cosmologies (`clmm.Cosmology` if None)
+    validate_input: bool
+        Validade each input argument
+    distance_zmax: float
+        Maximum redshift of the comoving distance spline, the back-end cosmologies are used
+        for higher redshifts
+    distance_npts: int
+        Number of points of the comoving distance spline
+    """
+
+    def __init__(self, H0=67.66, Omega_b0=0.049, Omega_dm0=0.262, Omega_k0=0.0,
+                 cosmo_class=None, validate_input=True):
+        self.validate_input = validate_input
+        if self.validate_input:
+            validate_argument(locals(), 'H0', 'float_array', argmin=0)
+            validate_argument(locals(), 'Omega_b0', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'Omega_dm0', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'Omega_k0', 'float_array', argmin=0, eqmin=True)
+        params = np.broadcast_arrays(*(np.atleast_1d(np.array(value, dtype=float))
+                                       for value in (H0, Omega_b0, Omega_dm0, Omega_k0)))
+        if params[0].ndim != 1:
+            raise ValueError("The parameters must be scalars or one-dimensional arrays")
+        for name, value in zip(_BATCH_PARAMS, params):
+            value.flags.writeable = False
+            setattr(self, name, value)
+        self.cosmo_class = cosmo_class
+        self.distance_zmax = 1100.
+        self.distance_npts = 2000
+        self._density_params = _get_density_params(
+            self.H0/100., self.Omega_b0, self.Omega_dm0, self.Omega_k0)
+        self._distance_spline = None
+        self._cosmologies = [None]*len(self)
+
+    def __len__(self):
+        return self.H0.size
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            raise TypeError(f'input must be str, not {type(key)}')
+        if key in _BATCH_PARAMS:
+            return getattr(self, key)
+        if key == 'h':
+            return self.H0/100.
+        if key == 'Omega_m0':
+            return self._density_params['Omega_m0']
+        raise ValueError(f"Unsupported parameter {key}")
+
+    def get_cosmo(self, index):
+        """Gets the back-end cosmology of one set of parameters, created when first needed
+        (with `CLMMCosmology.interned`, so that identical cosmologies are shared).
+
+        Parameters
+        ----------
+        index : int
+            Index of the set of parameters.
+
+        Returns
+        -------
+        CLMMCosmology
+            Cosmology object.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'index', int, argmin=-len(self), eqmin=True,
+                              argmax=len(self))
+        index = index % len(self)
+        if self._cosmologies[index] is None:
+            cosmo_class = self.cosmo_class
+            if cosmo_class is None:
+                # pylint: disable=import-outside-toplevel
+                from ..theory import Cosmology as cosmo_class
+            self._cosmologies[index] = cosmo_class.interned(
+                **{name: float(getattr(self, name)[index]) for name in _BATCH_PARAMS},
+                validate_input=self.validate_input)
+        return self._cosmologies[index]
+
+    def _get_param_column(self, value, ndim):
+        """Reshapes an array of parameters to broadcast with redshift arrays of ndim dimensions"""
+        return np.reshape(value, (len(self),)+(1,)*ndim)
+
+    def get_rho_m(self, z):
+        r"""Gets the physical matter density of all cosmologies.
+
+        Parameters
+        ----------
+        z : array_like, float
+            Redshift(s).
+
+        Returns
+        -------
+        numpy.ndarray
+            Matter density in :math:`M_\odot\ Mpc^{-3}`, with shape (N,)+shape(z).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'z', 'float_array', argmin=0, eqmin=True)
+        return self._get_rho_m(z)
+
+    def _get_rho_m(self, z):
+        z = np.array(z, dtype=float)
+        params = {key: self._get_param_column(value, z.ndim)
+                  for key, value in self._density_params.items()}
+        return _get_rho_m(z, self._get_param_column(self['h'], z.ndim), params)
+
+    def _get_distance_spline(self):
+        r"""Spline of the line-of-sight comoving distances of all cosmologies in units of the
+        Hubble distance :math:`c/H_0`, as a function of :math:`\ln(1+z)` (see
+        `clmm.cosmology.background._get_comoving_distance_spline`). Built on first use and when
+        `distance_zmax` or `distance_npts` change."""
+        key = (self.distance_zmax, self.distance_npts)
+        if self._distance_spline is None or self._distance_spline[0] != key:
+            self._distance_spline = (key, _get_comoving_distance_spline(
+                self['h'], self._density_params, self.distance_zmax, self.distance_npts))
+        return self._distance_spline[1]
+
+    def _eval_transverse_distance(self, z1, z2):
+        r"""Transverse comoving distance between z1 and z2 (broadcasted) in :math:`M\!pc`, with
+        shape (N,)+shape(z1, z2)"""
+        z1, z2 = np.broadcast_arrays(np.array(z1, dtype=float), np.array(z2, dtype=float))
+        if max(np.max(z1, initial=0.), np.max(z2, initial=0.)) > self.distance_zmax:
+            return np.array([self.get_cosmo(index)._eval_da_z1z2(z1[()], z2[()])
+                             for index in range(len(self))])*(1.+z2)
+        chi_spline = self._get_distance_spline()
+        hubble_dist = self._get_param_column(const.CLIGHT_KMS.value/self.H0, z1.ndim)
+        return hubble_dist*_get_transverse_distance(
+            chi_spline(np.log1p(z2))-chi_spline(np.log1p(z1)),
+            self._get_param_column(self.Omega_k0, z1.ndim))
+
+    def eval_da_z1z2(self, z1, z2):
+        r"""Computes the angular diameter distance between z1 and z2 for all cosmologies.
+
+        .. math::
+            d_a(z1, z2) = \frac{1}{1+z2}S_k\left(\frac{c}{H_0}\int_{z1}^{z2}\frac{dz'}{E(z')}
+            \right)
+
+        Parameters
+        ----------
+        z1 : array_like, float
+            Redshift(s).
+        z2 : array_like, float
+            Redshift(s), broadcastable with z1.
+
+        Returns
+        -------
+        numpy.ndarray
+            Angular diameter distance in units :math:`M\!pc`, with shape (N,)+shape(z1, z2).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'z1', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'z2', 'float_array', argmin=0, eqmin=True)
+        return self._eval_da_z1z2(z1, z2)
+
+    def _eval_da_z1z2(self, z1, z2):
+        return self._eval_transverse_distance(z1, z2)/(1.+np.array(z2, dtype=float))
+
+    def eval_da(self, z):
+        r"""Computes the angular diameter distance between 0.0 and z for all cosmologies.
+
+        Parameters
+        ----------
+        z : array_like, float
+            Redshift(s).
+
+        Returns
+        -------
+        numpy.ndarray
+            Angular diameter distance in units :math:`M\!pc`, with shape (N,)+shape(z).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'z', 'float_array', argmin=0, eqmin=True)
+        return self._eval_da_z1z2(np.zeros(np.shape(z)), z)
+
+    def eval_sigma_crit(self, z_len, z_src):
+        r"""Computes the critical surface density for all cosmologies
+
+        .. math::
+            \Sigma_{crit} = \frac{c^2}{4\pi G}\frac{D_S}{D_LD_{LS}},
+
+        infinite for sources in front of the lens.
+
+        Parameters
+        ----------
+        z_len : array_like, float
+            Lens redshift(s)
+        z_src : array_like, float
+            Background source galaxy redshift(s), broadcastable with z_len.
+
+        Returns
+        -------
+        numpy.ndarray
+            Critical surface density in units of :math:`M_\odot\ Mpc^{-2}`, with shape
+            (N,)+shape(z_len, z_src).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'z_len', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+        return self._eval_sigma_crit(z_len, z_src)
+
+    def _eval_sigma_crit(self, z_len, z_src):
+        z_len, z_src = np.broadcast_arrays(np.array(z_len, dtype=float),
+                                           np.array(z_src, dtype=float))
+        # the (1+z) factors of the angular diameter distances cancel out
+        d_l, d_s, d_ls = self._eval_transverse_distance(
+            np.array([np.zeros(z_len.shape), np.zeros(z_len.shape), z_len]),
+            np.array([z_len, z_src, z_src])).swapaxes(0, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(z_src > z_len, _SIGMA_CRIT_CONSTANT*d_s*(1.+z_len)/(d_l*d_ls),
+                            np.inf)
+
+    def eval_linear_matter_powerspectrum(self, k_vals, redshift):
+        r"""Computes the linear matter power spectrum of all cosmologies with their back-end
+        cosmology objects
+
+        Parameters
+        ----------
+        k_vals : array_like, float
+            Wavenumber k [math:`Mpc^{-1}`] values to compute the power spectrum.
+        redshift : float
+            Redshift to get the power spectrum.
+
+        Returns
+        -------
+        numpy.ndarray
+            Linear matter spectrum in units of math:`Mpc^{3}`, with shape (N,)+shape(k_vals).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'k_vals', 'float_array', argmin=0)
+            validate_argument(locals(), 'redshift', float, argmin=0, eqmin=True)
+        return np.array([self.get_cosmo(index)._eval_linear_matter_powerspectrum_cached(
+            k_vals, redshift) for index in range(len(self))])
@@ -24,6 +24,7 @@ class CCLCosmology(CLMMCosmology):
     be_cosmo: cosmology library
         Cosmology library used in the back-end
     """
+    _has_be_powerspectrum = True
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
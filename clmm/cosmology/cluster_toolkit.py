@@ -3,13 +3,13 @@ Cosmology using AstroPy (for cluster_toolkit)
 """
 import warnings
 import numpy as np
+from scipy.interpolate import CubicSpline
 
 from astropy import units
 from astropy.cosmology import LambdaCDM, FlatLambdaCDM
 
-from .. constants import Constants as const
-
-from .parent_class import CLMMCosmology
+from .parent_class import CLMMCosmology, _SIGMA_CRIT_CONSTANT
+from .background import _get_transverse_distance
 
 __all__ = []
 
@@ -82,19 +82,42 @@ class AstroPyCosmology(CLMMCosmology):
     def _eval_da_z1z2(self, z1, z2):
         return self.be_cosmo.angular_diameter_distance_z1z2(z1, z2).to_value(units.Mpc)
 
+    def _eval_comoving_distance(self, z):
+        r"""Computes the line-of-sight comoving distance in :math:`M\!pc` without units.
+
+        Below `distance_spline_zmax`, it is computed from the antiderivative of a cubic spline of
+        :math:`(1+z)/E(z)` in :math:`\ln(1+z)` on `distance_spline_npts` points, built once per
+        cosmology (and values of these settings) from the vectorized `inv_efunc` of AstroPy
+        (relative precision :math:`\sim10^{-9}`), instead of one numerical integration per
+        redshift.
+        """
+        z = np.array(z, dtype=float)
+        if np.max(z, initial=0.) > self.distance_spline_zmax:
+            return self.be_cosmo.comoving_distance(z).to_value(units.Mpc)
+        cache = self._get_cache()
+        key = ('comoving_distance', self.distance_spline_zmax, self.distance_spline_npts)
+        if key not in cache:
+            log1p_z = np.linspace(0., np.log1p(self.distance_spline_zmax),
+                                  self.distance_spline_npts)
+            integrand = np.exp(log1p_z)*self.be_cosmo.inv_efunc(np.expm1(log1p_z))
+            cache[key] = CubicSpline(log1p_z, integrand).antiderivative()
+        return self.be_cosmo.hubble_distance.to_value(units.Mpc)*cache[key](np.log1p(z))
+
     def _eval_sigma_crit(self, z_len, z_src):
-        if np.any(np.array(z_src) <= z_len):
+        z_len, z_src = np.array(z_len, dtype=float), np.array(z_src, dtype=float)
+        back = z_src > z_len
+        if not np.all(back):
             warnings.warn(
                 'Some source redshifts are lower than the cluster redshift. '
                 'Returning Sigma_crit = np.inf for those galaxies.')
-        # Constants
-        clight_pc_s = const.CLIGHT_KMS.value*1000./const.PC_TO_METER.value
-        gnewt_pc3_msun_s2 = const.GNEWT.value * \
-            const.SOLAR_MASS.value/const.PC_TO_METER.value**3
-
-        d_l = self.eval_da_z1z2(0, z_len)
-        d_s = self.eval_da_z1z2(0, z_src)
-        d_ls = self.eval_da_z1z2(z_len, z_src)
-
-        beta_s = np.maximum(0., d_ls/d_s)
-        return clight_pc_s**2/(4.0*np.pi*gnewt_pc3_msun_s2)*1/d_l*np.divide(1., beta_s)*1.0e6
+        # transverse comoving distances, the (1+z) factors of the angular diameter distances
+        # cancel out
+        hubble_dist = self.be_cosmo.hubble_distance.to_value(units.Mpc)
+        chi_len = self._eval_comoving_distance(z_len)/hubble_dist
+        chi_src = self._eval_comoving_distance(z_src)/hubble_dist
+        d_l, d_s, d_ls = (_get_transverse_distance(chi, self.be_cosmo.Ok0)
+                          for chi in (chi_len, chi_src, chi_src-chi_len))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = np.where(back, _SIGMA_CRIT_CONSTANT*d_s*(1.+z_len)/(d_l*d_ls*hubble_dist),
+                           np.inf)
+        return res if res.ndim > 0 else float(res)
@@ -0,0 +1,92 @@
+"""@file eisenstein_hu.py
+Linear matter power spectrum of Eisenstein & Hu (1998)
+"""
+import numpy as np
+from scipy.integrate import simpson
+
+from .background import _T_CMB
+
+__all__ = []
+
+# Primordial power spectrum of the cosmologies created by the back-ends from parameters (see
+# the `_init_from_params` of the CCL cosmology)
+_SIGMA8 = 0.8
+_N_S = 0.96
+
+
+def _eval_transfer_function(k_vals, h, Omega_b0, Omega_m0):
+    r"""Transfer function of Eisenstein & Hu (1998), with the baryon acoustic oscillations
+    (vectorized in the wavenumbers).
+
+    Parameters
+    ----------
+    k_vals : array_like
+        Wavenumbers in :math:`Mpc^{-1}`.
+    h : float
+        Dimensionless Hubble parameter.
+    Omega_b0, Omega_m0 : float
+        Baryon and total matter densities today.
+
+    Returns
+    -------
+    array_like
+        Transfer function.
+    """
+    # pylint: disable=too-many-locals
+    k_vals = np.array(k_vals, dtype=float)
+    theta = _T_CMB/2.7
+    omega_m, omega_b = Omega_m0*h**2, Omega_b0*h**2
+    f_b = Omega_b0/Omega_m0
+    f_c = 1.-f_b
+    # matter-radiation equality and drag epoch, eqs. (2-4)
+    z_eq = 2.5e4*omega_m*theta**-4
+    k_eq = 7.46e-2*omega_m*theta**-2
+    b_1 = 0.313*omega_m**-0.419*(1.+0.607*omega_m**0.674)
+    b_2 = 0.238*omega_m**0.223
+    z_d = 1291.*omega_m**0.251/(1.+0.659*omega_m**0.828)*(1.+b_1*omega_b**b_2)
+    # sound horizon and Silk damping scale, eqs. (5-7)
+    r_d, r_eq = 31.5*omega_b*theta**-4*1.0e3/z_d, 31.5*omega_b*theta**-4*1.0e3/z_eq
+    s_d = (2./(3.*k_eq)*np.sqrt(6./r_eq)
+           *np.log((np.sqrt(1.+r_d)+np.sqrt(r_d+r_eq))/(1.+np.sqrt(r_eq))))
+    k_silk = 1.6*omega_b**0.52*omega_m**0.73*(1.+(10.4*omega_m)**-0.95)
+    q_vals = k_vals/(13.41*k_eq)
+    ks_vals = k_vals*s_d
+
+    def transfer_0(alpha, beta):
+        # eqs. (19-20)
+        log_q = np.log(np.e+1.8*beta*q_vals)
+        return log_q/(log_q+(14.2/alpha+386./(1.+69.9*q_vals**1.08))*q_vals**2)
+
+    # cold dark matter, eqs. (11-12, 17-18)
+    a_1 = (46.9*omega_m)**0.670*(1.+(32.1*omega_m)**-0.532)
+    a_2 = (12.0*omega_m)**0.424*(1.+(45.0*omega_m)**-0.582)
+    alpha_c = a_1**-f_b*a_2**-f_b**3
+    b_1 = 0.944/(1.+(458.*omega_m)**-0.708)
+    b_2 = (0.395*omega_m)**-0.0266
+    beta_c = 1./(1.+b_1*(f_c**b_2-1.))
+    f_vals = 1./(1.+(ks_vals/5.4)**4)
+    transfer_c = f_vals*transfer_0(1., beta_c)+(1.-f_vals)*transfer_0(alpha_c, beta_c)
+    # baryons, eqs. (14-15, 21-24)
+    y_d = (1.+z_eq)/(1.+z_d)
+    g_y = y_d*(-6.*np.sqrt(1.+y_d)
+               +(2.+3.*y_d)*np.log((np.sqrt(1.+y_d)+1.)/(np.sqrt(1.+y_d)-1.)))
+    alpha_b = 2.07*k_eq*s_d*(1.+r_d)**-0.75*g_y
+    beta_b = 0.5+f_b+(3.-2.*f_b)*np.sqrt((17.2*omega_m)**2+1.)
+    s_tilde = s_d/(1.+(8.41*omega_m**0.435/ks_vals)**3)**(1./3.)
+    transfer_b = ((transfer_0(1., 1.)/(1.+(ks_vals/5.2)**2)
+                   +alpha_b/(1.+(beta_b/ks_vals)**3)*np.exp(-(k_vals/k_silk)**1.4))
+                  *np.sinc(k_vals*s_tilde/np.pi))
+    return f_b*transfer_b+f_c*transfer_c
+
+
+def _get_amplitude(h, Omega_b0, Omega_m0, sigma8=_SIGMA8, n_s=_N_S):
+    r"""Amplitude :math:`A` of the linear matter power spectrum today,
+    :math:`P(k)=Ak^{n_s}T(k)^2`, normalized to :math:`\sigma_8` (top-hat filter of radius
+    :math:`8\;h^{-1}Mpc`)"""
+    log_k = np.linspace(np.log(1.0e-5), np.log(1.0e3), 4000)
+    k_vals = np.exp(log_k)
+    x_vals = k_vals*8./h
+    window = 3.*(np.sin(x_vals)-x_vals*np.cos(x_vals))/x_vals**3
+    sigma2 = simpson(k_vals**(3.+n_s)*_eval_transfer_function(k_vals, h, Omega_b0, Omega_m0)**2
+                     *window**2/(2.*np.pi**2), x=log_k)
+    return sigma8**2/sigma2
@@ -0,0 +1,127 @@
+"""@file lcdm.py
+LambdaCDM cosmology computed with NumPy only
+"""
+import numpy as np
+
+from ..constants import Constants as const
+from .parent_class import CLMMCosmology, _SIGMA_CRIT_CONSTANT
+from .background import (
+    _get_density_params, _get_E2, _get_rho_m, _get_omega_nu_mass_h2,
+    _get_comoving_distance_spline, _get_transverse_distance)
+
+__all__ = ['LCDMCosmology']
+
+_LCDM_PARAMS = ('H0', 'Omega_b0', 'Omega_dm0', 'Omega_k0')
+
+
+class LCDMCosmology(CLMMCosmology):
+    r"""
+    LambdaCDM cosmology (flat or curved) without external dependencies
+
+    The background includes the photons and neutrinos of the CCL cosmology created from
+    parameters (:math:`T_{CMB}=2.7255`, :math:`N_{eff}=3.046`, one massive neutrino of 0.06 eV,
+    see `clmm.cosmology.background`). The comoving distances are computed by cumulative
+    quadrature of a cubic spline of :math:`1/E(z)` in :math:`\ln(1+z)`, and agree with CCL
+    to :math:`\sim10^{-7}`. This table has `distance_spline_npts` points up to
+    `distance_spline_zmax` (extended to higher redshifts when they are requested), and is
+    used both with and without `use_distance_spline`. The parameters can be changed with
+    ``cosmo[key] = value``.
+
+    Attributes
+    ----------
+    backend: str
+        Name of back-end used
+    be_cosmo: dict
+        Parameters of the cosmology (`H0`, `Omega_b0`, `Omega_dm0`, `Omega_k0`)
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        # this tag will be used to check if the cosmology object is accepted by the modeling
+        self.backend = 'lcdm'
+
+    def _init_from_cosmo(self, be_cosmo):
+
+        assert isinstance(be_cosmo, dict)
+        assert set(be_cosmo) == set(_LCDM_PARAMS)
+        self.be_cosmo = {key: float(be_cosmo[key]) for key in _LCDM_PARAMS}
+
+    def _init_from_params(self, H0, Omega_b0, Omega_dm0, Omega_k0):
+
+        self.be_cosmo = {'H0': float(H0), 'Omega_b0': float(Omega_b0),
+                         'Omega_dm0': float(Omega_dm0), 'Omega_k0': float(Omega_k0)}
+
+    def _set_param(self, key, value):
+        if key in _LCDM_PARAMS:
+            self.be_cosmo[key] = float(value)
+        elif key == 'h':
+            self.be_cosmo['H0'] = float(value)*100.0
+        else:
+            raise ValueError(f"Unsupported parameter {key}")
+
+    def _get_param(self, key):
+        if key in _LCDM_PARAMS:
+            value = self.be_cosmo[key]
+        elif key == 'h':
+            value = self.be_cosmo['H0']/100.0
+        elif key == "Omega_m0":
+            value = float(self._get_density_params()['Omega_m0'])
+        else:
+            raise ValueError(f"Unsupported parameter {key}")
+        return value
+
+    def _get_density_params(self):
+        r"""Density parameters today of all the components (see
+        `clmm.cosmology.background._get_density_params`), recomputed when the parameters
+        change"""
+        cache = self._get_cache()
+        if 'density_params' not in cache:
+            cache['density_params'] = _get_density_params(
+                self['h'], self['Omega_b0'], self['Omega_dm0'], self['Omega_k0'])
+        return cache['density_params']
+
+    def _get_Omega_m(self, z):
+        return self._get_E2Omega_m(z)/_get_E2(z, self['h'], self._get_density_params())
+
+    def _get_E2Omega_m(self, z):
+        one_plus_z = 1.+np.array(z, dtype=float)
+        return (self._get_density_params()['Omega_cb0']*one_plus_z**3
+                +_get_omega_nu_mass_h2(z)/self['h']**2)
+
+    def _get_rho_m(self, z):
+        # total matter density in physical units [Msun/Mpc3]
+        return _get_rho_m(z, self['h'], self._get_density_params())
+
+    def _get_comoving_distance_spline(self, zmax):
+        r"""Spline of the line-of-sight comoving distance in units of the Hubble distance as a
+        function of :math:`\ln(1+z)`, built with `distance_spline_npts` points up to
+        `distance_spline_zmax` (or zmax if higher)"""
+        cache = self._get_cache()
+        key = ('comoving_distance', self.distance_spline_npts)
+        zmax = max(zmax, self.distance_spline_zmax)
+        if key not in cache or cache[key][0] < zmax:
+            cache[key] = (zmax, _get_comoving_distance_spline(
+                self['h'], self._get_density_params(), zmax, self.distance_spline_npts))
+        return cache[key][1]
+
+    def _eval_transverse_distance(self, z1, z2):
+        r"""Transverse comoving distance between z1 and z2 in :math:`M\!pc`"""
+        z1, z2 = np.array(z1, dtype=float), np.array(z2, dtype=float)
+        chi_spline = self._get_comoving_distance_spline(max(np.max(z1), np.max(z2)))
+        return const.CLIGHT_KMS.value/self['H0']*_get_transverse_distance(
+            chi_spline(np.log1p(z2))-chi_spline(np.log1p(z1)), self['Omega_k0'])
+
+    def _eval_da_z1z2(self, z1, z2):
+        res = self._eval_transverse_distance(z1, z2)/(1.+np.array(z2, dtype=float))
+        return res if res.ndim > 0 else float(res)
+
+    def _eval_sigma_crit(self, z_len, z_src):
+        z_len, z_src = np.array(z_len, dtype=float), np.array(z_src, dtype=float)
+        # the (1+z) factors of the angular diameter distances cancel out
+        d_l = self._eval_transverse_distance(0., z_len)
+        d_s = self._eval_transverse_distance(0., z_src)
+        d_ls = self._eval_transverse_distance(z_len, z_src)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = np.where(z_src > z_len, _SIGMA_CRIT_CONSTANT*d_s*(1.+z_len)/(d_l*d_ls), np.inf)
+        return res if res.ndim > 0 else float(res)
@@ -13,6 +13,10 @@ from .parent_class import CLMMCosmology
 
 __all__ = []
 
+# Above this number of distinct redshift pairs with a single lens redshift, distances are
+# computed from the distance spline instead of one NumCosmo call per pair
+_MAX_DISTANCE_CALLS = 1000
+
 
 class NumCosmoCosmology(CLMMCosmology):
     """
@@ -25,10 +29,17 @@ class NumCosmoCosmology(CLMMCosmology):
     be_cosmo: cosmology library
         Cosmology library used in the back-end
     """
+    # the parameters can be changed directly in NumCosmo (e.g. in a mass set)
+    _mutable_be_cosmo = True
+    _has_be_powerspectrum = True
 
     def __init__(self, dist=None, dist_zmax=15.0, **kwargs):
 
         self.dist = None
+        self.ps = None
+        self.smd = None
+        self._prepared_version = None
+        self._model_ctrls = {}
 
         super().__init__(**kwargs)
 
@@ -99,12 +110,38 @@ class NumCosmoCosmology(CLMMCosmology):
             raise ValueError(f"Unsupported parameter {key}")
         return value
 
+    def _be_cosmo_changed(self):
+        # the NcmModelCtrl objects follow the update counters of the models (updated by
+        # NumCosmo for every change of their parameters), instead of reading all parameters
+        changed = False
+        for name, model in (('cosmo', self.be_cosmo), ('prim', self.be_cosmo.prim),
+                            ('reion', self.be_cosmo.reion)):
+            if model is not None:
+                if name not in self._model_ctrls:
+                    self._model_ctrls[name] = Ncm.ModelCtrl.new(None)
+                changed = self._model_ctrls[name].update(model) or changed
+        return changed
+
     def set_dist(self, dist):
-        r"""Sets distance functions (NumCosmo internal use)
+        r"""Sets distance functions (NumCosmo internal use), the distance spline is limited to
+        their maximum redshift
         """
         assert isinstance(dist, Nc.Distance)
         self.dist = dist
+        self.distance_spline_zmax = min(self.distance_spline_zmax, dist.props.zf)
         self.dist.prepare_if_needed(self.be_cosmo)
+        self._prepared_version = self._get_version()
+
+    def _prepare_if_needed(self):
+        r"""Prepares the distance and surface mass density objects if the parameters changed
+        since they were last prepared (NumCosmo internal use)
+        """
+        version = self._get_version()
+        if version != self._prepared_version:
+            self.dist.prepare_if_needed(self.be_cosmo)
+            if self.smd is not None:
+                self.smd.prepare_if_needed(self.be_cosmo)
+            self._prepared_version = version
 
     def _get_Omega_m(self, z):
 
@@ -122,23 +159,64 @@ class NumCosmoCosmology(CLMMCosmology):
         return rho_m
 
     def _eval_da_z1z2(self, z1, z2):
-
-        return np.vectorize(self.dist.angular_diameter_z1_z2)(
-            self.be_cosmo, z1, z2)*self.be_cosmo.RH_Mpc()
+        r"""Computes the angular diameter distance between z1 and z2 with NumCosmo, with one
+        call per distinct redshift pair. For more than `_MAX_DISTANCE_CALLS` pairs with a single
+        z1>0 (e.g. a lens and its sources) and within `distance_spline_zmax`, the distance spline
+        is used instead (built once per cosmology from `distance_spline_npts` NumCosmo calls)."""
+        self._prepare_if_needed()
+        z1, z2 = np.broadcast_arrays(np.array(z1, dtype=float), np.array(z2, dtype=float))
+        z_pairs, index = np.unique(np.array([z1.ravel(), z2.ravel()]), axis=1, return_inverse=True)
+        if self._use_spline_for_pairs(z_pairs):
+            return self._eval_da_z1z2_spline(z1, z2)
+        res = np.array([self.dist.angular_diameter_z1_z2(self.be_cosmo, z1_, z2_)
+                        for z1_, z2_ in z_pairs.T])
+        return res[index].reshape(z1.shape)*self.be_cosmo.RH_Mpc()
 
     def _eval_sigma_crit(self, z_len, z_src):
+        r"""Computes the critical surface density with NumCosmo, with one call per distinct
+        (lens, source) redshift pair. For more than `_MAX_DISTANCE_CALLS` sources of a single
+        lens within `distance_spline_zmax`, it is computed from the distance spline instead,
+        normalized by the NumCosmo value of the most distant source."""
+        self._prepare_if_needed()
+        z_len, z_src = np.broadcast_arrays(np.array(z_len, dtype=float),
+                                           np.array(z_src, dtype=float))
+        z_pairs, index = np.unique(np.array([z_len.ravel(), z_src.ravel()]), axis=1,
+                                   return_inverse=True)
+        if self._use_spline_for_pairs(z_pairs) and z_pairs[1, -1] > z_pairs[0, -1]:
+            # the normalization makes the constants consistent with NumCosmo
+            z_len_, z_src_ = z_pairs[:, -1]
+            norm = (self.smd.sigma_critical(self.be_cosmo, z_src_, z_len_, z_len_)
+                    /self._eval_sigma_crit_spline(z_len_, z_src_))
+            return self._eval_sigma_crit_spline(z_len, z_src)*norm
+        res = np.array([self.smd.sigma_critical(self.be_cosmo, z_src_, z_len_, z_len_)
+                        for z_len_, z_src_ in z_pairs.T])
+        return res[index].reshape(z_src.shape)
+
+    def _use_spline_for_pairs(self, z_pairs):
+        r"""Checks if the distances of the unique redshift pairs (first redshifts in the first
+        row) should be computed from the distance spline (NumCosmo internal use). The first
+        redshift must be positive, so that the spline itself is built with NumCosmo calls."""
+        return (z_pairs.shape[1] > _MAX_DISTANCE_CALLS
+                and z_pairs[0, 0] == z_pairs[0, -1] > 0.
+                and z_pairs[1, -1] <= self.distance_spline_zmax)
 
-        self.smd.prepare_if_needed(self.be_cosmo)
+    def _eval_linear_matter_powerspectrum(self, k_vals, redshift):
 
-        func = lambda z_len, z_src: self.smd.sigma_critical(
-            self.be_cosmo, z_src, z_len, z_len)
-        return np.vectorize(func)(z_len, z_src)
+        if self.ps is None:
+            self._init_linear_matter_powerspectrum()
+        self.ps.prepare_if_needed(self.be_cosmo)
 
-    def _eval_linear_matter_powerspectrum(self, k_vals, redshift):
+        k_vec = Ncm.Vector.new_array(np.atleast_1d(k_vals).astype(float))
+        pk_vec = Ncm.Vector.new(k_vec.len())
+        self.ps.eval_vec(self.be_cosmo, redshift, k_vec, pk_vec)
+        return np.array(pk_vec.dup_array())
 
+    def _init_linear_matter_powerspectrum(self):
+        r"""Creates the linear matter power spectrum object (NumCosmo internal use)
+        """
         # Using the EH transfer function as this is the 
         # default for the CCL backend as well
-        ps = Nc.PowspecMLTransfer.new (Nc.TransferFuncEH.new()) 
+        self.ps = Nc.PowspecMLTransfer.new (Nc.TransferFuncEH.new()) 
 
         # Instead, computing the PS from the CLASS backend of Numcosmo
         # ps  = Nc.PowspecMLCBE.new ()
@@ -153,13 +231,6 @@ class NumCosmoCosmology(CLMMCosmology):
             # The default CLMM cosmology has ns=0.96 and sigma8=0.8
             # Need to adapt the NC cosmology accordingly
             self.be_cosmo.prim.props.n_SA = 0.96
-            psf = Ncm.PowspecFilter.new (ps, Ncm.PowspecFilterType.TOPHAT)
+            psf = Ncm.PowspecFilter.new (self.ps, Ncm.PowspecFilterType.TOPHAT)
             old_amplitude = np.exp (self.be_cosmo.prim.props.ln10e10ASA)
             self.be_cosmo.prim.props.ln10e10ASA = np.log ((0.8 / self.be_cosmo.sigma8(psf))**2 * old_amplitude)
-
-        ps.prepare (self.be_cosmo)
-        
-        res = []
-        for k in k_vals:
-            res.append(ps.eval (self.be_cosmo, redshift, k))
-        return res
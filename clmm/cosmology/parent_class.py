@@ -1,9 +1,28 @@
 """@file parent_class.py
 """
 # CLMM Cosmology object abstract superclass
+import uuid
+import weakref
 import numpy as np
+from scipy.interpolate import CubicSpline
 from ..utils import validate_argument
 from ..constants import Constants as const
+from .background import _get_density_params, _get_growth_factor_spline
+from .eisenstein_hu import _eval_transfer_function, _get_amplitude, _N_S
+
+# c^2/(4 pi G) in M_sun/Mpc
+_SIGMA_CRIT_CONSTANT = ((const.CLIGHT_KMS.value*1000./const.PC_TO_METER.value)**2
+                        /(4.0*np.pi*const.GNEWT.value*const.SOLAR_MASS.value
+                          /const.PC_TO_METER.value**3)*1.0e6)
+
+# Composite Gauss-Legendre quadrature of the source redshift distributions in
+# eval_beta_s_moments: number of panels and of nodes per panel
+_BETA_S_NZ_PANELS = 200
+_BETA_S_NZ_NODES = 8
+
+# Parameters that define a cosmology, and instances created by CLMMCosmology.interned
+_FINGERPRINT_PARAMS = ('H0', 'Omega_dm0', 'Omega_b0', 'Omega_k0')
+_INTERNED_COSMOLOGIES = weakref.WeakValueDictionary()
 
 
 class CLMMCosmology:
@@ -18,14 +37,76 @@ class CLMMCosmology:
         Cosmology library used in the back-end
     validate_input: bool
         Validade each input argument
+    use_distance_spline: bool
+        Compute the distances and critical surface densities from a spline of the comoving
+        distance (see `_get_distance_spline`) instead of the back-end
+    distance_spline_zmax: float
+        Maximum redshift of the distance spline, the back-end is used for higher redshifts
+        (default 1100, or the maximum redshift of the back-end distances if lower)
+    distance_spline_npts: int
+        Number of points of the distance spline
+    use_eh_powerspectrum: bool
+        Compute the linear matter power spectrum with the built-in Eisenstein & Hu model (see
+        `_eval_linear_matter_powerspectrum_eh`) instead of the back-end. It is always used by
+        the back-ends without power spectrum.
     """
-
-    def __init__(self, validate_input=True, **kwargs):
+    # back-end cosmologies whose parameters can be changed in place (the parameters must be
+    # checked to update the version)
+    _mutable_be_cosmo = False
+    # back-end cosmologies with their own linear matter power spectrum
+    _has_be_powerspectrum = False
+
+    def __init__(self, validate_input=True, use_distance_spline=False,
+                 use_eh_powerspectrum=False, **kwargs):
         self.backend = None
         self.be_cosmo = None
         self.validate_input = validate_input
+        self.use_distance_spline = use_distance_spline
+        self.use_eh_powerspectrum = use_eh_powerspectrum
+        self.distance_spline_zmax = 1100.
+        self.distance_spline_npts = 2000
+        self._cache = {}
+        self._cache_version = None
+        self._fingerprint = None
+        self._interned_version = None
+        self._desc = None
+        self._uid = uuid.uuid4().hex
+        self._version = 0
         self.set_be_cosmo(**kwargs)
 
+    @classmethod
+    def interned(cls, H0=67.66, Omega_b0=0.049, Omega_dm0=0.262, Omega_k0=0.0, **kwargs):
+        """Returns a cosmology with the given parameters, reusing the instance created
+        previously by this function with the same parameters if it still exists, so that
+        identical cosmologies share their caches.
+
+        Parameters
+        ----------
+        H0, Omega_b0, Omega_dm0, Omega_k0: float
+            Cosmological parameters, see init_from_params function.
+        **kwargs
+            Other arguments of the cosmology (e.g. `validate_input`), must be hashable.
+
+        Returns
+        -------
+        CLMMCosmology
+            Cosmology object.
+
+        Note
+        ----
+        The instances are shared, changing the parameters of one of them (only possible for
+        some back-ends) does not change the other cosmologies returned by this function.
+        """
+        params = {'H0': H0, 'Omega_b0': Omega_b0, 'Omega_dm0': Omega_dm0, 'Omega_k0': Omega_k0}
+        key = (cls, tuple(params.values()), tuple(sorted(kwargs.items())))
+        cosmo = _INTERNED_COSMOLOGIES.get(key)
+        # an instance is only reused if its parameters were not changed in place
+        if cosmo is None or cosmo._get_version() != cosmo._interned_version:
+            cosmo = cls(**params, **kwargs)
+            cosmo._interned_version = cosmo._get_version()
+            _INTERNED_COSMOLOGIES[key] = cosmo
+        return cosmo
+
     def __getitem__(self, key):
         if isinstance(key, str):
             return self._get_param(key)
@@ -34,6 +115,8 @@ class CLMMCosmology:
     def __setitem__(self, key, val):
         if isinstance(key, str):
             self._set_param(key, val)
+            self._fingerprint = None
+            self._version += 1
         else:
             raise TypeError(f'key input must be str, not {type(key)}')
 
@@ -87,8 +170,58 @@ class CLMMCosmology:
         """
         Returns the Cosmology description.
         """
-        return (f"{type(self).__name__}(H0={self['H0']}, Omega_dm0={self['Omega_dm0']}, "
-            f"Omega_b0={self['Omega_b0']}, Omega_k0={self['Omega_k0']})")
+        fingerprint = self._get_fingerprint()
+        if self._desc is None or self._desc[0] != fingerprint:
+            self._desc = (fingerprint, f"{fingerprint[0]}("+", ".join(
+                f"{key}={value}" for key, value in zip(_FINGERPRINT_PARAMS, fingerprint[1:]))+")")
+        return self._desc[1]
+
+    def _get_fingerprint(self):
+        """
+        Returns the fingerprint of this cosmology: a hashable tuple with the name of the class
+        and the parameters that define it, used to compare cosmologies and to detect changes.
+        It is only recomputed after the parameters change (see `_get_version`).
+
+        Returns
+        -------
+        tuple
+            Name of the class, H0, Omega_dm0, Omega_b0, Omega_k0.
+        """
+        self._get_version()
+        if self._fingerprint is None:
+            self._fingerprint = (type(self).__name__,)+tuple(
+                self[key] for key in _FINGERPRINT_PARAMS)
+        return self._fingerprint
+
+    def _get_version(self):
+        """
+        Returns the version of this cosmology: a counter incremented every time its parameters
+        change, used to invalidate the cosmology-dependent caches (here and in other objects,
+        together with the unique identifier `_uid` of the cosmology).
+        """
+        if self._mutable_be_cosmo and self._be_cosmo_changed():
+            self._fingerprint = None
+            self._version += 1
+        return self._version
+
+    def _be_cosmo_changed(self):
+        """
+        Returns True if the back-end cosmology was changed since the last call, to detect
+        changes made directly in it. It is called for every access to the caches, so it must
+        be cheap. To be filled in child classes with `_mutable_be_cosmo=True`.
+        """
+        raise NotImplementedError
+
+    def _get_cache(self):
+        """
+        Returns the dictionary of cached cosmology-dependent quantities. It is emptied
+        whenever the cosmological parameters change.
+        """
+        version = self._get_version()
+        if version != self._cache_version:
+            self._cache = {}
+            self._cache_version = version
+        return self._cache
 
     def set_be_cosmo(self, be_cosmo=None, H0=67.66, Omega_b0=0.049, Omega_dm0=0.262, Omega_k0=0.0):
         """Set the cosmology
@@ -105,6 +238,10 @@ class CLMMCosmology:
         else:
             self.init_from_params(
                 H0=H0, Omega_b0=Omega_b0, Omega_dm0=Omega_dm0, Omega_k0=Omega_k0)
+        self._cache = {}
+        self._cache_version = None
+        self._fingerprint = None
+        self._version += 1
 
     def get_Omega_m(self, z):
         r"""Gets the value of the dimensionless matter density
@@ -202,11 +339,80 @@ class CLMMCosmology:
         if self.validate_input:
             validate_argument(locals(), 'z1', 'float_array', argmin=0, eqmin=True)
             validate_argument(locals(), 'z2', 'float_array', argmin=0, eqmin=True)
-        return self._eval_da_z1z2(z1=z1, z2=z2)
+        return self._compute_da_z1z2(z1=z1, z2=z2)
 
     def _eval_da_z1z2(self, z1, z2):
         raise NotImplementedError
 
+    def _compute_da_z1z2(self, z1, z2):
+        r"""Computes the angular diameter distance between z1 and z2 with the distance spline
+        if enabled (and the redshifts are in its range), otherwise with the back-end"""
+        if self._use_distance_spline(z1, z2):
+            return self._eval_da_z1z2_spline(z1, z2)
+        return self._eval_da_z1z2(z1=z1, z2=z2)
+
+    def _eval_da_z1z2_spline(self, z1, z2):
+        r"""Computes the angular diameter distance between z1 and z2 with the distance spline"""
+        z1, z2 = np.array(z1, dtype=float), np.array(z2, dtype=float)
+        chi_spline, transverse = self._get_distance_spline()
+        return transverse(chi_spline(np.log1p(z2))-chi_spline(np.log1p(z1)))/(1.+z2)
+
+    def _use_distance_spline(self, *redshifts):
+        r"""Checks if the distance spline is enabled and covers the redshifts"""
+        return (self.use_distance_spline
+                and all(np.max(z) <= self.distance_spline_zmax for z in redshifts))
+
+    def _get_distance_spline(self):
+        r"""Returns the spline of the line-of-sight comoving distance :math:`\chi` as a
+        function of :math:`\ln(1+z)`, and the function converting it to the transverse
+        comoving distance.
+
+        The spline is built once per cosmology (and values of `distance_spline_zmax` and
+        `distance_spline_npts`) from the angular diameter distances of the back-end at
+        `distance_spline_npts` redshifts equally spaced in :math:`\ln(1+z)` up to
+        `distance_spline_zmax`. With the default 2000 points up to :math:`z=1100`, the relative
+        interpolation error is below :math:`10^{-8}` for :math:`z>10^{-3}` (and
+        :math:`10^{-10}` for :math:`z>10^{-2}`), so that the differences with the back-end
+        are dominated by its own precision (e.g. :math:`\sim10^{-6}` for CCL at low redshift).
+        With the curvature
+        :math:`\Omega_k`, the distances between two redshifts are
+
+        .. math::
+            d_a(z_1, z_2) = \frac{1}{1+z_2}S_k(\chi(z_2)-\chi(z_1)),
+
+        where :math:`S_k(x)=x` for a flat universe and
+        :math:`S_k(x)=\frac{D_H}{\sqrt{\Omega_k}}\sinh\left(\sqrt{\Omega_k}\frac{x}{D_H}
+        \right)` (:math:`\sin` for :math:`\Omega_k<0`), with :math:`D_H=c/H_0`.
+
+        Returns
+        -------
+        chi_spline: CubicSpline
+            Line-of-sight comoving distance in :math:`M\!pc` as a function of :math:`\ln(1+z)`
+        transverse: callable
+            Function :math:`S_k`.
+        """
+        cache = self._get_cache()
+        key = ('distance_spline', self.distance_spline_zmax, self.distance_spline_npts)
+        if key not in cache:
+            log1p_z = np.linspace(0., np.log1p(self.distance_spline_zmax),
+                                  self.distance_spline_npts)
+            z_vals = np.expm1(log1p_z)
+            d_m = np.zeros(z_vals.size)
+            d_m[1:] = np.array(self._eval_da_z1z2(0., z_vals[1:]))*(1.+z_vals[1:])
+            hubble_dist = const.CLIGHT_KMS.value/self['H0']
+            sqrt_ok = np.sqrt(np.abs(self['Omega_k0']))
+            if self['Omega_k0'] > 0.:
+                chi = hubble_dist/sqrt_ok*np.arcsinh(sqrt_ok*d_m/hubble_dist)
+                transverse = lambda x: hubble_dist/sqrt_ok*np.sinh(sqrt_ok*x/hubble_dist)
+            elif self['Omega_k0'] < 0.:
+                chi = hubble_dist/sqrt_ok*np.arcsin(sqrt_ok*d_m/hubble_dist)
+                transverse = lambda x: hubble_dist/sqrt_ok*np.sin(sqrt_ok*x/hubble_dist)
+            else:
+                chi = d_m
+                transverse = lambda x: x
+            cache[key] = (CubicSpline(log1p_z, chi), transverse)
+        return cache[key]
+
     def eval_da(self, z):
         r"""Computes the angular diameter distance between 0.0 and z.
 
@@ -364,11 +570,138 @@ class CLMMCosmology:
         if self.validate_input:
             validate_argument(locals(), 'z_len', float, argmin=0, eqmin=True)
             validate_argument(locals(), 'z_src', 'float_array', argmin=0)
-        return self._eval_sigma_crit(z_len=z_len, z_src=z_src)
+        return self._compute_sigma_crit(z_len=z_len, z_src=z_src)
 
     def _eval_sigma_crit(self, z_len, z_src):
         raise NotImplementedError
 
+    def _compute_sigma_crit(self, z_len, z_src):
+        r"""Computes the critical surface density with the distance spline if enabled (and the
+        redshifts are in its range), otherwise with the back-end"""
+        if self._use_distance_spline(z_len, z_src):
+            return self._eval_sigma_crit_spline(z_len, z_src)
+        return self._eval_sigma_crit(z_len=z_len, z_src=z_src)
+
+    def _eval_sigma_crit_spline(self, z_len, z_src):
+        r"""Computes the critical surface density with the distance spline"""
+        z_len, z_src = np.array(z_len, dtype=float), np.array(z_src, dtype=float)
+        chi_spline, transverse = self._get_distance_spline()
+        chi_len, chi_src = chi_spline(np.log1p(z_len)), chi_spline(np.log1p(z_src))
+        d_l, d_s = transverse(chi_len), transverse(chi_src)
+        d_ls = transverse(chi_src-chi_len)
+        # the (1+z) factors cancel out
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sigma_c = np.where(z_src > z_len, _SIGMA_CRIT_CONSTANT*d_s/(d_l*d_ls), np.inf)
+        return sigma_c*(1.+z_len) if sigma_c.ndim > 0 else float(sigma_c*(1.+z_len))
+
+    def eval_beta_s_moments(self, z_len, z_src, z_inf=1000., z_src_max=10., z_src_key=None):
+        r"""Computes the lensing efficiency averaged over the source population and the average
+        of its square
+
+        .. math::
+            \langle \beta_s \rangle = \left\langle \frac{D_{LS}}{D_S}
+            \frac{D_\infty}{D_{L,\infty}}\right\rangle, \qquad
+            \langle \beta_s^2 \rangle = \left\langle \left(\frac{D_{LS}}{D_S}
+            \frac{D_\infty}{D_{L,\infty}}\right)^2 \right\rangle
+
+        Sources in front of the lens have :math:`\beta_s=0` and are included in the averages.
+
+        Parameters
+        ----------
+        z_len : array_like, float
+            Lens redshift(s)
+        z_src : array_like, callable
+            Source galaxy redshifts, or source redshift distribution :math:`n(z)`. The
+            distribution does not need to be normalized and must accept array arguments.
+        z_inf : float, optional
+            Redshift used as infinity.
+        z_src_max : float, optional
+            Upper limit of the integration of :math:`n(z)`, only used if `z_src` is callable.
+        z_src_key : hashable, None, optional
+            Identifier of the distribution :math:`n(z)` (e.g. its parameters), used to cache
+            the results when the function is recreated between evaluations (e.g. a lambda in a
+            fit). Only used if `z_src` is callable.
+
+        Returns
+        -------
+        beta_s_mean : array_like, float
+            Mean lensing efficiency
+        beta_s_square_mean : array_like, float
+            Mean square of the lensing efficiency
+
+        Notes
+        -----
+        The results are cached for each lens redshift, so that evaluations with the same
+        sources (same redshift values, or same `z_src_key`) do not recompute them. Without
+        `z_src_key`, only the results of the last :math:`n(z)` function are kept, and reused
+        if the same function object is passed again. The distribution is integrated with a
+        composite Gauss-Legendre quadrature of `_BETA_S_NZ_PANELS` panels, with a relative
+        precision of :math:`\sim10^{-8}` for distributions wider than
+        :math:`\sim(z_{max}-z_{len})/100`.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'z_len', 'float_array', argmin=0, eqmin=True)
+            if not callable(z_src):
+                validate_argument(locals(), 'z_src', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'z_inf', float, argmin=0)
+            validate_argument(locals(), 'z_src_max', float, argmin=0)
+        return self._eval_beta_s_moments(z_len=z_len, z_src=z_src, z_inf=z_inf,
+                                         z_src_max=z_src_max, z_src_key=z_src_key)
+
+    def _eval_beta_s_moments(self, z_len, z_src, z_inf=1000., z_src_max=10., z_src_key=None):
+        cache = self._get_cache()
+        if callable(z_src) and z_src_key is None:
+            # the results of the last function are kept in their own dictionary
+            last = cache.get('beta_s_moments_last_function')
+            if last is None or last[0] is not z_src or last[1] != z_src_max:
+                last = (z_src, z_src_max, {})
+                cache['beta_s_moments_last_function'] = last
+            cache, src_key = last[2], None
+        elif callable(z_src):
+            src_key = ('n(z)', z_src_key, z_src_max)
+        else:
+            z_src = np.atleast_1d(np.array(z_src, dtype=float))
+            src_key = (z_src.shape, z_src.tobytes())
+        z_len_vals = np.atleast_1d(np.array(z_len, dtype=float)).ravel()
+        keys = [('beta_s_moments', src_key, z_inf, z_len_) for z_len_ in z_len_vals]
+        z_len_new = np.unique([z_len_ for z_len_, key in zip(z_len_vals, keys)
+                               if key not in cache])
+        if z_len_new.size > 0:
+            # all lenses are computed at once, with one column per source redshift
+            if callable(z_src):
+                # composite Gauss-Legendre quadrature of n(z) behind each lens (beta_s=0 in
+                # front of it)
+                nodes, weights = _get_composite_gauss_legendre()
+                norm = np.sum(weights*z_src_max*z_src(nodes*z_src_max))
+                width = (z_src_max-z_len_new)[:, None]
+                z_src_grid = z_len_new[:, None]+width*nodes
+                src_weights = weights*width*z_src(z_src_grid)/norm
+            else:
+                z_src_unique, counts = np.unique(z_src, return_counts=True)
+                z_src_grid = np.tile(z_src_unique, (z_len_new.size, 1))
+                src_weights = counts/z_src.size*np.ones(z_src_grid.shape)
+            beta_s = self._eval_beta_s(z_len_new[:, None], z_src_grid, z_inf)
+            for z_len_, beta_mean, beta_square_mean in zip(
+                    z_len_new, np.sum(src_weights*beta_s, axis=1),
+                    np.sum(src_weights*beta_s**2, axis=1)):
+                cache[('beta_s_moments', src_key, z_inf, z_len_)] = (beta_mean, beta_square_mean)
+        beta_s_mean, beta_s_square_mean = np.array([cache[key] for key in keys]).T
+        if np.ndim(z_len) == 0:
+            return beta_s_mean[0], beta_s_square_mean[0]
+        return beta_s_mean.reshape(np.shape(z_len)), beta_s_square_mean.reshape(np.shape(z_len))
+
+    def _eval_beta_s(self, z_len, z_src, z_inf):
+        r"""Lensing efficiency :math:`\beta_s` for (broadcasted) lens and source redshifts,
+        computed from the critical surface densities :math:`\Sigma_{crit}(z_\infty)/
+        \Sigma_{crit}(z_s)`"""
+        z_len, z_src = np.broadcast_arrays(z_len, z_src)
+        beta_s = np.zeros(z_len.shape)
+        back = z_src > z_len
+        if np.any(back):
+            beta_s[back] = (self._compute_sigma_crit(z_len[back], np.full(np.sum(back), z_inf))
+                            /self._compute_sigma_crit(z_len[back], z_src[back]))
+        return beta_s
+
     def eval_linear_matter_powerspectrum(self, k_vals, redshift):
         r"""Computes the linear matter power spectrum
 
@@ -386,7 +719,89 @@ class CLMMCosmology:
         """
         if self.validate_input:
             validate_argument(locals(), 'k_vals', 'float_array', argmin=0)
+        if self._use_eh_powerspectrum():
+            return self._eval_linear_matter_powerspectrum_eh(k_vals, redshift)
         return self._eval_linear_matter_powerspectrum(k_vals, redshift)
 
     def _eval_linear_matter_powerspectrum(self, k_vals, redshift):
-        raise NotImplementedError
+        # back-ends without power spectrum use the Eisenstein & Hu model
+        return self._eval_linear_matter_powerspectrum_eh(k_vals, redshift)
+
+    def _use_eh_powerspectrum(self):
+        r"""Checks if the linear matter power spectrum is computed with the built-in Eisenstein
+        & Hu model"""
+        return self.use_eh_powerspectrum or not self._has_be_powerspectrum
+
+    def _eval_linear_matter_powerspectrum_eh(self, k_vals, redshift):
+        r"""Computes the linear matter power spectrum with the transfer function of Eisenstein
+        & Hu (1998), including the baryon acoustic oscillations,
+
+        .. math::
+            P(k, z) = A\,k^{n_s}T(k)^2D(z)^2,
+
+        with :math:`n_s=0.96` and the amplitude :math:`A` normalized to :math:`\sigma_8=0.8`,
+        as the CCL cosmology created from parameters. The linear growth factor :math:`D(z)` is
+        computed with the background of `clmm.cosmology.background` (photons and neutrinos of
+        the cosmologies created from parameters). The amplitude and growth factor are computed
+        once per cosmology, and the power spectrum is vectorized in `k_vals` and `redshift`.
+        It agrees with CCL to :math:`\sim10^{-4}`.
+
+        Parameters
+        ----------
+        k_vals : array_like, float
+            Wavenumber k [math:`Mpc^{-1}`] values to compute the power spectrum.
+        redshift : array_like, float
+            Redshift(s) to get the power spectrum, broadcastable with `k_vals`.
+
+        Returns
+        -------
+        array_like, float
+            Linear matter spectrum in units of math:`Mpc^{3}`.
+        """
+        cache = self._get_cache()
+        if 'eisenstein_hu' not in cache:
+            params = _get_density_params(
+                self['h'], self['Omega_b0'], self['Omega_dm0'], self['Omega_k0'])
+            shape_params = (self['h'], self['Omega_b0'], float(params['Omega_m0']))
+            cache['eisenstein_hu'] = (shape_params, _get_amplitude(*shape_params),
+                                      _get_growth_factor_spline(self['h'], params))
+        shape_params, amplitude, growth_spline = cache['eisenstein_hu']
+        growth2 = np.exp(2.*growth_spline(-np.log1p(np.array(redshift, dtype=float))))
+        return (amplitude*np.power(k_vals, _N_S)
+                *_eval_transfer_function(k_vals, *shape_params)**2*growth2)
+
+    def _eval_linear_matter_powerspectrum_cached(self, k_vals, redshift):
+        r"""Computes the linear matter power spectrum from a log-log cubic spline, built once
+        per cosmology and redshift on 1000 wavenumbers in :math:`10^{-5}-10^{5}\ Mpc^{-1}`
+        (the Eisenstein & Hu model is evaluated directly).
+
+        Parameters
+        ----------
+        k_vals : array_like, float
+            Wavenumber k [math:`Mpc^{-1}`] values to compute the power spectrum.
+        redshift : float
+            Redshift to get the power spectrum.
+
+        Returns
+        -------
+        array_like, float
+            Linear matter spectrum in units of math:`Mpc^{3}`.
+        """
+        if self._use_eh_powerspectrum():
+            return self._eval_linear_matter_powerspectrum_eh(k_vals, redshift)
+        cache = self._get_cache()
+        key = ('linear_matter_powerspectrum', redshift)
+        if key not in cache:
+            k_table = np.logspace(-5., 5., 1000)
+            pk_table = np.array(self._eval_linear_matter_powerspectrum(k_table, redshift))
+            cache[key] = CubicSpline(np.log(k_table), np.log(pk_table))
+        return np.exp(cache[key](np.log(k_vals)))
+
+
+def _get_composite_gauss_legendre(n_panels=_BETA_S_NZ_PANELS, n_nodes=_BETA_S_NZ_NODES):
+    r"""Nodes and weights of a composite Gauss-Legendre quadrature on :math:`[0, 1]`, with
+    `n_panels` panels of equal width and `n_nodes` nodes in each panel"""
+    nodes, weights = np.polynomial.legendre.leggauss(n_nodes)
+    edges = np.arange(n_panels)/n_panels
+    return ((edges[:, None]+0.5*(nodes+1.)/n_panels).ravel(),
+            np.tile(0.5*weights/n_panels, n_panels))
@@ -479,7 +479,8 @@ def _compute_cross_shear(shear1, shear2, phi):
 def make_radial_profile(components, angsep, angsep_units, bin_units,
                         bins=10, components_error=None, error_model='ste',
                         include_empty_bins=False, return_binnumber=False,
-                        cosmo=None, z_lens=None, validate_input=True):
+                        cosmo=None, z_lens=None, sigma_c=None, n_sub_bins=None,
+                        validate_input=True):
     r"""Compute the angular profile of given components
 
     We assume that the cluster object contains information on the cross and
@@ -527,6 +528,21 @@ def make_radial_profile(components, angsep, angsep_units, bin_units,
         CLMM Cosmology object to convert angular separations to physical distances
     z_lens: array, optional
         Redshift of the lens
+    sigma_c : array, None, optional
+        Critical surface density of each source, used with `n_sub_bins`
+    n_sub_bins : int, None, optional
+        If provided, the distribution of the sources inside each bin is stored in the profile, as
+        a joint histogram of the radius and of the inverse critical surface density with
+        `n_sub_bins` sub-bins each. It is used to average the model over the sources in each bin
+        (see `CLMModeling.eval_bin_averaged_tangential_shear`). The following columns are added:
+
+            * `sub_radius` - mean radius of the sources in each radius sub-bin (`bin_units`);
+            * `sub_radius_mpc` - same radius in :math:`M\!pc`, to be used with the models \
+                (only if `bin_units` are physical or `cosmo` is provided);
+            * `sub_sigma_c_inv` - mean inverse critical surface density in each sub-bin;
+            * `sub_weights` - fraction of the sources of the bin in each (radius, inverse \
+                critical surface density) sub-bin.
+
     validate_input: bool
         Validade each input argument
 
@@ -553,6 +569,10 @@ def make_radial_profile(components, angsep, angsep_units, bin_units,
         validate_argument(locals(), 'include_empty_bins', bool)
         validate_argument(locals(), 'return_binnumber', bool)
         validate_argument(locals(), 'z_lens', 'float_array', none_ok=True)
+        validate_argument(locals(), 'n_sub_bins', int, none_ok=True, argmin=0)
+        if n_sub_bins is not None:
+            validate_argument(locals(), 'sigma_c', 'float_array')
+            arguments_consistency([angsep, sigma_c], names=('angsep', 'sigma_c'))
         comp_dict = {f'components[{i}]': comp for i, comp in enumerate(components)}
         arguments_consistency(components, names=comp_dict.keys(), prefix='Input components')
         for component in comp_dict:
@@ -580,9 +600,79 @@ def make_radial_profile(components, angsep, angsep_units, bin_units,
         profile_table[f'p_{i}_err'] = comp_err
     profile_table['radius'] = r_avg
     profile_table['n_src'] = nsrc
+    # distribution of sources inside each bin, from the same binning
+    if n_sub_bins is not None:
+        (profile_table['sub_radius'], profile_table['sub_sigma_c_inv'],
+         profile_table['sub_weights']) = _compute_sub_bin_histograms(
+             source_seps, 1./np.array(sigma_c, dtype=float), bins, n_sub_bins)
+        # radius in the units of the models
+        if cosmo is not None or bin_units.lower() in ('pc', 'kpc', 'mpc'):
+            profile_table['sub_radius_mpc'] = convert_units(
+                profile_table['sub_radius'].data, bin_units, 'Mpc', redshift=z_lens,
+                cosmo=cosmo)
     # return empty bins?
     if not include_empty_bins:
         profile_table = profile_table[nsrc > 1]
     if return_binnumber:
         return profile_table, binnumber
     return profile_table
+
+
+def _compute_sub_bin_histograms(source_seps, sigma_c_inv, bins, n_sub_bins):
+    r"""Joint histogram of the radius and inverse critical surface density of the sources
+    inside each radial bin
+
+    Parameters
+    ----------
+    source_seps : array
+        Radius of the sources
+    sigma_c_inv : array
+        Inverse critical surface density of the sources
+    bins : array_like
+        Bin edges
+    n_sub_bins : int
+        Number of sub-bins in radius and inverse critical surface density
+
+    Returns
+    -------
+    sub_radius : array
+        Mean radius in each radius sub-bin, shape (nbins, n_sub_bins). Center of the
+        sub-bin if it is empty.
+    sub_sigma_c_inv : array
+        Mean inverse critical surface density in each sub-bin, shape (nbins, n_sub_bins)
+    sub_weights : array
+        Fraction of the sources of the bin in each sub-bin, shape
+        (nbins, n_sub_bins, n_sub_bins)
+    """
+    bins = np.array(bins, dtype=float)
+    nbins = bins.size-1
+    source_seps, sigma_c_inv = np.array(source_seps, dtype=float), np.array(sigma_c_inv)
+    filt = np.isfinite(source_seps)*np.isfinite(sigma_c_inv)
+    source_seps, sigma_c_inv = source_seps[filt], sigma_c_inv[filt]
+    # same binning as compute_radial_averages
+    binnumber = scipy.stats.binned_statistic(source_seps, source_seps, statistic='count',
+                                             bins=bins)[2]
+    in_bins = (binnumber > 0)*(binnumber <= nbins)
+    rad, s_inv, ind = source_seps[in_bins], sigma_c_inv[in_bins], binnumber[in_bins]-1
+    # sub-bins in radius: equal width inside each bin
+    sub_edges = bins[:-1, None]+(bins[1:]-bins[:-1])[:, None]*np.linspace(0, 1, n_sub_bins+1)
+    ind_r = np.clip(((rad-bins[ind])/(bins[ind+1]-bins[ind])*n_sub_bins).astype(int),
+                    0, n_sub_bins-1)
+    # sub-bins in inverse critical surface density: equal width between min and max of the bin
+    s_min, s_max = np.full(nbins, np.inf), np.full(nbins, -np.inf)
+    np.minimum.at(s_min, ind, s_inv)
+    np.maximum.at(s_max, ind, s_inv)
+    s_width = np.where(s_max > s_min, s_max-s_min, 1.)
+    ind_s = np.clip(((s_inv-s_min[ind])/s_width[ind]*n_sub_bins).astype(int), 0, n_sub_bins-1)
+    # histograms and means
+    counts = np.zeros((nbins, n_sub_bins, n_sub_bins))
+    np.add.at(counts, (ind, ind_r, ind_s), 1.)
+    sum_r, sum_s = np.zeros((nbins, n_sub_bins)), np.zeros((nbins, n_sub_bins))
+    np.add.at(sum_r, (ind, ind_r), rad)
+    np.add.at(sum_s, (ind, ind_s), s_inv)
+    counts_r, counts_s = counts.sum(axis=2), counts.sum(axis=1)
+    sub_radius = np.where(counts_r > 0, sum_r/np.maximum(counts_r, 1),
+                          0.5*(sub_edges[:, 1:]+sub_edges[:, :-1]))
+    sub_sigma_c_inv = np.where(counts_s > 0, sum_s/np.maximum(counts_s, 1), 0.)
+    sub_weights = counts/np.maximum(counts.sum(axis=(1, 2)), 1)[:, None, None]
+    return sub_radius, sub_sigma_c_inv, sub_weights
@@ -37,6 +37,7 @@ class GalaxyCluster():
         self.z = None
         self.galcat = None
         self.validate_input = validate_input
+        self._sigma_c_cosmo = None
         if len(args)>0 or len(kwargs)>0:
             self._add_values(*args, **kwargs)
             self._check_types()
@@ -105,7 +106,8 @@ class GalaxyCluster():
 
     def add_critical_surface_density(self, cosmo):
         r"""Computes the critical surface density for each galaxy in `galcat`.
-        It only runs if input cosmo != galcat cosmo or if `sigma_c` not in `galcat`.
+        It only runs if input cosmo != galcat cosmo, if `sigma_c` not in `galcat` or if the
+        parameters of the cosmology used for `sigma_c` were changed since then.
 
         Parameters
         ----------
@@ -118,7 +120,14 @@ class GalaxyCluster():
         """
         if cosmo is None:
             raise TypeError('To compute Sigma_crit, please provide a cosmology')
-        if cosmo.get_desc() != self.galcat.meta['cosmo'] or 'sigma_c' not in self.galcat:
+        # identifier and version of the cosmology used for sigma_c, to detect changes of the
+        # parameters of the same cosmology object
+        sigma_c_cosmo = (cosmo._uid, cosmo._get_version())
+        used_cosmo = getattr(self, '_sigma_c_cosmo', None)
+        cosmo_changed = (used_cosmo is not None and used_cosmo[0] == sigma_c_cosmo[0]
+                         and used_cosmo[1] != sigma_c_cosmo[1])
+        if (cosmo.get_desc() != self.galcat.meta['cosmo'] or 'sigma_c' not in self.galcat.columns
+                or cosmo_changed):
             if self.z is None:
                 raise TypeError('Cluster\'s redshift is None. Cannot compute Sigma_crit')
             if 'z' not in self.galcat.columns:
@@ -128,6 +137,7 @@ class GalaxyCluster():
             self.galcat['sigma_c'] = compute_critical_surface_density(
                 cosmo=cosmo, z_cluster=self.z, z_source=self.galcat['z'],
                 validate_input=self.validate_input)
+            self._sigma_c_cosmo = sigma_c_cosmo
 
     def _get_input_galdata(self, col_dict, required_cols=None):
         """
@@ -335,6 +345,7 @@ class GalaxyCluster():
                             tan_component_out='gt', cross_component_out='gx',
                             tan_component_in_err=None, cross_component_in_err=None,
                             include_empty_bins=False, gal_ids_in_bins=False,
+                            n_sub_bins=None,
                             add=True, table_name='profile', overwrite=True):
         r"""Compute the shear or ellipticity profile of the cluster
 
@@ -395,6 +406,10 @@ class GalaxyCluster():
             Also include empty bins in the returned table
         gal_ids_in_bins: bool, optional
             Also include the list of galaxies ID belonging to each bin in the returned table
+        n_sub_bins: int, None, optional
+            If provided, also include the joint histogram of radius and inverse critical surface
+            density of the sources in each bin (see `clmm.dataops.make_radial_profile`), used to
+            average models over the sources of each bin. Requires `cosmo`.
         add: bool, optional
             Attach the profile to the cluster object
         table_name: str, optional
@@ -422,6 +437,8 @@ class GalaxyCluster():
                 'Run compute_tangential_and_cross_components first.')
         if 'z' not in self.galcat.columns:
             raise TypeError('Missing galaxy redshifts!')
+        if n_sub_bins is not None:
+            self.add_critical_surface_density(cosmo)
         # Compute the binned averages and associated errors
         profile_table, binnumber = make_radial_profile(
             [self.galcat[n].data for n in (tan_component_in, cross_component_in, 'z')],
@@ -429,6 +446,8 @@ class GalaxyCluster():
             bin_units=bin_units, bins=bins, error_model=error_model,
             include_empty_bins=include_empty_bins, return_binnumber=True,
             cosmo=cosmo, z_lens=self.z, validate_input=self.validate_input,
+            sigma_c=None if n_sub_bins is None else self.galcat['sigma_c'].data,
+            n_sub_bins=n_sub_bins,
             components_error=[None if n is None else self.galcat[n].data
                               for n in (tan_component_in_err, cross_component_in_err, None)],
             )
@@ -5,7 +5,7 @@ Functions for sampling (output either peak or full distribution)
 from scipy import optimize as spo
 
 
-def sciopt(model_to_shear_profile, logm_0, **kwargs):
+def sciopt(model_to_shear_profile, logm_0, jac=None, **kwargs):
     r''' Uses scipy optimize minimize to output the peak
 
     Parameters
@@ -19,6 +19,9 @@ def sciopt(model_to_shear_profile, logm_0, **kwargs):
     logm_0 : ndarray, shape (n,)
         Initial guess. Array of real elements of size (n,),
         where 'n' is the number of independent variables.
+    jac : callable, optional
+        Gradient of the objective function, ``jac(x, *args) -> ndarray, shape (n,)``,
+        e.g. computed with the `eval_*_jacobian` methods of `Modeling`.
     kwargs :
         Other optional keyword arguments passed to `minimize`.
         Please check the `scipy` documentaion for information on default values and methods.
@@ -29,11 +32,11 @@ def sciopt(model_to_shear_profile, logm_0, **kwargs):
     The solution of the optimization
 
     '''
-    return spo.minimize(model_to_shear_profile, logm_0,
+    return spo.minimize(model_to_shear_profile, logm_0, jac=jac,
                         **kwargs).x
 
 
-def basinhopping(model_to_shear_profile, logm_0, **kwargs):
+def basinhopping(model_to_shear_profile, logm_0, jac=None, **kwargs):
     r'''Uses basinhopping, a scipy global optimization function, to find the minimum.
 
     Parameters
@@ -47,6 +50,9 @@ def basinhopping(model_to_shear_profile, logm_0, **kwargs):
     logm_0 : array_like
         Initial guess. Array of real elements of size (n,),
         where 'n' is the number of independent variables.
+    jac : callable, optional
+        Gradient of the objective function, ``jac(x, *args) -> ndarray, shape (n,)``,
+        used by the local minimizer.
     kwargs :
         Other optional keyword arguments passed to `basinhopping`.
         Please check the `scipy` documentaion for information on default values and methods.
@@ -57,10 +63,13 @@ def basinhopping(model_to_shear_profile, logm_0, **kwargs):
     The solution of the optimization
 
     '''
+    if jac is not None:
+        kwargs['minimizer_kwargs'] = {**kwargs.get('minimizer_kwargs', {}), 'jac': jac}
     return spo.basinhopping(model_to_shear_profile, logm_0, **kwargs).x
 
 
-def scicurve_fit(profile_model, radius, profile, err_profile, absolute_sigma=True, **kwargs):
+def scicurve_fit(profile_model, radius, profile, err_profile, absolute_sigma=True, jac=None,
+                 **kwargs):
     r"""
     Uses scipy.optimize.curve_fit to find best fit parameters
 
@@ -97,6 +106,11 @@ def scicurve_fit(profile_model, radius, profile, err_profile, absolute_sigma=Tru
         match the sample variance of the residuals after the fit. Default is True.
         Mathematically,
         ``pcov(absolute_sigma=False) = pcov(absolute_sigma=True) * chisq(popt)/(M-N)``
+    jac : callable, optional
+        Jacobian of the model function with respect to the parameters,
+        ``jac(xdata, ...) -> ndarray, shape (M, N)``, e.g. computed with the
+        `eval_*_jacobian` methods of `Modeling`. If None (default), it is estimated
+        numerically.
 
     kwargs :
         Other optional keyword arguments passed to `curve_fit`
@@ -119,7 +133,7 @@ def scicurve_fit(profile_model, radius, profile, err_profile, absolute_sigma=Tru
     """
     return spo.curve_fit(
         profile_model, radius, profile, sigma=err_profile,
-        absolute_sigma=absolute_sigma, **kwargs)
+        absolute_sigma=absolute_sigma, jac=jac, **kwargs)
 
 samplers = {
     'minimize': sciopt,
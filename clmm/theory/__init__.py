@@ -57,6 +57,9 @@ __all__ = backend.__all__
 globals().update({k: getattr(backend, k) for k in backend.__all__})
 
 from . import func_layer
+from .composite import CompositeModeling
+from .emulator import ProfileEmulator
+__all__ = __all__+['CompositeModeling', 'ProfileEmulator']
 
 try:
     func_layer.gcm = Modeling()
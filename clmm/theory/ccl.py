@@ -6,7 +6,7 @@ Modeling using CCL
 import pyccl as ccl
 
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.interpolate import CubicSpline
 import warnings
 from packaging import version
 
@@ -22,6 +22,9 @@ Cosmology = CCLCosmology
 
 __all__ = ['CCLCLMModeling', 'Modeling', 'Cosmology']+func_layer.__all__
 
+# Masses (log10, in CCL units) used to tabulate the Einasto slope
+_EINASTO_ALPHA_LOG10_MASS = np.linspace(10., 17., 141)
+
 
 class CCLCLMModeling(CLMModeling):
     r"""Object with functions for halo mass modeling
@@ -44,6 +47,9 @@ class CCLCLMModeling(CLMModeling):
         Dictionary with the definitions for mass
     hdpm_dict: dict
         Dictionary with the definitions for profile
+    projected_grid_tol: float
+        Relative tolerance of the cached grids used to interpolate the projected
+        Einasto and Hernquist profiles
     """
     # pylint: disable=too-many-instance-attributes
 
@@ -67,6 +73,10 @@ class CCLCLMModeling(CLMModeling):
                           'hernquist': {'truncated': False}}
         self.mdelta = 0.0
         self.cor_factor = _patch_rho_crit_to_cd2018(ccl.physical_constants.RHO_CRITICAL)
+        self.projected_grid_tol = 1.0e-4
+        self._projected_grid = None
+        self._einasto_alpha_key = None
+        self._einasto_alpha_splines = {}
 
         # Set halo profile and cosmology
         self.set_halo_density_profile(halo_profile_model, massdef, delta_mdef)
@@ -81,6 +91,7 @@ class CCLCLMModeling(CLMModeling):
                 and (delta_mdef == self.delta_mdef)):
             self.halo_profile_model = halo_profile_model
             self.massdef = massdef
+            self.delta_mdef = delta_mdef
 
             cur_cdelta = 0.0
             cur_values = False
@@ -107,28 +118,169 @@ class CCLCLMModeling(CLMModeling):
         """" set mass"""
         self.mdelta = mdelta/self.cor_factor
 
-    def _get_einasto_alpha(self, z_cl): 
+    def _get_concentration(self):
+        """" get concentration"""
+        return self.conc.c
+
+    def _get_mass(self):
+        """" get mass"""
+        return self.mdelta*self.cor_factor
+
+    def _get_einasto_alpha(self, z_cl):
         """"get the value of the Einasto slope"""
-        a_cl = self.cosmo.get_a_from_z(z_cl)
-        return self.hdpm._get_alpha (self.cosmo.be_cosmo, self.mdelta, a_cl, self.mdef)
+        if np.ndim(z_cl) > 0:
+            return np.vectorize(self._get_einasto_alpha)(z_cl)
+        log10_mdelta = np.log10(self.mdelta)
+        if not _EINASTO_ALPHA_LOG10_MASS[0] <= log10_mdelta <= _EINASTO_ALPHA_LOG10_MASS[-1]:
+            return self._compute_einasto_alpha(np.atleast_1d(self.mdelta), z_cl)[0]
+        return float(self._get_einasto_alpha_spline(z_cl)(log10_mdelta))
+
+    def _compute_einasto_alpha(self, mdelta, z_cl):
+        """"compute the Einasto slope from the peak height with CCL"""
+        self.hdpm.update_parameters(alpha='cosmo')
+        return self.hdpm._get_alpha(self.cosmo.be_cosmo, mdelta, self.cosmo.get_a_from_z(z_cl),
+                                    self.mdef)
+
+    def _get_einasto_alpha_spline(self, z_cl):
+        r""" Returns the spline of the Einasto slope as a function of :math:`\log_{10}` of the
+        mass (in CCL units).
+
+        The slope is set by the peak height of the halo, which depends on the cosmology, mass
+        definition and concentration (through the conversion to the virial mass). It is computed
+        by CCL in a single vectorized call on `_EINASTO_ALPHA_LOG10_MASS` for each redshift, and
+        the splines are kept until the cosmology, profile or concentration change, so that mass
+        sweeps do not recompute it.
+
+        Parameters
+        ----------
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        CubicSpline
+            Einasto slope as a function of :math:`\log_{10}M_\Delta`.
+        """
+        versions = self._update_state()
+        key = (versions[0], versions[1], versions[3])
+        if key != self._einasto_alpha_key:
+            self._einasto_alpha_key = key
+            self._einasto_alpha_splines = {}
+        if z_cl not in self._einasto_alpha_splines:
+            self._einasto_alpha_splines[z_cl] = CubicSpline(
+                _EINASTO_ALPHA_LOG10_MASS,
+                self._compute_einasto_alpha(10.**_EINASTO_ALPHA_LOG10_MASS, z_cl))
+        return self._einasto_alpha_splines[z_cl]
+
+    def _get_einasto_alpha_halos(self, mdelta, cdelta, z_cl):
+        """"compute the Einasto slopes of halos with CCL, in one vectorized call for each
+        distinct pair of concentration and redshift"""
+        log10_mdelta, cdelta, z_cl = np.broadcast_arrays(
+            np.log10(np.array(mdelta, dtype=float)/self.cor_factor), cdelta, z_cl)
+        alpha = np.zeros(log10_mdelta.shape)
+        cur_cdelta = self.conc.c
+        for cdelta_, z_cl_ in set(zip(cdelta.ravel().tolist(), z_cl.ravel().tolist())):
+            sel = (cdelta == cdelta_) & (z_cl == z_cl_)
+            self.conc.c = cdelta_
+            alpha[sel] = self._compute_einasto_alpha(10.**log10_mdelta[sel], z_cl_)
+        self.conc.c = cur_cdelta
+        return alpha
+
+    def _get_overdensity_density(self, massdef, delta_mdef, z_cl):
+        """"the virial mass definition is the critical one in CCL (see `mdef_dict`)"""
+        return super()._get_overdensity_density(
+            'critical' if massdef == 'virial' else massdef, delta_mdef, z_cl)
+
+    def _set_hdpm_einasto_alpha(self, z_cl):
+        """"set the Einasto slope of the CCL profile from the cached table, so that it is not
+        recomputed in the evaluations of the profile"""
+        if self.halo_profile_model == 'einasto':
+            self.hdpm.update_parameters(
+                alpha=self._get_einasto_alpha(z_cl) if np.ndim(z_cl) == 0 else 'cosmo')
 
     def _eval_3d_density(self, r3d, z_cl):
         """"eval 3d density"""
+        self._set_hdpm_einasto_alpha(z_cl)
         a_cl = self.cosmo.get_a_from_z(z_cl)
         dens = self.hdpm.real(
             self.cosmo.be_cosmo, r3d/a_cl, self.mdelta, a_cl, self.mdef)
             
         return dens*self.cor_factor/a_cl**3
 
+    def _get_projected_grid(self, r_proj, z_cl):
+        r""" Returns the log-log splines of the surface density and of the mean surface density
+        of the current (non-NFW) profile.
+
+        The splines are cached until the mass, concentration, redshift, profile or cosmology
+        change (the Einasto slope is set by these in CCL), so that the surface density, mean
+        surface density, excess surface density, shear and convergence share the same
+        projection. The number of points of the grid is doubled until the interpolation of the
+        previous grid agrees with the new points within `projected_grid_tol`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        tuple
+            Splines of the logarithm of the surface density and of the mean surface density
+            in :math:`M_\odot\ Mpc^{-2}` as a function of the logarithm of the radius.
+        """
+        key = self._update_state(z_cl)
+        log_rmin, log_rmax = np.log(np.min(r_proj)), np.log(np.max(r_proj))
+        grid = self._projected_grid
+        if grid is not None and grid['key'] == key:
+            if grid['log_rmin'] <= log_rmin and log_rmax <= grid['log_rmax']:
+                return grid['splines']
+            # extend the range of the current grid instead of replacing it
+            log_rmin, log_rmax = min(log_rmin, grid['log_rmin']), max(log_rmax, grid['log_rmax'])
+        else:
+            log_rmin, log_rmax = log_rmin-np.log(2.), log_rmax+np.log(2.)
+
+        a_cl = self.cosmo.get_a_from_z(z_cl)
+        self._set_hdpm_einasto_alpha(z_cl)
+
+        def _log_projections(log_r):
+            r_cor = np.exp(log_r)/a_cl
+            return [np.log(func(self.cosmo.be_cosmo, r_cor, self.mdelta, a_cl, self.mdef)
+                           *self.cor_factor/a_cl**2)
+                    for func in (self.hdpm.projected, self.hdpm.cumul2d)]
+
+        # The CCL projection is more precise when evaluated over a wide range, but it is noisy
+        # where the profile becomes negligible, so the grid error is only checked in the range
+        # that will be cached
+        log_r_eval = (min(log_rmin, np.log(1.0e-3)), max(log_rmax, np.log(1.0e2)))
+        # The profiles are evaluated on the refined grid in a single call, the error is estimated
+        # from the interpolation of the coarser grid (every other point) at the new points
+        npts = 129
+        while True:
+            npts = 2*npts-1
+            log_r = np.linspace(*log_r_eval, npts)
+            log_vals = _log_projections(log_r)
+            check = (log_r[1::2] >= log_rmin)*(log_r[1::2] <= log_rmax)
+            error = max(np.max(np.abs(CubicSpline(log_r[::2], val[::2])(log_r[1::2])
+                                      -val[1::2])[check], initial=0.)
+                        for val in log_vals)
+            if error < self.projected_grid_tol or npts >= 2049:
+                break
+
+        splines = tuple(CubicSpline(log_r, val) for val in log_vals)
+        self._projected_grid = {'key': key, 'log_rmin': log_rmin, 'log_rmax': log_rmax,
+                                'splines': splines}
+        return splines
+
     def _eval_surface_density(self, r_proj, z_cl):
+        """"eval surface density"""
         a_cl = self.cosmo.get_a_from_z(z_cl)
         if self.halo_profile_model == 'nfw':
             return self.hdpm.projected(self.cosmo.be_cosmo, r_proj/a_cl, self.mdelta, a_cl, self.mdef)*self.cor_factor/a_cl**2
         else:
-            rtmp = np.geomspace(np.min(r_proj)/10., np.max(r_proj)*10., 1000)
-            tmp = self.hdpm.projected (self.cosmo.be_cosmo, rtmp/a_cl, self.mdelta, a_cl, self.mdef)*self.cor_factor/a_cl**2
-            ptf = interp1d(np.log(rtmp), np.log(tmp), bounds_error=False, fill_value=-100)
-            return np.exp(ptf(np.log(r_proj)))  
+            sigma_spline = self._get_projected_grid(r_proj, z_cl)[0]
+            return np.exp(sigma_spline(np.log(r_proj)))
 
     def _eval_mean_surface_density(self, r_proj, z_cl):
         """"eval mean surface density"""
@@ -136,10 +288,8 @@ class CCLCLMModeling(CLMModeling):
         if self.halo_profile_model =='nfw':
             return self.hdpm.cumul2d(self.cosmo.be_cosmo, r_proj/a_cl, self.mdelta, self.cosmo.get_a_from_z(z_cl), self.mdef)*self.cor_factor/a_cl**2
         else:
-            rtmp = np.geomspace(np.min(r_proj)/10., np.max(r_proj)*10., 1000)
-            tmp = self.hdpm.cumul2d (self.cosmo.be_cosmo, rtmp/a_cl, self.mdelta, a_cl, self.mdef)*self.cor_factor/a_cl**2
-            ptf = interp1d(np.log(rtmp), np.log(tmp), bounds_error=False, fill_value=-100)
-            return np.exp(ptf(np.log(r_proj)))
+            mean_sigma_spline = self._get_projected_grid(r_proj, z_cl)[1]
+            return np.exp(mean_sigma_spline(np.log(r_proj)))
 
     def _eval_excess_surface_density(self, r_proj, z_cl):
         """"eval excess surface density"""
@@ -150,7 +300,21 @@ class CCLCLMModeling(CLMModeling):
             return (self.hdpm.cumul2d(self.cosmo.be_cosmo, r_cor, self.mdelta, self.cosmo.get_a_from_z(z_cl), self.mdef)-
                     self.hdpm.projected(self.cosmo.be_cosmo, r_cor, self.mdelta, self.cosmo.get_a_from_z(z_cl), self.mdef))*self.cor_factor/a_cl**2
         else:
-            return self.eval_mean_surface_density(r_proj, z_cl) - self.eval_surface_density(r_proj, z_cl)
+            sigma_spline, mean_sigma_spline = self._get_projected_grid(r_proj, z_cl)
+            log_r = np.log(r_proj)
+            return np.exp(mean_sigma_spline(log_r))-np.exp(sigma_spline(log_r))
 
+    def _eval_surface_densities(self, r_proj, z_cl):
+        """"eval surface density, mean surface density and excess surface density"""
+        if self.halo_profile_model =='nfw':
+            a_cl = self.cosmo.get_a_from_z(z_cl)
+            r_cor = r_proj/a_cl
+            sigma = self.hdpm.projected(self.cosmo.be_cosmo, r_cor, self.mdelta, a_cl, self.mdef)*self.cor_factor/a_cl**2
+            mean_sigma = self.hdpm.cumul2d(self.cosmo.be_cosmo, r_cor, self.mdelta, a_cl, self.mdef)*self.cor_factor/a_cl**2
+        else:
+            sigma_spline, mean_sigma_spline = self._get_projected_grid(r_proj, z_cl)
+            log_r = np.log(r_proj)
+            sigma, mean_sigma = np.exp(sigma_spline(log_r)), np.exp(mean_sigma_spline(log_r))
+        return sigma, mean_sigma, mean_sigma-sigma
 
 Modeling = CCLCLMModeling
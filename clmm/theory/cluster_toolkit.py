@@ -75,6 +75,9 @@ class CTModeling(CLMModeling):
         self.cosmo_class = AstroPyCosmology
         # Attributes exclusive to this class
         self.cor_factor = _patch_rho_crit_to_cd2018(2.77533742639e+11)
+        self._sigma_grid = None
+        self.mdelta = 0.0
+        self.cdelta = 0.0
         # Set halo profile and cosmology
         self.set_halo_density_profile(halo_profile_model, massdef, delta_mdef)
         self.set_cosmo(None)
@@ -94,10 +97,23 @@ class CTModeling(CLMModeling):
         """" set mass"""
         self.mdelta = mdelta
 
+    def _get_concentration(self):
+        """" get concentration"""
+        return self.cdelta
+
+    def _get_mass(self):
+        """" get mass"""
+        return self.mdelta
+
+    def _get_E2Omega_m(self, z_cl):
+        """"get E2Omega_m, cached for the current cosmology"""
+        return self._get_prefactor(('E2Omega_m', z_cl),
+                                   lambda: self.cosmo.get_E2Omega_m(z_cl))
+
     def _eval_3d_density(self, r3d, z_cl):
         """"eval 3d density"""
         h = self.cosmo['h']
-        Omega_m = self.cosmo.get_E2Omega_m(z_cl)*self.cor_factor
+        Omega_m = self._get_E2Omega_m(z_cl)*self.cor_factor
         return ct.density.rho_nfw_at_r(
             _assert_correct_type_ct(r3d)*h, self.mdelta*h,
             self.cdelta, Omega_m, delta=self.delta_mdef)*h**2
@@ -105,11 +121,51 @@ class CTModeling(CLMModeling):
     def _eval_surface_density(self, r_proj, z_cl):
         """"eval surface density"""
         h = self.cosmo['h']
-        Omega_m = self.cosmo.get_E2Omega_m(z_cl)*self.cor_factor
+        Omega_m = self._get_E2Omega_m(z_cl)*self.cor_factor
         return ct.deltasigma.Sigma_nfw_at_R(
             _assert_correct_type_ct(r_proj)*h, self.mdelta*h,
             self.cdelta, Omega_m, delta=self.delta_mdef)*h*1.0e12  # pc**-2 to Mpc**-2
 
+    def _get_sigma_grid(self, r_proj, z_cl):
+        r""" Returns the surface density tabulated by cluster_toolkit to compute the excess
+        surface density.
+
+        The grid covers one decade more than the requested radial range on each side, with at
+        least 1000 points (and 10 times the number of requested radii). It is cached until the
+        mass, concentration, redshift, profile or cosmology change, and reused while it covers
+        the requested radii with enough points per decade.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc\ h^{-1}`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        sigma_r_proj : array_like
+            Radial positions of the grid in :math:`M\!pc\ h^{-1}`.
+        sigma : array_like
+            Surface density on the grid in cluster_toolkit units
+            (:math:`h\ M_\odot\ pc^{-2}`).
+        """
+        key = self._update_state(z_cl)
+        log_rmin = np.log10(np.min(r_proj))-1
+        log_rmax = np.log10(np.max(r_proj))+1
+        npts = np.max([1000, 10*np.array(r_proj).size])
+        grid = self._sigma_grid
+        if (grid is None or grid['key'] != key
+                or log_rmin < grid['log_rmin'] or log_rmax > grid['log_rmax']
+                or npts/(log_rmax-log_rmin) > grid['npts_per_decade']):
+            h = self.cosmo['h']
+            sigma_r_proj = np.logspace(log_rmin, log_rmax, npts)
+            sigma = self._eval_surface_density(sigma_r_proj/h, z_cl)/(h*1e12)  # rm norm for ct
+            self._sigma_grid = {'key': key, 'log_rmin': log_rmin, 'log_rmax': log_rmax,
+                                'npts_per_decade': npts/(log_rmax-log_rmin),
+                                'sigma_r_proj': sigma_r_proj, 'sigma': sigma}
+        return self._sigma_grid['sigma_r_proj'], self._sigma_grid['sigma']
+
     def _eval_mean_surface_density(self, r_proj, z_cl):
         r''' Computes the mean value of surface density inside radius r_proj
 
@@ -129,8 +185,8 @@ class CTModeling(CLMModeling):
         ----
         This function just adds eval_surface_density+eval_excess_surface_density
         '''
-        return (self.eval_surface_density(r_proj, z_cl)
-                +self.eval_excess_surface_density(r_proj, z_cl))
+        return (self._eval_surface_density(r_proj, z_cl)
+                +self._eval_excess_surface_density(r_proj, z_cl))
 
     def _eval_excess_surface_density(self, r_proj, z_cl):
         """"eval excess surface density"""
@@ -138,19 +194,14 @@ class CTModeling(CLMModeling):
             raise ValueError(
                 f"Rmin = {np.min(r_proj):.2e} Mpc!"
                 " This value is too small and may cause computational issues.")
-        Omega_m = self.cosmo.get_E2Omega_m(z_cl)*self.cor_factor
+        Omega_m = self._get_E2Omega_m(z_cl)*self.cor_factor
         h = self.cosmo['h']
         r_proj = _assert_correct_type_ct(r_proj)*h
         # Computing sigma on a larger range than the radial range requested,
-        # with at least 1000 points.
-        sigma_r_proj = np.logspace(np.log10(np.min(
-            r_proj))-1, np.log10(np.max(r_proj))+1, np.max([1000, 10*np.array(r_proj).size]))
-        sigma = self.eval_surface_density(
-            sigma_r_proj/h, z_cl)/(h*1e12)  # rm norm for ct
-        # ^ Note: Let's not use this naming convention when transfering ct to ccl....
+        # the grid is cached and shared between calls with the same parameters.
+        sigma_r_proj, sigma = self._get_sigma_grid(r_proj, z_cl)
         return ct.deltasigma.DeltaSigma_at_R(
             r_proj, sigma_r_proj, sigma, self.mdelta*h,
             self.cdelta, Omega_m, delta=self.delta_mdef)*h*1.0e12  # pc**-2 to Mpc**-2
 
-
 Modeling = CTModeling
@@ -0,0 +1,218 @@
+"""@file composite.py
+Composite halo model (one-halo, miscentering and two-halo terms)
+"""
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from .parent_class import _MISCENTERING_MODELS
+from .generic import compute_reduced_shear_from_convergence
+from ..utils import validate_argument
+
+__all__ = ['CompositeModeling']
+
+_COMPONENTS = ('1h', 'miscentering', '2h')
+_PROFILES = ('surface_density', 'excess_surface_density', 'tangential_shear', 'convergence',
+             'reduced_tangential_shear')
+_PARAMS = ('mdelta', 'log10_mdelta', 'cdelta', 'halobias', 'r_mis', 'mis_fraction')
+
+
+class CompositeModeling:
+    r"""Halo model combining the one-halo term of a `CLMModeling` object, optionally
+    miscentered, with the two-halo term
+
+    .. math::
+        \Delta\Sigma(R) = (1-f_{mis})\Delta\Sigma_{1h}(R)+f_{mis}\Delta\Sigma_{1h, mis}(R)
+        +b_h\Delta\Sigma_{2h}(R)
+
+    All components are computed from the same radial grid, critical surface densities and
+    cached power spectrum, and returned in a single call.
+
+    Attributes
+    ----------
+    modeling: CLMModeling
+        Modeling object with the cosmology and one-halo profile (mass, concentration,
+        profile model, mass definition)
+    components: tuple
+        Components of the model (`1h`, `miscentering`, `2h`)
+    mis_model: str
+        Distribution of the miscentering offsets (`rayleigh` or `exponential`)
+    halobias: float
+        Value of the halo bias of the two-halo term
+    r_mis: float
+        Scale of the miscentering offset distribution in :math:`M\!pc`
+    mis_fraction: float
+        Fraction of miscentered clusters
+    lsteps: int
+        Number of log-spaced wavenumbers used in the two-halo term, at least 2048 are used (see
+        `CLMModeling.eval_excess_surface_density_2h`)
+    validate_input: bool
+        Validade each input argument
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, modeling, components=('1h', '2h'), mis_model='rayleigh', lsteps=500,
+                 validate_input=True):
+        self.validate_input = validate_input
+        if self.validate_input:
+            validate_argument(locals(), 'components', (list, tuple))
+            validate_argument(locals(), 'mis_model', str)
+            validate_argument(locals(), 'lsteps', int, argmin=1)
+            for name in components:
+                if name not in _COMPONENTS:
+                    raise ValueError(f"Component {name} not supported, options are "
+                                     f"{list(_COMPONENTS)}")
+            if 'miscentering' in components and '1h' not in components:
+                raise ValueError("The miscentering component requires the 1h component")
+            if mis_model not in _MISCENTERING_MODELS:
+                raise ValueError(f"Miscentering model {mis_model} not supported, options are "
+                                 f"{list(_MISCENTERING_MODELS)}")
+        self.modeling = modeling
+        self.components = tuple(name for name in _COMPONENTS if name in components)
+        self.mis_model = mis_model
+        self.lsteps = lsteps
+        self.halobias = 1.
+        self.r_mis = 0.
+        self.mis_fraction = 1.
+
+    def set_params(self, **params):
+        r""" Sets the parameters of the model
+
+        Parameters
+        ----------
+        **params: float
+            Values of the parameters, options are `mdelta` (or `log10_mdelta`) and `cdelta`
+            (set in `modeling`), `halobias`, `r_mis` and `mis_fraction`.
+        """
+        for name, value in params.items():
+            if name not in _PARAMS:
+                raise ValueError(f"Parameter {name} not supported, options are {list(_PARAMS)}")
+            if self.validate_input:
+                if name == 'mis_fraction':
+                    validate_argument(params, name, float, argmin=0, argmax=1,
+                                      eqmin=True, eqmax=True)
+                elif name == 'log10_mdelta':
+                    validate_argument(params, name, float)
+                else:
+                    validate_argument(params, name, float, argmin=0, eqmin=name=='r_mis')
+            if name == 'mdelta':
+                self.modeling.set_mass(value)
+            elif name == 'log10_mdelta':
+                self.modeling.set_mass(10.**value)
+            elif name == 'cdelta':
+                self.modeling.set_concentration(value)
+            else:
+                setattr(self, name, float(value))
+
+    def eval_profiles(self, r_proj, z_cl, z_src=None, which='excess_surface_density'):
+        r""" Computes a profile for each component of the model and their total
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        z_src : array_like, float, optional
+            Background source galaxy redshift(s), required for the lensing profiles
+        which: str, optional
+            Profile to be computed, options are `surface_density`, `excess_surface_density`
+            (default), `tangential_shear`, `convergence` and `reduced_tangential_shear`.
+
+        Returns
+        -------
+        dict
+            Profile of each component and their sum (`total`). For the reduced tangential
+            shear, the shear of each component is divided by :math:`1-\kappa` of the
+            total, so that the components add up to the total.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0, none_ok=True)
+            validate_argument(locals(), 'which', str)
+            if which not in _PROFILES:
+                raise ValueError(f"Profile {which} not supported, options are {list(_PROFILES)}")
+            if z_src is None and which not in ('surface_density', 'excess_surface_density'):
+                raise ValueError(f"z_src must be provided to compute the {which}")
+        self.modeling._set_concentration_from_relation(z_cl)
+        return self._eval_profiles(r_proj, z_cl, z_src, which)
+
+    def _eval_profiles(self, r_proj, z_cl, z_src=None, which='excess_surface_density'):
+        r_proj = np.array(r_proj, dtype=float)
+        sigma, delta_sigma = self._eval_surface_densities(r_proj, z_cl)
+        sigma['total'] = sum(sigma.values())
+        delta_sigma['total'] = sum(delta_sigma.values())
+        if which == 'surface_density':
+            return sigma
+        if which == 'excess_surface_density':
+            return delta_sigma
+        sigma_c = self.modeling._eval_critical_surface_density(z_cl, z_src)
+        if which == 'convergence':
+            return {name: vals/sigma_c for name, vals in sigma.items()}
+        if which == 'tangential_shear':
+            return {name: vals/sigma_c for name, vals in delta_sigma.items()}
+        return {name: compute_reduced_shear_from_convergence(vals/sigma_c, sigma['total']/sigma_c)
+                for name, vals in delta_sigma.items()}
+
+    def _eval_surface_densities(self, r_proj, z_cl):
+        r""" Computes the surface density and excess surface density of each component"""
+        sigma, delta_sigma = {}, {}
+        if 'miscentering' in self.components and self.r_mis > 0. and self.mis_fraction > 0.:
+            log_r_grid, *profiles = self.modeling._eval_miscentered_profiles_grid(
+                np.max(r_proj), z_cl, self.r_mis, self.mis_model)
+            spline = CubicSpline(log_r_grid, np.log(profiles), axis=1)
+            sigma_cen, mean_sigma_cen = np.exp(spline(np.log(r_proj))[:2])
+            # the miscentered profiles are flat below the grid
+            sigma_mis, mean_sigma_mis = np.exp(
+                spline(np.log(np.clip(r_proj, np.exp(log_r_grid[0]), None)))[2:])
+            sigma['1h'] = (1.-self.mis_fraction)*sigma_cen
+            delta_sigma['1h'] = (1.-self.mis_fraction)*(mean_sigma_cen-sigma_cen)
+            sigma['miscentering'] = self.mis_fraction*sigma_mis
+            delta_sigma['miscentering'] = self.mis_fraction*(mean_sigma_mis-sigma_mis)
+        elif '1h' in self.components:
+            sigma['1h'], _, delta_sigma['1h'] = self.modeling._eval_surface_densities_on_grid(
+                r_proj, z_cl)
+            if 'miscentering' in self.components:
+                sigma['miscentering'] = np.zeros(r_proj.shape)
+                delta_sigma['miscentering'] = np.zeros(r_proj.shape)
+        if '2h' in self.components:
+            sigma['2h'] = self.modeling._eval_surface_density_2h(
+                r_proj, z_cl, halobias=self.halobias, lsteps=self.lsteps)
+            delta_sigma['2h'] = self.modeling._eval_excess_surface_density_2h(
+                r_proj, z_cl, halobias=self.halobias, lsteps=self.lsteps)
+        return sigma, delta_sigma
+
+    def get_model_function(self, z_cl, params=('log10_mdelta',), z_src=None,
+                           which='reduced_tangential_shear'):
+        r""" Returns the total profile as a function of the radius and of the values of some
+        parameters, e.g. to be used as the model function of the fitters in
+        `clmm.support.sampler`.
+
+        Parameters
+        ----------
+        z_cl: float
+            Redshift of the cluster
+        params: list, tuple, optional
+            Names of the parameters of the model function (see `set_params`), the other
+            parameters are kept at their current values.
+        z_src : array_like, float, optional
+            Background source galaxy redshift(s), required for the lensing profiles
+        which: str, optional
+            Profile to be computed (see `eval_profiles`)
+
+        Returns
+        -------
+        callable
+            Function ``model(r_proj, *values)`` returning the total profile.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'params', (list, tuple))
+            for name in params:
+                if name not in _PARAMS:
+                    raise ValueError(f"Parameter {name} not supported, options are "
+                                     f"{list(_PARAMS)}")
+
+        def model(r_proj, *values):
+            self.set_params(**dict(zip(params, values)))
+            return self.eval_profiles(r_proj, z_cl, z_src, which)['total']
+        return model
@@ -0,0 +1,121 @@
+"""@file concentration.py
+Concentration-mass relations
+"""
+import numpy as np
+from scipy.integrate import simpson
+from scipy.interpolate import CubicSpline
+
+__all__ = []
+
+# Linear collapse threshold in an Einstein-de Sitter universe
+_DELTA_C_EDS = 3./20.*(12.*np.pi)**(2./3.)
+
+# Parameters (A, B, C) of the relations for each mass definition: Duffy et al. (2008, full
+# sample), c=A(M/2\times10^{12}h^{-1}M_\odot)^B(1+z)^C, and Bhattacharya et al. (2013),
+# c=AD(z)^B\nu^C
+_DUFFY08_PARAMS = {'200c': (5.71, -0.084, -0.47),
+                   '200m': (10.14, -0.081, -1.01),
+                   'vir': (7.85, -0.081, -0.71)}
+_BHATTACHARYA13_PARAMS = {'200c': (5.9, 0.54, -0.35),
+                          '200m': (9.0, 1.15, -0.29),
+                          'vir': (7.7, 0.9, -0.29)}
+# Parameters of the median relation of Diemer & Kravtsov (2015)
+_DIEMER15_PARAMS = {'kappa': 1.0, 'phi_0': 6.58, 'phi_1': 1.27, 'eta_0': 7.28, 'eta_1': 1.56,
+                    'alpha': 1.08, 'beta': 1.77}
+
+# Mass definitions supported by each relation
+_CONCENTRATION_RELATIONS = {'duffy08': tuple(_DUFFY08_PARAMS),
+                            'bhattacharya13': tuple(_BHATTACHARYA13_PARAMS),
+                            'diemer15': ('200c',)}
+
+# Wavenumbers (in Mpc^-1) used to compute the variance of the linear density field
+_SIGMA_LOG_K = np.linspace(np.log(1.0e-5), np.log(1.0e3), 1601)
+
+
+def _get_mass_definition_name(massdef, delta_mdef):
+    r""" Name of a mass definition in the concentration relations (`200c`, `200m` or `vir`)"""
+    if massdef == 'virial':
+        return 'vir'
+    return f"{delta_mdef}{massdef[0]}"
+
+
+def _eval_sigma_mass(mdelta, cosmo, z_cl):
+    r""" Computes the RMS of the linear density field in top-hat spheres containing the mass
+    mdelta at the mean matter density, and the logarithmic slope of the linear power spectrum at
+    the wavenumber :math:`2\pi\kappa/R` of their Lagrangian radius :math:`R` (vectorized in the
+    masses)
+
+    .. math::
+        \sigma^2(R) = \int\frac{k^3P(k)}{2\pi^2}W^2(kR)d\ln k.
+
+    Parameters
+    ----------
+    mdelta : array_like
+        Masses in units of :math:`M_\odot`.
+    cosmo : clmm.cosmology.Cosmology object
+        CLMM Cosmology object
+    z_cl : float
+        Redshift
+
+    Returns
+    -------
+    sigma : array_like
+        RMS of the density field.
+    slope : array_like
+        Logarithmic slope :math:`n=d\ln P/d\ln k` of the power spectrum.
+    """
+    # pylint: disable=protected-access
+    radius = np.cbrt(3.*np.array(mdelta, dtype=float)/(4.*np.pi*cosmo._get_rho_m(0.)))
+    k_vals = np.exp(_SIGMA_LOG_K)
+    log_pk = np.log(cosmo._eval_linear_matter_powerspectrum_cached(k_vals, z_cl))
+    x_vals = k_vals*radius[..., None]
+    window = 3.*(np.sin(x_vals)-x_vals*np.cos(x_vals))/x_vals**3
+    sigma = np.sqrt(simpson(k_vals**3*np.exp(log_pk)*window**2/(2.*np.pi**2), x=_SIGMA_LOG_K,
+                            axis=-1))
+    slope = CubicSpline(_SIGMA_LOG_K, log_pk)(
+        np.log(2.*np.pi*_DIEMER15_PARAMS['kappa']/radius), 1)
+    return sigma, slope
+
+
+def _eval_concentration_relation(relation, mdelta, z_cl, cosmo, mdef_name):
+    r""" Computes the concentrations of a concentration-mass relation (vectorized in the
+    masses)
+
+    Parameters
+    ----------
+    relation : str
+        Name of the relation (`duffy08`, `bhattacharya13` or `diemer15`)
+    mdelta : array_like
+        Masses in units of :math:`M_\odot`.
+    z_cl : float
+        Redshift
+    cosmo : clmm.cosmology.Cosmology object
+        CLMM Cosmology object
+    mdef_name : str
+        Mass definition (see `_get_mass_definition_name`)
+
+    Returns
+    -------
+    array_like
+        Concentrations.
+    """
+    # pylint: disable=protected-access
+    mdelta = np.array(mdelta, dtype=float)
+    if relation == 'duffy08':
+        amp, mass_slope, z_slope = _DUFFY08_PARAMS[mdef_name]
+        return amp*(mdelta*cosmo['h']/2.0e12)**mass_slope*(1.+z_cl)**z_slope
+    sigma, slope = _eval_sigma_mass(mdelta, cosmo, z_cl)
+    if relation == 'bhattacharya13':
+        amp, growth_slope, nu_slope = _BHATTACHARYA13_PARAMS[mdef_name]
+        # linear growth factor from the largest scales, and collapse threshold of Nakamura &
+        # Suto (1997)
+        k_min = np.exp(_SIGMA_LOG_K[:1])
+        growth = np.sqrt(cosmo._eval_linear_matter_powerspectrum_cached(k_min, z_cl)
+                         /cosmo._eval_linear_matter_powerspectrum_cached(k_min, 0.))[0]
+        delta_c = _DELTA_C_EDS*(1.+0.012299*np.log10(cosmo._get_Omega_m(z_cl)))
+        return amp*growth**growth_slope*(delta_c/sigma)**nu_slope
+    params = _DIEMER15_PARAMS
+    nu_min = params['eta_0']+params['eta_1']*slope
+    nu_ratio = _DELTA_C_EDS/sigma/nu_min
+    return 0.5*(params['phi_0']+params['phi_1']*slope)*(
+        nu_ratio**-params['alpha']+nu_ratio**params['beta'])
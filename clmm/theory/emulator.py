@@ -0,0 +1,345 @@
+"""@file emulator.py
+Tabulated emulator of the halo profiles
+"""
+import json
+import warnings
+import numpy as np
+from numpy.polynomial import chebyshev
+
+from .generic import compute_reduced_shear_from_convergence
+from ..utils import validate_argument
+
+__all__ = ['ProfileEmulator']
+
+_AXES = ('log10_mdelta', 'cdelta', 'z_cl', 'r_proj')
+
+
+class ProfileEmulator:
+    r"""Emulator of the surface density and excess surface density of a `CLMModeling` object
+    as functions of :math:`(\log_{10}M_\Delta, c_\Delta, z_{cl}, R)`.
+
+    The logarithms of the profiles are tabulated on Chebyshev-Gauss-Lobatto nodes of the
+    parameters and of :math:`\ln R` and expanded in a tensor product of Chebyshev polynomials.
+    The number of nodes of each axis is increased until the highest order coefficients are
+    below the tolerance, and the result is validated against the modeling object.
+
+    Attributes
+    ----------
+    modeling: CLMModeling
+        Modeling object used to build the emulator, and to compute the critical surface
+        densities of the lensing profiles
+    ranges: dict
+        Ranges of `log10_mdelta`, `cdelta`, `z_cl` and `r_proj` (in :math:`M\!pc`)
+    tol: float
+        Target relative accuracy
+    n_nodes: tuple
+        Number of nodes of each axis
+    max_nodes: int
+        Maximum number of nodes of each axis
+    coefs: array_like
+        Chebyshev coefficients of the logarithm of the surface density and excess surface
+        density, with axes (`log10_mdelta`, `cdelta`, `z_cl`, profile, `r_proj`)
+    validation_error: dict
+        Maximum relative error of each profile at random points in the ranges
+    validate_input: bool
+        Validade each input argument
+    """
+
+    def __init__(self, modeling, log10_mdelta_range=(13., 16.), cdelta_range=(1., 10.),
+                 z_cl_range=(0.1, 1.), r_proj_range=(0.1, 10.), tol=1.0e-3,
+                 n_nodes=(9, 9, 5, 17), max_nodes=33, build=True, validate_input=True):
+        self.validate_input = validate_input
+        if self.validate_input:
+            for name in ('log10_mdelta_range', 'cdelta_range', 'z_cl_range', 'r_proj_range',
+                         'n_nodes'):
+                validate_argument(locals(), name, (list, tuple))
+            validate_argument(locals(), 'tol', float, argmin=0)
+            validate_argument(locals(), 'max_nodes', int, argmin=3)
+            validate_argument(locals(), 'build', bool)
+            for name in ('cdelta_range', 'z_cl_range', 'r_proj_range'):
+                if min(locals()[name]) < 0:
+                    raise ValueError(f"{name} must be positive")
+            if len(n_nodes) != 4 or min(n_nodes) < 3:
+                raise ValueError("n_nodes must have 4 values larger than 2")
+        self.modeling = modeling
+        self.ranges = dict(zip(_AXES, (tuple(float(val) for val in ranges) for ranges in (
+            log10_mdelta_range, cdelta_range, z_cl_range, r_proj_range))))
+        for name, (vmin, vmax) in self.ranges.items():
+            if vmin >= vmax:
+                raise ValueError(f"{name} range must be increasing")
+        self.tol = tol
+        self.n_nodes = tuple(n_nodes)
+        self.max_nodes = max_nodes
+        self.coefs = None
+        self.validation_error = {}
+        if build:
+            self.build()
+
+    def _to_unit(self, name, vals):
+        r""" Maps the values of an axis to :math:`[-1, 1]`"""
+        vmin, vmax = self.ranges[name]
+        if name == 'r_proj':
+            vmin, vmax, vals = np.log(vmin), np.log(vmax), np.log(vals)
+        return (2.*np.array(vals, dtype=float)-vmin-vmax)/(vmax-vmin)
+
+    def _from_unit(self, name, unit_vals):
+        r""" Maps values in :math:`[-1, 1]` to the values of an axis"""
+        vmin, vmax = self.ranges[name]
+        if name == 'r_proj':
+            return np.exp(0.5*(np.log(vmin)+np.log(vmax)+unit_vals*np.log(vmax/vmin)))
+        return 0.5*(vmin+vmax+unit_vals*(vmax-vmin))
+
+    def _compute_table(self, n_nodes):
+        r""" Computes the logarithm of the profiles on the nodes and their Chebyshev
+        coefficients"""
+        unit_nodes = [np.cos(np.pi*np.arange(npts)[::-1]/(npts-1.)) for npts in n_nodes]
+        nodes = [self._from_unit(name, vals) for name, vals in zip(_AXES, unit_nodes)]
+        tables = np.zeros((2,)+tuple(n_nodes))
+        for i, log10_mdelta in enumerate(nodes[0]):
+            self.modeling._set_mass(10.**log10_mdelta)
+            for j, cdelta in enumerate(nodes[1]):
+                self.modeling._set_concentration(cdelta)
+                for k, z_cl in enumerate(nodes[2]):
+                    sigma, _, delta_sigma = self.modeling._eval_surface_densities(
+                        nodes[3], z_cl)
+                    tables[:, i, j, k] = np.log(sigma), np.log(delta_sigma)
+        coefs = tables
+        for axis, vals in enumerate(unit_nodes):
+            # interpolating polynomial along each axis
+            coefs = np.moveaxis(coefs, axis+1, 0)
+            shape = coefs.shape
+            coefs = chebyshev.chebfit(vals, coefs.reshape(shape[0], -1), shape[0]-1)
+            coefs = np.moveaxis(coefs.reshape(shape), 0, axis+1)
+        return np.ascontiguousarray(np.moveaxis(coefs, 0, 3))
+
+    def build(self):
+        r""" Builds the emulator, increasing the number of nodes of the axes whose highest
+        order Chebyshev coefficients are above `tol`, and validates it.
+        """
+        state = (self.modeling._get_mass(), self.modeling._get_concentration())
+        n_nodes = list(self.n_nodes)
+        last_coefs = [np.inf]*4
+        while True:
+            coefs = self._compute_table(n_nodes)
+            refine = False
+            for axis in range(4):
+                last = np.max(np.abs(np.take(coefs, [-2, -1], axis=axis+(axis == 3))))
+                # coefficients that do not decrease are limited by the precision of the backend
+                if (last > 0.1*self.tol and last < 0.5*last_coefs[axis]
+                        and 2*n_nodes[axis]-1 <= self.max_nodes):
+                    # Chebyshev-Gauss-Lobatto nodes with 2n-1 points include the previous ones
+                    n_nodes[axis] = 2*n_nodes[axis]-1
+                    refine = True
+                last_coefs[axis] = last
+            if not refine:
+                break
+        self.modeling._set_mass(state[0])
+        self.modeling._set_concentration(state[1])
+        self.n_nodes = tuple(n_nodes)
+        self.coefs = coefs
+        self.validate()
+        if max(self.validation_error.values()) > self.tol:
+            warnings.warn(f"Emulator relative error ({max(self.validation_error.values())}) "
+                          f"above the tolerance ({self.tol}), increase max_nodes")
+
+    def validate(self, n_samples=50, seed=None):
+        r""" Computes the maximum relative error of the emulator against the modeling object
+        at random points in the ranges.
+
+        Parameters
+        ----------
+        n_samples: int, optional
+            Number of random parameter sets
+        seed: int, None, optional
+            Seed of the random generator
+
+        Returns
+        -------
+        dict
+            Maximum relative error of the `surface_density` and `excess_surface_density`,
+            also stored in `validation_error`.
+        """
+        state = (self.modeling._get_mass(), self.modeling._get_concentration())
+        rng = np.random.default_rng(seed)
+        params = {name: self._from_unit(name, rng.uniform(-1., 1., n_samples))
+                  for name in _AXES[:3]}
+        r_proj = self._from_unit('r_proj', rng.uniform(-1., 1., 20))
+        emulated = self._eval_log_profiles(r_proj, **params)
+        errors = np.zeros((2, n_samples))
+        for i in range(n_samples):
+            self.modeling._set_mass(10.**params['log10_mdelta'][i])
+            self.modeling._set_concentration(params['cdelta'][i])
+            sigma, _, delta_sigma = self.modeling._eval_surface_densities(
+                r_proj, params['z_cl'][i])
+            errors[:, i] = [np.max(np.abs(np.exp(emulated[0][i])/sigma-1.)),
+                            np.max(np.abs(np.exp(emulated[1][i])/delta_sigma-1.))]
+        self.modeling._set_mass(state[0])
+        self.modeling._set_concentration(state[1])
+        self.validation_error = dict(zip(('surface_density', 'excess_surface_density'),
+                                         np.max(errors, axis=1)))
+        return self.validation_error
+
+    def _eval_log_profiles(self, r_proj, log10_mdelta, cdelta, z_cl):
+        r""" Evaluates the logarithm of the surface density and excess surface density, with
+        shape `params.shape+r_proj.shape`"""
+        # broadcast_arrays returns a tuple with NumPy>=2
+        params = list(np.broadcast_arrays(*(np.array(vals, dtype=float)
+                                            for vals in (log10_mdelta, cdelta, z_cl))))
+        # Chebyshev polynomials T_n(x) = cos(n arccos(x))
+        basis = [np.cos(np.arccos(np.clip(self._to_unit(name, np.ravel(vals)), -1., 1.))[:, None]
+                        *np.arange(npts))
+                 for name, vals, npts in zip(_AXES, params+[r_proj], self.n_nodes)]
+        out_shape = params[0].shape+np.shape(r_proj)
+        # contraction of each parameter axis, then of the radius axis
+        npts = basis[0].shape[0]
+        coefs = np.dot(basis[0], self.coefs.reshape(self.n_nodes[0], -1))
+        coefs = np.einsum('aj,ajx->ax', basis[1], coefs.reshape(npts, self.n_nodes[1], -1))
+        coefs = np.einsum('ak,akx->ax', basis[2], coefs.reshape(npts, self.n_nodes[2], -1))
+        coefs = np.dot(coefs.reshape(-1, self.n_nodes[3]), basis[3].T).reshape(npts, 2, -1)
+        return tuple(coefs[:, i].reshape(out_shape) for i in (0, 1))
+
+    def _validate_params(self, loc):
+        r""" Validates the arguments of the emulated profiles"""
+        for name in _AXES:
+            validate_argument(loc, name, 'float_array')
+            vals = np.array(loc[name], dtype=float)
+            vmin, vmax = self.ranges[name]
+            margin = 1.0e-10*(vmax-vmin)
+            if np.any(vals < vmin-margin) or np.any(vals > vmax+margin):
+                raise ValueError(f"{name} outside of the emulator range {self.ranges[name]}")
+
+    def eval_surface_density(self, r_proj, log10_mdelta, cdelta, z_cl):
+        r""" Evaluates the emulated surface density
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        log10_mdelta, cdelta, z_cl : array_like, float
+            Logarithm of the mass, concentration and redshift of the cluster (broadcasted
+            together).
+
+        Returns
+        -------
+        array_like
+            Surface density in units of :math:`M_\odot\ Mpc^{-2}` with shape
+            `params.shape+r_proj.shape`.
+        """
+        if self.validate_input:
+            self._validate_params(locals())
+        return np.exp(self._eval_log_profiles(r_proj, log10_mdelta, cdelta, z_cl)[0])
+
+    def eval_excess_surface_density(self, r_proj, log10_mdelta, cdelta, z_cl):
+        r""" Evaluates the emulated excess surface density, see `eval_surface_density`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        log10_mdelta, cdelta, z_cl : array_like, float
+            Logarithm of the mass, concentration and redshift of the cluster (broadcasted
+            together).
+
+        Returns
+        -------
+        array_like
+            Excess surface density in units of :math:`M_\odot\ Mpc^{-2}` with shape
+            `params.shape+r_proj.shape`.
+        """
+        if self.validate_input:
+            self._validate_params(locals())
+        return np.exp(self._eval_log_profiles(r_proj, log10_mdelta, cdelta, z_cl)[1])
+
+    def eval_reduced_tangential_shear(self, r_proj, log10_mdelta, cdelta, z_cl, z_src):
+        r""" Evaluates the emulated reduced tangential shear (single source plane, or
+        individual source redshifts matching `r_proj`), see `eval_surface_density`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        log10_mdelta, cdelta, z_cl : array_like, float
+            Logarithm of the mass, concentration and redshift of the cluster (broadcasted
+            together).
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        array_like
+            Reduced tangential shear with shape `params.shape+r_proj.shape`.
+        """
+        if self.validate_input:
+            self._validate_params(locals())
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+        log_sigma, log_delta_sigma = self._eval_log_profiles(r_proj, log10_mdelta, cdelta, z_cl)
+        params_shape = np.broadcast(log10_mdelta, cdelta, z_cl).shape
+        z_unique, inverse = np.unique(np.broadcast_to(z_cl, params_shape), return_inverse=True)
+        sigma_c = np.array([self.modeling._eval_critical_surface_density(z_len, z_src)
+                            for z_len in z_unique])[inverse.ravel()]
+        sigma_c = sigma_c.reshape(params_shape+(np.shape(r_proj) if sigma_c.ndim > 1
+                                                else (1,)*np.ndim(r_proj)))
+        return compute_reduced_shear_from_convergence(
+            np.exp(log_delta_sigma)/sigma_c, np.exp(log_sigma)/sigma_c)
+
+    def _get_metadata(self):
+        r""" Returns the definitions of the emulated profiles"""
+        return {'backend': self.modeling.backend,
+                'halo_profile_model': self.modeling.halo_profile_model,
+                'massdef': self.modeling.massdef,
+                'delta_mdef': self.modeling.delta_mdef,
+                # slope set by the user (the other backends compute it from the halos)
+                'einasto_alpha': (self.modeling._get_einasto_alpha()
+                                  if self.modeling.halo_profile_model == 'einasto'
+                                  and self.modeling.backend == 'nc' else None),
+                'cosmo': {key: self.modeling.cosmo[key]
+                          for key in ('H0', 'Omega_dm0', 'Omega_b0', 'Omega_k0')},
+                'ranges': self.ranges, 'tol': self.tol, 'n_nodes': self.n_nodes,
+                'max_nodes': self.max_nodes, 'validation_error': self.validation_error}
+
+    def save(self, filename):
+        r""" Saves the emulator to disk
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file (`.npz` format)
+        """
+        np.savez(filename, metadata=json.dumps(self._get_metadata()), coefs=self.coefs)
+
+    @classmethod
+    def load(cls, filename, modeling):
+        r""" Loads an emulator saved with `save`
+
+        Parameters
+        ----------
+        filename: str
+            Name of the file
+        modeling: CLMModeling
+            Modeling object, must have the same backend, profile definitions (including the
+            Einasto slope set with `set_einasto_alpha`) and cosmology as the one used to build
+            the emulator.
+
+        Returns
+        -------
+        ProfileEmulator
+            Loaded emulator
+        """
+        with np.load(filename) as data:
+            metadata = json.loads(str(data['metadata']))
+            coefs = data['coefs']
+        emulator = cls(modeling, *(metadata['ranges'][name] for name in _AXES),
+                       tol=metadata['tol'], n_nodes=metadata['n_nodes'],
+                       max_nodes=metadata['max_nodes'], build=False)
+        current = emulator._get_metadata()
+        for key in ('backend', 'halo_profile_model', 'massdef', 'delta_mdef', 'einasto_alpha'):
+            if current[key] != metadata.get(key):
+                raise ValueError(f"Emulator built with {key}={metadata.get(key)}, modeling has "
+                                 f"{key}={current[key]}")
+        for key, value in metadata['cosmo'].items():
+            if not np.isclose(current['cosmo'][key], value, rtol=1.0e-10):
+                raise ValueError(f"Emulator built with cosmology {metadata['cosmo']}, modeling "
+                                 f"has {current['cosmo']}")
+        emulator.coefs = coefs
+        emulator.validation_error = metadata['validation_error']
+        return emulator
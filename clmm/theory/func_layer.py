@@ -14,7 +14,7 @@ from . generic import compute_reduced_shear_from_convergence, compute_magnificat
 __all__ = generic.__all__+['compute_3d_density', 'compute_surface_density',
                            'compute_excess_surface_density','compute_excess_surface_density_2h', 
                            'compute_surface_density_2h',
-                           'compute_critical_surface_density',
+                           'compute_critical_surface_density', 'convert_mass_concentration',
                            'compute_tangential_shear', 'compute_convergence',
                         'compute_reduced_tangential_shear','compute_magnification',
                            'compute_magnification_bias']
@@ -36,8 +36,9 @@ def compute_3d_density(
         Radial position from the cluster center in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster concentration
+    cdelta : float, str
+        Galaxy cluster concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cl: float
         Redshift of the cluster
     cosmo : clmm.cosmology.Cosmology object
@@ -106,8 +107,9 @@ def compute_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_mdef=200,
         Projected radial position from the cluster center in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster concentration
+    cdelta : float, str
+        Galaxy cluster concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cl: float
         Redshift of the cluster
     cosmo : clmm.cosmology.Cosmology object
@@ -179,8 +181,9 @@ def compute_excess_surface_density(r_proj, mdelta, cdelta, z_cl, cosmo, delta_md
         Projected radial position from the cluster center in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster concentration
+    cdelta : float, str
+        Galaxy cluster concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cl: float
         Redshift of the cluster
     cosmo : clmm.cosmology.Cosmology object
@@ -252,7 +255,8 @@ def compute_excess_surface_density_2h(r_proj, z_cl, cosmo, halobias=1., lsteps=5
     halobias : float, optional
         Value of the halo bias
     lsteps : int, optional
-        Steps for the numerical integration 
+        Number of log-spaced wavenumbers used in the Hankel transform (FFTLog), at least 2048
+        are used
     validate_input: bool
         Validade each input argument
 
@@ -293,7 +297,8 @@ def compute_surface_density_2h(r_proj, z_cl, cosmo, halobias=1, lsteps=500, vali
     halobias : float, optional
         Value of the halo bias
     lsteps : int, optional
-        Steps for the numerical integration 
+        Number of log-spaced wavenumbers used in the Hankel transform (FFTLog), at least 2048
+        are used
     validate_input: bool
         Validade each input argument
 
@@ -346,6 +351,61 @@ def compute_critical_surface_density(cosmo, z_cluster, z_source, validate_input=
     return sigma_c
 
 
+def convert_mass_concentration(mdelta, cdelta, z_cl, cosmo, massdef2, delta_mdef2,
+                               delta_mdef=200, halo_profile_model='nfw', massdef='mean',
+                               alpha_ein=None, validate_input=True):
+    r"""Converts the masses and concentrations of halos to another mass definition (e.g.
+    :math:`M_{200m}\to M_{500c}`), keeping their scale radius and density. All halos are
+    converted at once.
+
+    Parameters
+    ----------
+    mdelta : array_like, float
+        Galaxy cluster masses in :math:`M_\odot`.
+    cdelta : array_like, float
+        Galaxy cluster concentrations
+    z_cl: array_like, float
+        Redshifts of the clusters
+    cosmo : clmm.cosmology.Cosmology object
+        CLMM Cosmology object
+    massdef2 : str
+        Mass definition to convert to (`mean`, `critical`, `virial` - letter case
+        independent).
+    delta_mdef2 : int
+        Overdensity of the mass definition to convert to.
+    delta_mdef : int, optional
+        Mass overdensity definition of the input masses; defaults to 200.
+    halo_profile_model : str, optional
+        Profile model parameterization (`nfw` (default), `einasto`, `hernquist` - letter case
+        independent).
+    massdef : str, optional
+        Profile mass definition of the input masses (`mean` (default), `critical`, `virial` -
+        letter case independent).
+    alpha_ein : array_like, float, optional
+        If `halo_profile_model=='einasto'`, the Einasto slopes, those of the backend if None.
+    validate_input : bool, optional
+        If True (default), the types of the arguments are checked before proceeding.
+
+    Returns
+    -------
+    mdelta2 : array_like, float
+        Masses in the new mass definition in units of :math:`M_\odot`.
+    cdelta2 : array_like, float
+        Concentrations in the new mass definition.
+    """
+    gcm.validate_input = validate_input
+    gcm.set_cosmo(cosmo)
+    gcm.set_halo_density_profile(
+        halo_profile_model=halo_profile_model, massdef=massdef, delta_mdef=delta_mdef)
+
+    mdelta2, cdelta2 = gcm.convert_mass_concentration(
+        z_cl, massdef=massdef2, delta_mdef=delta_mdef2, mdelta=mdelta, cdelta=cdelta,
+        alpha=alpha_ein)
+
+    gcm.validate_input = True
+    return mdelta2, cdelta2
+
+
 def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delta_mdef=200,
                              halo_profile_model='nfw', massdef='mean', alpha_ein=None, z_src_model='single_plane', 
                              verbose=False, validate_input=True):
@@ -365,8 +425,9 @@ def compute_tangential_shear(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo,
         The projected radial positions in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
+    cdelta : float, str
+        Galaxy cluster NFW concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cluster : float
         Galaxy cluster redshift
     z_source : array_like, float
@@ -457,8 +518,9 @@ def compute_convergence(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, delt
         The projected radial positions in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
+    cdelta : float, str
+        Galaxy cluster NFW concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cluster : float
         Galaxy cluster redshift
     z_source : array_like, float
@@ -552,12 +614,14 @@ def compute_reduced_tangential_shear(
         The projected radial positions in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
+    cdelta : float, str
+        Galaxy cluster NFW concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cluster : float
         Galaxy cluster redshift
-    z_source : array_like, float
-        Background source galaxy redshift(s)
+    z_source : array_like, float, callable
+        Background source galaxy redshift(s), or source redshift distribution if
+        `z_src_model=='z_src_distribution'`
     cosmo : clmm.cosmology.Cosmology object
         CLMM Cosmology object
     delta_mdef : int, optional
@@ -586,6 +650,11 @@ def compute_reduced_tangential_shear(
             * `single_plane` (default): all sources at one redshift (if `z_source` is a float) \
                 or known individual source galaxy redshifts (if `z_source` is an array and \
                 `r_proj` is a float);
+            * `known_z_src`: `z_source` are the redshifts of the source population behind \
+                each radius, :math:`\langle \beta_s \rangle` and :math:`\langle \beta_s^2 \rangle` \
+                are computed from them and used in equation (6) of Applegate et al. 2014;
+            * `z_src_distribution`: same as `known_z_src`, with `z_source` being the source \
+                redshift distribution :math:`n(z)` (callable);
             * `applegate14`: use the equation (6) in Weighing the Giants - III \
                 (Applegate et al. 2014; https://arxiv.org/abs/1208.0605) to evaluate tangential reduced shear;
             * `schrabback18`: use the equation (12) in Cluster Mass Calibration at High Redshift \
@@ -613,14 +682,6 @@ def compute_reduced_tangential_shear(
     -------
     gt : array_like, float
         Reduced tangential shear
-
-    Notes
-    -----
-    TODO: Implement `known_z_src` (known individual source galaxy redshifts
-    e.g. discrete case) and `z_src_distribution` (known source redshift
-    distribution e.g. continuous case requiring integration) options for
-    `z_src_model`. We will need :math:`\gamma_\infty` and :math:`\kappa_\infty`
-    for alternative z_src_models using :math:`\beta_s`.
     """
     gcm.validate_input = validate_input
     gcm.set_cosmo(cosmo)
@@ -655,8 +716,9 @@ def compute_magnification(r_proj, mdelta, cdelta, z_cluster, z_source, cosmo, de
         The projected radial positions in :math:`M\!pc`.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
+    cdelta : float, str
+        Galaxy cluster NFW concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cluster : float
         Galaxy cluster redshift
     z_source : array_like, float
@@ -768,8 +830,9 @@ def compute_magnification_bias(r_proj, alpha, mdelta, cdelta, z_cluster, z_sourc
         The slope of the cummulative source number counts.
     mdelta : float
         Galaxy cluster mass in :math:`M_\odot`.
-    cdelta : float
-        Galaxy cluster NFW concentration.
+    cdelta : float, str
+        Galaxy cluster NFW concentration, or name of a concentration-mass relation (see
+        `CLMModeling.set_concentration`)
     z_cluster : float
         Galaxy cluster redshift
     z_source : array_like, float
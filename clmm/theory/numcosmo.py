@@ -71,6 +71,11 @@ class NumCosmoCLMModeling(CLMModeling):
         self.cosmo.smd = Nc.WLSurfaceMassDensity.new(self.cosmo.dist)
         self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
 
+    def _get_cosmo_state(self):
+        """"get the values that define the current cosmology"""
+        return (id(self.cosmo), id(self.cosmo.be_cosmo), id(self.cosmo.smd),
+                self.cosmo._get_version())
+
     def _set_halo_density_profile(self, halo_profile_model='nfw', massdef='mean', delta_mdef=200):
         """"set halo density profile"""
         # Check if we have already an instance of the required object, if not create one
@@ -122,6 +127,14 @@ class NumCosmoCLMModeling(CLMModeling):
         """"set mass"""
         self.hdpm.props.log10MDelta = math.log10(mdelta)
 
+    def _get_concentration(self):
+        """"get concentration"""
+        return self.hdpm.props.cDelta
+
+    def _get_mass(self):
+        """"get mass"""
+        return 10.**self.hdpm.props.log10MDelta
+
     def _set_einasto_alpha(self, alpha):
         self.hdpm.props.alpha = alpha
 
@@ -133,53 +146,42 @@ class NumCosmoCLMModeling(CLMModeling):
 
     def _eval_3d_density(self, r3d, z_cl):
         """"eval 3d density"""
-        func = lambda r3d, z_cl: self.hdpm.eval_density(
-            self.cosmo.be_cosmo, r3d, z_cl)
-        return np.vectorize(func)(r3d, z_cl)
+        # one NumCosmo array call for each distinct cluster redshift
+        r3d, z_cl = np.broadcast_arrays(np.array(r3d, dtype=float), np.array(z_cl, dtype=float))
+        res = np.zeros(r3d.shape)
+        for z_cl_ in np.unique(z_cl):
+            sel = z_cl == z_cl_
+            res[sel] = self.hdpm.eval_density_array(
+                self.cosmo.be_cosmo, r3d[sel], 1.0, 1.0, float(z_cl_))
+        return res
 
     def _eval_surface_density(self, r_proj, z_cl):
         """"eval surface density"""
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-        func = lambda r_proj, z_cl: self.cosmo.smd.sigma(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_cl)
-        return np.vectorize(func)(r_proj, z_cl)
+        self.cosmo._prepare_if_needed()
+        return np.reshape(self.cosmo.smd.sigma_array(
+            self.hdpm, self.cosmo.be_cosmo, np.atleast_1d(r_proj), 1.0, 1.0, z_cl),
+                          np.shape(r_proj))
 
     def _eval_mean_surface_density(self, r_proj, z_cl):
         """"eval mean surface density"""
-
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-        func = lambda r_proj, z_cl: self.cosmo.smd.sigma_mean(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_cl)
-        return np.vectorize(func)(r_proj, z_cl)
+        # mean surface density = surface density + excess surface density
+        return (self._eval_surface_density(r_proj, z_cl)
+                +self._eval_excess_surface_density(r_proj, z_cl))
 
     def _eval_excess_surface_density(self, r_proj, z_cl):
         """"eval excess surface density"""
-
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-        func = lambda r_proj, z_cl: self.cosmo.smd.sigma_excess(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_cl)
-        return np.vectorize(func)(r_proj, z_cl)
-
-    def _eval_tangential_shear(self, r_proj, z_cl, z_src):
-        """"eval tangential shear"""
-
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-        func = lambda r_proj, z_src, z_cl: self.cosmo.smd.shear(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_src, z_cl, z_cl)
-        return np.vectorize(func)(r_proj, z_src, z_cl)
-
-    def _eval_convergence(self, r_proj, z_cl, z_src):
-        """"eval convergence"""
-
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-        func = lambda r_proj, z_src, z_cl: self.cosmo.smd.convergence(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_src, z_cl, z_cl)
-        return np.vectorize(func)(r_proj, z_src, z_cl)
+        self.cosmo._prepare_if_needed()
+        return np.reshape(self.cosmo.smd.sigma_excess_array(
+            self.hdpm, self.cosmo.be_cosmo, np.atleast_1d(r_proj), 1.0, 1.0, z_cl),
+                          np.shape(r_proj))
 
     def _eval_reduced_tangential_shear_sp(self, r_proj, z_cl, z_src):
         """"eval reduced tangential shear considering a single redshift plane for background sources"""
+        if self._get_radial_grid(r_proj) is not None:
+            # many radii (e.g. per galaxy), interpolate the profiles from a radial grid
+            return super()._eval_reduced_tangential_shear_sp(r_proj, z_cl, z_src)
 
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
+        self.cosmo._prepare_if_needed()
         if (isinstance(r_proj, (list, np.ndarray))
                 and isinstance(z_src, (list, np.ndarray))
                 and len(r_proj) == len(z_src)):
@@ -189,13 +191,4 @@ class NumCosmoCLMModeling(CLMModeling):
         return func(self.hdpm, self.cosmo.be_cosmo, np.atleast_1d(r_proj), 1.0,
                     1.0, np.atleast_1d(z_src), z_cl, z_cl)
 
-    def _eval_magnification(self, r_proj, z_cl, z_src):
-        """"eval magnification"""
-
-        self.cosmo.smd.prepare_if_needed(self.cosmo.be_cosmo)
-
-        func = lambda r_proj, z_src, z_cl: self.cosmo.smd.magnification(
-            self.hdpm, self.cosmo.be_cosmo, r_proj, z_src, z_cl, z_cl)
-        return np.vectorize(func)(r_proj, z_src, z_cl)
-
 Modeling = NumCosmoCLMModeling
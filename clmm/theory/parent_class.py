@@ -4,14 +4,38 @@ CLMModeling abstract class
 import numpy as np
 
 # functions for the 2h term
-from scipy.integrate import simps
-from scipy.special import jv
-from scipy.interpolate import interp1d
+from scipy.special import loggamma, gammainc
+from scipy.interpolate import CubicSpline
 
 from .generic import compute_reduced_shear_from_convergence
 import warnings
 from .generic import compute_reduced_shear_from_convergence, compute_magnification_bias_from_magnification
 from ..utils import validate_argument
+from .concentration import (
+    _CONCENTRATION_RELATIONS, _get_mass_definition_name, _eval_concentration_relation)
+
+_LENSING_OBSERVABLES = ('surface_density', 'mean_surface_density', 'excess_surface_density',
+                        'critical_surface_density', 'tangential_shear', 'convergence',
+                        'reduced_tangential_shear', 'magnification', 'magnification_bias')
+
+# Miscentering offset distributions: pdf of the offset u=R_s/R_mis and its maximum value used
+# in the integration
+_MISCENTERING_MODELS = {'rayleigh': (lambda u: u*np.exp(-0.5*u**2), 7.),
+                        'exponential': (lambda u: u*np.exp(-u), 30.)}
+
+# Parameters tracked between evaluations, maximum number of cached cosmology-level
+# prefactors, and maximum size of their array arguments (only the prefactor of the last larger
+# input, e.g. per-galaxy source redshifts, is kept)
+_STATE_PARAMS = ('cosmo', 'profile', 'mass', 'concentration', 'z_cl')
+_MAX_PREFACTORS = 256
+_MAX_PREFACTOR_ARRAY_SIZE = 1000
+
+# Minimum number of log-spaced wavenumbers (from 1e-5 to 1e5 Mpc^-1) of the FFTLog transform
+# of the 2-halo term, relative precision ~1e-6
+_2H_FFTLOG_NPTS = 2048
+
+# Masses (log10, in M_sun) used to tabulate the concentration-mass relations
+_CONCENTRATION_LOG10_MASS = np.linspace(10., 16.5, 131)
 
 
 class CLMModeling:
@@ -39,6 +63,11 @@ class CLMModeling:
         Validade each input argument
     cosmo_class: type
         Type of used cosmology objects
+    radial_grid_npts_per_decade: int
+        Number of points per decade of the radial grid used to interpolate the profiles when
+        they are evaluated at many radii (e.g. per galaxy), and of the miscentering kernels
+    cdelta_relation: str, None
+        Concentration-mass relation used to set the concentration, None if it is fixed
     """
     # pylint: disable=too-many-instance-attributes
 
@@ -57,6 +86,13 @@ class CLMModeling:
 
         self.validate_input = validate_input
         self.cosmo_class = None
+        self.radial_grid_npts_per_decade = 40
+        self.cdelta_relation = None
+        self._miscentering_kernels = {}
+        self._state = {}
+        self._state_objects = ()
+        self._state_versions = dict.fromkeys(_STATE_PARAMS, 0)
+        self._prefactors = {}
 
 
     def set_cosmo(self, cosmo):
@@ -78,6 +114,95 @@ class CLMModeling:
         r""" Sets the cosmology to the internal cosmology object"""
         self.cosmo = cosmo if cosmo is not None else self.cosmo_class()
 
+    def _get_cosmo_state(self):
+        r""" Returns the values that define the current cosmology, used to detect changes"""
+        return (id(self.cosmo), id(self.cosmo.be_cosmo), self.cosmo._get_version())
+
+    def _update_state(self, z_cl=None):
+        r""" Updates the record of the parameters used in the evaluations.
+
+        The cosmology, profile definition, mass, concentration and cluster redshift are compared
+        with their values at the last evaluation, and the version of each one that changed is
+        incremented, so that the caches of the evaluations only redo the work that depends on
+        the parameters that changed. The cosmology-level prefactors are emptied when the
+        cosmology changes.
+
+        Parameters
+        ----------
+        z_cl: float, array_like, None
+            Redshift of the cluster, not updated if None.
+
+        Returns
+        -------
+        tuple
+            Versions of the cosmology, profile definition, mass, concentration and cluster
+            redshift.
+        """
+        state = {'cosmo': self._get_cosmo_state(),
+                 'profile': (self.halo_profile_model, self.massdef, self.delta_mdef,
+                             id(self.hdpm)),
+                 'mass': self._get_mass(),
+                 'concentration': self._get_concentration()}
+        if z_cl is not None:
+            state['z_cl'] = _get_state_value(z_cl)
+        for name, value in state.items():
+            if name not in self._state or self._state[name] != value:
+                self._state_versions[name] += 1
+                self._state[name] = value
+        if self._state_versions['cosmo'] != self._prefactors.get('cosmo_version'):
+            self._prefactors = {'cosmo_version': self._state_versions['cosmo']}
+        # the objects are kept so that their ids in the state are not reused
+        self._state_objects = (self.cosmo, self.cosmo.be_cosmo, self.hdpm)
+        return tuple(self._state_versions[name] for name in _STATE_PARAMS)
+
+    def _get_prefactor(self, key, func):
+        r""" Returns a cosmology-level quantity (e.g. critical surface density), computed with
+        `func` only if it is not cached for the current cosmology.
+
+        Up to `_MAX_PREFACTORS` quantities are kept. The arguments with more than
+        `_MAX_PREFACTOR_ARRAY_SIZE` values are not hashed: only the quantity of the last such
+        input is kept (with a copy of the arguments), and it is reused if they are equal.
+
+        Parameters
+        ----------
+        key: tuple
+            Name of the quantity and values of its arguments (str, float or array_like)
+        func: callable
+            Function without arguments that computes the quantity
+
+        Returns
+        -------
+        float, array_like
+            Value of the quantity (arrays are read only)
+        """
+        self._update_state()
+        large = [np.size(val) > _MAX_PREFACTOR_ARRAY_SIZE for val in key]
+        arrays = tuple(np.array(val, dtype=float) for val, is_large in zip(key, large)
+                       if is_large)
+        key = tuple(None if is_large else val if isinstance(val, str) else _get_state_value(val)
+                    for val, is_large in zip(key, large))
+        if arrays:
+            last = self._prefactors.get('last_large_input')
+            if (last is None or last[0] != key or any(
+                    not np.array_equal(array, last_array)
+                    for array, last_array in zip(arrays, last[1]))):
+                last = (key, arrays, self._compute_prefactor(func))
+                self._prefactors['last_large_input'] = last
+            return last[2]
+        if key not in self._prefactors:
+            if len(self._prefactors) > _MAX_PREFACTORS:
+                self._prefactors = {'cosmo_version': self._prefactors['cosmo_version']}
+            self._prefactors[key] = self._compute_prefactor(func)
+        return self._prefactors[key]
+
+    @staticmethod
+    def _compute_prefactor(func):
+        r""" Computes a cosmology-level quantity with `func`, arrays are made read only"""
+        value = func()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        return value
+
     def set_halo_density_profile(self, halo_profile_model='nfw', massdef='mean', delta_mdef=200):
         r""" Sets the definitions for the halo profile
 
@@ -153,6 +278,8 @@ class CLMModeling:
         if self.halo_profile_model!='einasto':
             raise ValueError(f"Wrong profile model. Current profile = {self.halo_profile_model}")
         else:
+            if z_cl is not None:
+                self._set_concentration_from_relation(z_cl)
             return self._get_einasto_alpha(z_cl)
 
     def _get_einasto_alpha(self, z_cl=None):
@@ -164,17 +291,130 @@ class CLMModeling:
 
         Parameters
         ----------
-        cdelta: float
-            Concentration
+        cdelta: float, str
+            Concentration, or name of a concentration-mass relation used to compute it from the
+            mass and redshift of the cluster in each evaluation (letter case independent):
+
+                * `duffy08`: Duffy et al. (2008), for :math:`\Delta=200` mean or critical and
+                  virial masses;
+                * `bhattacharya13`: Bhattacharya et al. (2013), for :math:`\Delta=200` mean or
+                  critical and virial masses;
+                * `diemer15`: Diemer & Kravtsov (2015), for :math:`\Delta=200` critical masses.
+
+        Notes
+        -----
+        With a concentration-mass relation, the derivatives with respect to the mass (e.g.
+        `eval_surface_density_jacobian`) are still taken at fixed concentration.
         """
-        if self.validate_input:
-            validate_argument(locals(), 'cdelta', float, argmin=0)
-        self._set_concentration(cdelta)
+        if isinstance(cdelta, str):
+            relation = cdelta.lower()
+            if self.validate_input:
+                self._validate_concentration_relation(relation)
+            self.cdelta_relation = relation
+        else:
+            if self.validate_input:
+                validate_argument(locals(), 'cdelta', float, argmin=0)
+            self.cdelta_relation = None
+            self._set_concentration(cdelta)
 
     def _set_concentration(self, cdelta):
         r""" Actuall sets the value of the concentration (without value check)"""
         raise NotImplementedError
 
+    def _get_concentration(self):
+        r""" Returns the value of the concentration"""
+        raise NotImplementedError
+
+    def _get_mass(self):
+        r""" Returns the value of the :math:`M_\Delta`"""
+        raise NotImplementedError
+
+    def eval_concentration(self, mdelta, z_cl, relation=None):
+        r""" Computes the concentrations of a concentration-mass relation for the mass definition
+        and cosmology of the model (vectorized)
+
+        Parameters
+        ----------
+        mdelta : array_like, float
+            Galaxy cluster masses :math:`M_\Delta` in units of :math:`M_\odot`
+        z_cl : array_like, float
+            Redshift(s) of the clusters, broadcastable with mdelta
+        relation : str, None
+            Concentration-mass relation (see `set_concentration`), the current one if None
+
+        Returns
+        -------
+        array_like, float
+            Concentrations
+
+        Notes
+        -----
+        The relations are tabulated in :math:`\log_{10}M_\Delta` for each redshift when first
+        needed, and the tables are kept until the cosmology changes, so that evaluations on
+        mass grids or in mass fits only interpolate them.
+        """
+        relation = self.cdelta_relation if relation is None else relation.lower()
+        if self.validate_input:
+            validate_argument(locals(), 'mdelta', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', 'float_array', argmin=0, eqmin=True)
+            if relation is None:
+                raise ValueError("No concentration-mass relation is set")
+            self._validate_concentration_relation(relation)
+        return self._eval_concentration(mdelta, z_cl, relation)
+
+    def _validate_concentration_relation(self, relation):
+        r""" Checks that a concentration-mass relation exists for the current mass definition"""
+        if relation not in _CONCENTRATION_RELATIONS:
+            raise ValueError(f"Concentration-mass relation {relation} not currently supported")
+        if (_get_mass_definition_name(self.massdef, self.delta_mdef)
+                not in _CONCENTRATION_RELATIONS[relation]):
+            raise ValueError(
+                f"Concentration-mass relation {relation} not defined for the mass definition "
+                f"{self.massdef} with delta_mdef={self.delta_mdef}")
+
+    def _eval_concentration(self, mdelta, z_cl, relation):
+        r""" Computes the concentrations of a concentration-mass relation (without input check)
+        """
+        log10_mdelta, z_cl = np.broadcast_arrays(np.log10(mdelta), np.array(z_cl, dtype=float))
+        cdelta = np.zeros(log10_mdelta.shape)
+        for z_val in np.unique(z_cl):
+            sel = z_cl == z_val
+            cdelta[sel] = self._eval_concentration_single_z(log10_mdelta[sel], z_val, relation)
+        return cdelta if cdelta.ndim > 0 else float(cdelta)
+
+    def _eval_concentration_single_z(self, log10_mdelta, z_cl, relation):
+        r""" Computes the concentrations at one redshift from the table of the relation, or
+        directly for masses outside of the table"""
+        mdef_name = _get_mass_definition_name(self.massdef, self.delta_mdef)
+        if mdef_name not in _CONCENTRATION_RELATIONS[relation]:
+            self._validate_concentration_relation(relation)
+        in_table = ((log10_mdelta >= _CONCENTRATION_LOG10_MASS[0])
+                    & (log10_mdelta <= _CONCENTRATION_LOG10_MASS[-1]))
+        cdelta = np.zeros(log10_mdelta.shape)
+        if np.any(in_table):
+            table = self._get_prefactor(
+                ('concentration', relation, mdef_name, z_cl),
+                lambda: CubicSpline(_CONCENTRATION_LOG10_MASS, np.log(
+                    _eval_concentration_relation(relation, 10.**_CONCENTRATION_LOG10_MASS,
+                                                 z_cl, self.cosmo, mdef_name))))
+            cdelta[in_table] = np.exp(table(log10_mdelta[in_table]))
+        if not np.all(in_table):
+            cdelta[~in_table] = _eval_concentration_relation(
+                relation, 10.**log10_mdelta[~in_table], z_cl, self.cosmo, mdef_name)
+        return cdelta
+
+    def _set_concentration_from_relation(self, z_cl):
+        r""" Sets the concentration of the current mass at the redshift of the cluster, if a
+        concentration-mass relation is used"""
+        if self.cdelta_relation is None:
+            return
+        z_vals = np.unique(z_cl)
+        if z_vals.size > 1:
+            raise ValueError(
+                "A concentration-mass relation requires a single redshift of the cluster")
+        self._set_concentration(self._eval_concentration(
+            self._get_mass(), z_vals[0], self.cdelta_relation))
+
     def eval_3d_density(self, r3d, z_cl, verbose=False):
         r"""Retrieve the 3d density :math:`\rho(r)`.
 
@@ -194,6 +434,7 @@ class CLMModeling:
             validate_argument(locals(), 'r3d', 'float_array', argmin=0)
             validate_argument(locals(), 'z_cl', 'float_array', argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
@@ -202,6 +443,102 @@ class CLMModeling:
     def _eval_3d_density(self, r3d, z_cl):
         raise NotImplementedError
 
+    def convert_mass_concentration(self, z_cl, massdef=None, delta_mdef=None, mdelta=None,
+                                   cdelta=None, alpha=None):
+        r"""Converts the masses and concentrations of halos with the current profile model to
+        another mass definition (e.g. :math:`M_{200m}\to M_{500c}`).
+
+        The scale radius and density of each halo are kept, and its new radius is the one
+        where the mean enclosed density is :math:`\Delta'\rho'(z)`. It is found for all halos
+        at once by a safeguarded Newton iteration on the analytic enclosed mass of the NFW,
+        Einasto or Hernquist profile.
+
+        Parameters
+        ----------
+        z_cl : array_like, float
+            Redshift(s) of the halos
+        massdef : str, None
+            Mass definition to convert to (`mean`, `critical`, `virial` - letter case
+            independent), the current one if None.
+        delta_mdef : int, None
+            Overdensity of the mass definition to convert to, the current one if None.
+        mdelta : array_like, float, None
+            Masses :math:`M_\Delta` in units of :math:`M_\odot` in the current mass definition,
+            the current mass if None.
+        cdelta : array_like, float, None
+            Concentrations in the current mass definition, the current concentration (or the one
+            of the concentration-mass relation, see `set_concentration`) if None.
+        alpha : array_like, float, None
+            Einasto slopes (`einasto` profile only), those of the backend if None.
+
+        Returns
+        -------
+        mdelta2 : array_like, float
+            Masses in the new mass definition in units of :math:`M_\odot`.
+        cdelta2 : array_like, float
+            Concentrations in the new mass definition.
+
+        Notes
+        -----
+        The outputs have the broadcast shape of `z_cl`, `mdelta`, `cdelta` and `alpha`. For the
+        `virial` mass definition, `delta_mdef` is ignored by the backends that use the
+        overdensity of Bryan & Norman (1998).
+        """
+        massdef = self.massdef if massdef is None else massdef.lower()
+        delta_mdef = self.delta_mdef if delta_mdef is None else delta_mdef
+        if self.validate_input:
+            validate_argument(locals(), 'z_cl', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'massdef', str)
+            validate_argument(locals(), 'delta_mdef', int, argmin=0)
+            validate_argument(locals(), 'mdelta', 'float_array', argmin=0, none_ok=True)
+            validate_argument(locals(), 'cdelta', 'float_array', argmin=0, none_ok=True)
+            validate_argument(locals(), 'alpha', 'float_array', argmin=0, none_ok=True)
+            if not massdef in self.mdef_dict:
+                raise ValueError(
+                    f"Halo density profile mass definition {massdef} not currently supported")
+        mdelta = self._get_mass() if mdelta is None else mdelta
+        if cdelta is None:
+            cdelta = (self._get_concentration() if self.cdelta_relation is None
+                      else self._eval_concentration(mdelta, z_cl, self.cdelta_relation))
+        return self._convert_mass_concentration(
+            z_cl, massdef, delta_mdef, mdelta, cdelta, alpha)
+
+    def _convert_mass_concentration(self, z_cl, massdef, delta_mdef, mdelta, cdelta,
+                                    alpha=None):
+        r""" Converts masses and concentrations to another mass definition (without input
+        check)"""
+        z_unique, inverse = np.unique(z_cl, return_inverse=True)
+        log_density_ratio = np.reshape(
+            np.log(self._get_overdensity_density(massdef, delta_mdef, z_unique)
+                   /self._get_overdensity_density(self.massdef, self.delta_mdef, z_unique)
+                   )[inverse], np.shape(z_cl))
+        if self.halo_profile_model == 'einasto' and alpha is None:
+            alpha = self._get_einasto_alpha_halos(mdelta, cdelta, z_cl)
+        mdelta2, cdelta2 = _convert_profile_mass_concentration(
+            mdelta, cdelta, log_density_ratio, self.halo_profile_model, alpha)
+        if mdelta2.ndim == 0:
+            return float(mdelta2), float(cdelta2)
+        return mdelta2, cdelta2
+
+    def _get_overdensity_density(self, massdef, delta_mdef, z_cl):
+        r""" Returns the density :math:`\Delta\rho(z)` that the mean density inside the radius
+        of the halos equals in a mass definition, in units of :math:`M_\odot\ Mpc^{-3}`
+        (the `virial` overdensity is the one of Bryan & Norman 1998, relative to the critical
+        density)"""
+        rho_m = self.cosmo._get_rho_m(z_cl)
+        if massdef == 'mean':
+            return delta_mdef*rho_m
+        omega_m = self.cosmo._get_Omega_m(z_cl)
+        if massdef == 'virial':
+            delta_mdef = 18.*np.pi**2+82.*(omega_m-1.)-39.*(omega_m-1.)**2
+        return delta_mdef*rho_m/omega_m
+
+    def _get_einasto_alpha_halos(self, mdelta, cdelta, z_cl):
+        r""" Returns the Einasto slopes of halos of masses mdelta and concentrations cdelta
+        (vectorized). The slope of the backend does not depend on them by default."""
+        return np.broadcast_to(self._get_einasto_alpha(z_cl),
+                               np.broadcast(mdelta, cdelta, z_cl).shape)
+
     def eval_critical_surface_density(self, z_len, z_src):
         r"""Computes the critical surface density
 
@@ -223,6 +560,17 @@ class CLMModeling:
         return self._eval_critical_surface_density(z_len=z_len, z_src=z_src)
 
     def _eval_critical_surface_density(self, z_len, z_src):
+        return self._get_prefactor(
+            ('sigma_crit', z_len, z_src),
+            lambda: self._compute_critical_surface_density(z_len, z_src))
+
+    def _compute_critical_surface_density(self, z_len, z_src):
+        r""" Computes the critical surface density (without cache)"""
+        if np.size(z_src) > 1:
+            # sources often share redshifts (e.g. single plane mocks), compute each only once
+            z_unique, inverse = np.unique(z_src, return_inverse=True)
+            sigma_c = np.atleast_1d(self.cosmo.eval_sigma_crit(z_len, z_unique))
+            return np.reshape(sigma_c[inverse], np.shape(z_src))
         return self.cosmo.eval_sigma_crit(z_len, z_src)
 
     def eval_surface_density(self, r_proj, z_cl, verbose=False):
@@ -244,6 +592,7 @@ class CLMModeling:
             validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
             validate_argument(locals(), 'z_cl', float, argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
@@ -272,6 +621,7 @@ class CLMModeling:
             validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
             validate_argument(locals(), 'z_cl', float, argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
@@ -299,6 +649,7 @@ class CLMModeling:
             validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
             validate_argument(locals(), 'z_cl', float, argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
@@ -307,8 +658,83 @@ class CLMModeling:
     def _eval_excess_surface_density(self, r_proj, z_cl):
         raise NotImplementedError
 
+    def eval_surface_densities(self, r_proj, z_cl, verbose=False):
+        r""" Computes the surface density, the mean surface density and the excess surface
+        density in a single evaluation
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        tuple
+            Surface density, mean surface density and excess surface density in units of
+            :math:`M_\odot\ Mpc^{-2}`.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+
+        self._set_concentration_from_relation(z_cl)
+        if self.halo_profile_model=='einasto' and verbose:
+            print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
+
+        return self._eval_surface_densities(r_proj=r_proj, z_cl=z_cl)
+
+    def _eval_surface_densities(self, r_proj, z_cl):
+        sigma = self._eval_surface_density(r_proj=r_proj, z_cl=z_cl)
+        deltasigma = self._eval_excess_surface_density(r_proj=r_proj, z_cl=z_cl)
+        return sigma, sigma+deltasigma, deltasigma
+
+    def _get_radial_grid(self, r_proj):
+        r""" Returns the log-spaced radial grid covering `r_proj` with
+        `radial_grid_npts_per_decade` points per decade.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+
+        Returns
+        -------
+        array_like, None
+            Logarithm of the radial grid, None if it would not have fewer points than `r_proj`.
+        """
+        if np.size(r_proj) < 4:
+            return None
+        log_rmin, log_rmax = np.log(np.min(r_proj)), np.log(np.max(r_proj))
+        npts = max(4, int(np.ceil(
+            (log_rmax-log_rmin)/np.log(10.)*self.radial_grid_npts_per_decade))+1)
+        if npts >= np.size(r_proj) or log_rmax == log_rmin:
+            return None
+        return np.linspace(log_rmin, log_rmax, npts)
+
+    def _eval_surface_densities_on_grid(self, r_proj, z_cl):
+        r""" Computes the surface density, the mean surface density and the excess surface
+        density at many radii (e.g. one per galaxy).
+
+        When there are more radii than points in the grid from `_get_radial_grid`, the profiles
+        are computed on the grid and interpolated (cubic spline in log-log space), otherwise each
+        distinct radius is computed once.
+        """
+        log_r_grid = self._get_radial_grid(r_proj)
+        if log_r_grid is None:
+            if np.size(r_proj) > 1:
+                r_unique, inverse = np.unique(r_proj, return_inverse=True)
+                if r_unique.size < np.size(r_proj):
+                    return tuple(np.reshape(np.atleast_1d(vals)[inverse], np.shape(r_proj))
+                                 for vals in self._eval_surface_densities(r_unique, z_cl))
+            return self._eval_surface_densities(r_proj, z_cl)
+        log_r = np.log(r_proj)
+        return tuple(np.exp(CubicSpline(log_r_grid, np.log(vals))(log_r))
+                     for vals in self._eval_surface_densities(np.exp(log_r_grid), z_cl))
+
     def eval_excess_surface_density_2h(self, r_proj, z_cl, halobias=1., lsteps=500):
-        r""" Computes the 2-halo term excess surface density (CCL backend only)
+        r""" Computes the 2-halo term excess surface density
 
         Parameters
         ----------
@@ -319,7 +745,8 @@ class CLMModeling:
         halobias : float, optional
             Value of the halo bias
         lsteps: int (optional)
-            Number of steps for numerical integration
+            Number of log-spaced wavenumbers used in the Hankel transform, at least
+            `_2H_FFTLOG_NPTS` (2048) are used
 
         Returns
         -------
@@ -333,35 +760,14 @@ class CLMModeling:
             validate_argument(locals(), 'lsteps', int, argmin=1)
             validate_argument(locals(), 'halobias', float, argmin=0)
 
-
-        if self.backend not in ('ccl', 'nc'):
-            raise NotImplementedError(
-                f"2-halo term not currently supported with the {self.backend} backend. "
-                "Use the CCL or NumCosmo backend instead")
-        else:
-            return self._eval_excess_surface_density_2h(r_proj, z_cl, halobias=halobias, lsteps=lsteps)
+        return self._eval_excess_surface_density_2h(r_proj, z_cl, halobias=halobias, lsteps=lsteps)
 
     def _eval_excess_surface_density_2h(self, r_proj, z_cl, halobias=1.,lsteps=500):
         """"eval excess surface density from the 2-halo term"""
-        da = self.cosmo.eval_da(z_cl)
-        rho_m = self.cosmo._get_rho_m(z_cl)
-
-        kk = np.logspace(-5.,5.,1000)
-        pk = self.cosmo._eval_linear_matter_powerspectrum(kk, z_cl)
-        interp_pk = interp1d(kk, pk, kind='cubic')
-        theta = r_proj / da
-
-        # calculate integral, units [Mpc]**-3
-        def __integrand__( l , theta ):
-            k = l / ((1 + z_cl) * da)
-            return l * jv( 2 , l * theta ) * interp_pk( k )
-
-        ll = np.logspace( 0 , 6 , lsteps )
-        val = np.array( [ simps( __integrand__( ll , t ) , ll ) for t in theta ] )
-        return halobias * val * rho_m / ( 2 * np.pi  * ( 1 + z_cl )**3 * da**2 )
+        return halobias*self._eval_2h_hankel_transform(r_proj, z_cl, order=2, lsteps=lsteps)
 
     def eval_surface_density_2h(self, r_proj, z_cl, halobias=1., lsteps=500):
-        r""" Computes the 2-halo term surface density (CCL backend only)
+        r""" Computes the 2-halo term surface density
 
         Parameters
         ----------
@@ -372,7 +778,8 @@ class CLMModeling:
         halobias : float, optional
            Value of the halo bias
         lsteps: int (optional)
-            Number of steps for numerical integration
+            Number of log-spaced wavenumbers used in the Hankel transform, at least
+            `_2H_FFTLOG_NPTS` (2048) are used
 
         Returns
         -------
@@ -385,34 +792,448 @@ class CLMModeling:
             validate_argument(locals(), 'z_cl', float, argmin=0)
             validate_argument(locals(), 'lsteps', int, argmin=1)
             validate_argument(locals(), 'halobias', float, argmin=0)
-
-        if self.backend not in ('ccl', 'nc'):
-            raise NotImplementedError(
-                f"2-halo term not currently supported with the {self.backend} backend. "
-                "Use the CCL or NumCosmo backend instead")
-        else:
-            return self._eval_surface_density_2h(r_proj, z_cl, halobias=halobias, lsteps=lsteps)
+        return self._eval_surface_density_2h(r_proj, z_cl, halobias=halobias, lsteps=lsteps)
 
     def _eval_surface_density_2h(self, r_proj, z_cl, halobias=1., lsteps=500):
         """"eval surface density from the 2-halo term"""
-        da = self.cosmo.eval_da(z_cl)
-        rho_m = self.cosmo._get_rho_m(z_cl)
+        return halobias*self._eval_2h_hankel_transform(r_proj, z_cl, order=0, lsteps=lsteps)
 
-        kk = np.logspace(-5.,5.,1000)
-        pk = self.cosmo._eval_linear_matter_powerspectrum(kk, z_cl)
-        interp_pk = interp1d(kk, pk, kind='cubic')
-        theta = r_proj / da
+    def _eval_2h_hankel_transform(self, r_proj, z_cl, order, lsteps=500):
+        r""" Computes the 2-halo term projected profile (for a unit halo bias) for all radii at
+        once, using the FFTLog algorithm (Hamilton 2000) for the Hankel transform of the linear
+        matter power spectrum.
 
-        # calculate integral, units [Mpc]**-3
-        def __integrand__( l , theta ):
-            k = l / ((1 + z_cl) * da)
-            return l * jv( 0 , l * theta ) * interp_pk( k )
+        Changing variables to :math:`k_l = l/(D_A(z)(1+z))`, the integrals over :math:`l` of
+        eq.(13) of Oguri & Hamana (2011) become
+
+        .. math::
+            \frac{\rho_m(z)}{2\pi(1+z)}\int k\,dk\,P_{\rm mm}(k, z)J_n(k R (1+z))
+
+        which is evaluated on a log-spaced grid of comoving radii and interpolated at the
+        requested radii. The tabulated profile is cached in the cosmology object for each
+        redshift, so repeated evaluations with the same cosmology are interpolations only.
+        With the default `_2H_FFTLOG_NPTS` wavenumbers, the relative precision is
+        :math:`\sim10^{-6}` between 0.1 and 30 Mpc (:math:`\sim10^{-5}` with 500 wavenumbers,
+        and a few percent with 100).
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        order: int
+            Order of the Bessel function (0 for surface density, 2 for excess surface density)
+        lsteps: int (optional)
+            Number of log-spaced wavenumbers used in the transform, at least `_2H_FFTLOG_NPTS`
+            are used
+
+        Returns
+        -------
+        array_like, float
+            2-halo term profile for a unit halo bias in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        npts = max(lsteps, _2H_FFTLOG_NPTS)
+        cache = self.cosmo._get_cache()
+        key = ('2h_hankel_transform', order, z_cl, npts)
+        if key not in cache:
+            kk = np.logspace(-5., 5., npts)
+            pk = self.cosmo._eval_linear_matter_powerspectrum_cached(kk, z_cl)
+            r_com, transf = _fftlog_hankel_transform(kk, pk, order)
+            rho_m = self.cosmo._get_rho_m(z_cl)
+            # r_com is decreasing, interpolation requires increasing values
+            cache[key] = CubicSpline(np.log(r_com[::-1]),
+                                     transf[::-1]*rho_m/(2.*np.pi*(1.+z_cl)))
+        return cache[key](np.log(np.array(r_proj)*(1.+z_cl)))
+
+    def eval_surface_density_jacobian(self, r_proj, z_cl):
+        r""" Computes the derivatives of the surface density with respect to
+        :math:`\log_{10}M_\Delta` and :math:`c_\Delta`
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        array_like
+            Derivatives with shape `r_proj.shape+(2,)`, the last axis being
+            (:math:`\partial/\partial\log_{10}M_\Delta`, :math:`\partial/\partial c_\Delta`),
+            in units of :math:`M_\odot\ Mpc^{-2}`.
+
+        Notes
+        -----
+        The derivatives are analytic for the NFW and Hernquist profiles (with the `mean` and
+        `critical` mass definitions), and computed with central finite differences otherwise.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_surface_densities_jacobian(r_proj, z_cl)[0]
+
+    def eval_excess_surface_density_jacobian(self, r_proj, z_cl):
+        r""" Computes the derivatives of the excess surface density with respect to
+        :math:`\log_{10}M_\Delta` and :math:`c_\Delta`, see `eval_surface_density_jacobian`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+
+        Returns
+        -------
+        array_like
+            Derivatives with shape `r_proj.shape+(2,)` in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_surface_densities_jacobian(r_proj, z_cl)[2]
+
+    def eval_convergence_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the derivatives of the convergence with respect to
+        :math:`\log_{10}M_\Delta` and :math:`c_\Delta`, see `eval_surface_density_jacobian`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        array_like
+            Derivatives with the last axis being
+            (:math:`\partial/\partial\log_{10}M_\Delta`, :math:`\partial/\partial c_\Delta`).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_lensing_jacobians(r_proj, z_cl, z_src)[0]
+
+    def eval_tangential_shear_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the derivatives of the tangential shear with respect to
+        :math:`\log_{10}M_\Delta` and :math:`c_\Delta`, see `eval_surface_density_jacobian`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        array_like
+            Derivatives with the last axis being
+            (:math:`\partial/\partial\log_{10}M_\Delta`, :math:`\partial/\partial c_\Delta`).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_lensing_jacobians(r_proj, z_cl, z_src)[1]
+
+    def eval_reduced_tangential_shear_jacobian(self, r_proj, z_cl, z_src):
+        r""" Computes the derivatives of the reduced tangential shear (single source plane or
+        individual source redshifts) with respect to :math:`\log_{10}M_\Delta` and
+        :math:`c_\Delta`, see `eval_surface_density_jacobian`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+
+        Returns
+        -------
+        array_like
+            Derivatives with the last axis being
+            (:math:`\partial/\partial\log_{10}M_\Delta`, :math:`\partial/\partial c_\Delta`).
+        """
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_lensing_jacobians(r_proj, z_cl, z_src)[2]
+
+    def _eval_lensing_jacobians(self, r_proj, z_cl, z_src):
+        r""" Computes the derivatives of the convergence, tangential shear and reduced
+        tangential shear"""
+        sigma, _, delta_sigma = self._eval_surface_densities_on_grid(r_proj, z_cl)
+        jac_sigma, _, jac_delta_sigma = self._eval_surface_densities_jacobian(r_proj, z_cl)
+        sigma_c = np.expand_dims(self._eval_critical_surface_density(z_cl, z_src), -1)
+        kappa = np.expand_dims(sigma, -1)/sigma_c
+        gamma_t = np.expand_dims(delta_sigma, -1)/sigma_c
+        jac_kappa, jac_gamma_t = jac_sigma/sigma_c, jac_delta_sigma/sigma_c
+        jac_g_t = (jac_gamma_t+gamma_t*jac_kappa/(1.-kappa))/(1.-kappa)
+        return jac_kappa, jac_gamma_t, jac_g_t
+
+    def _eval_surface_densities_jacobian(self, r_proj, z_cl, step=1.0e-4):
+        r""" Computes the derivatives of the surface density, mean surface density and excess
+        surface density with respect to :math:`\log_{10}M_\Delta` and :math:`c_\Delta`.
+
+        The NFW and Hernquist profiles are self-similar, :math:`\Sigma=\rho_sr_sS(R/r_s)` with
+        :math:`r_s\propto M_\Delta^{1/3}/c_\Delta` and
+        :math:`\rho_s\propto c_\Delta^3/m(c_\Delta)`, so the derivatives only require the
+        logarithmic slope of :math:`S`. Other profiles use central finite differences with
+        relative steps `step`.
+        """
+        mdelta, cdelta = self._get_mass(), self._get_concentration()
+        if self.halo_profile_model in ('nfw', 'hernquist') and self.massdef in ('mean', 'critical'):
+            sigma, mean_sigma, _ = self._eval_surface_densities_on_grid(r_proj, z_cl)
+            rho_def = self._get_prefactor(('rho_m', z_cl),
+                                          lambda: self.cosmo._get_rho_m(z_cl))
+            if self.massdef == 'critical':
+                rho_def = rho_def/self._get_prefactor(('Omega_m', z_cl),
+                                                      lambda: self.cosmo._get_Omega_m(z_cl))
+            r_s = (3.*mdelta/(4.*np.pi*self.delta_mdef*rho_def))**(1./3.)/cdelta
+            # derivatives with respect to ln(r_s) at fixed rho_s
+            sigma_rs = sigma*(1.-_projected_profile_slope(
+                np.array(r_proj, dtype=float)/r_s, self.halo_profile_model))
+            mean_sigma_rs = 3.*mean_sigma-2.*sigma
+            if self.halo_profile_model == 'nfw':
+                mass_slope = cdelta**2/((1.+cdelta)**2*(np.log1p(cdelta)-cdelta/(1.+cdelta)))
+            else:
+                mass_slope = 2./(1.+cdelta)
+            jac_sigma, jac_mean_sigma = (
+                np.stack([np.log(10.)*vals_rs/3., ((3.-mass_slope)*vals-vals_rs)/cdelta], -1)
+                for vals, vals_rs in ((sigma, sigma_rs), (mean_sigma, mean_sigma_rs)))
+        else:
+            profiles = []
+            for mass, conc in ((mdelta*10.**step, cdelta), (mdelta*10.**-step, cdelta),
+                               (mdelta, cdelta*(1.+step)), (mdelta, cdelta*(1.-step))):
+                self._set_mass(mass)
+                self._set_concentration(conc)
+                profiles.append(self._eval_surface_densities_on_grid(r_proj, z_cl)[:2])
+            self._set_mass(mdelta)
+            self._set_concentration(cdelta)
+            jac_sigma, jac_mean_sigma = (
+                np.stack([(profiles[0][i]-profiles[1][i])/(2.*step),
+                          (profiles[2][i]-profiles[3][i])/(2.*step*cdelta)], -1)
+                for i in (0, 1))
+        return jac_sigma, jac_mean_sigma, jac_mean_sigma-jac_sigma
+
+    def eval_miscentered_surface_density(self, r_proj, z_cl, r_mis, mis_model='rayleigh',
+                                         mis_fraction=1., verbose=False):
+        r""" Computes the surface density of a miscentered cluster
+
+        .. math::
+            \Sigma(R) = (1-f_{mis})\Sigma_{cen}(R) +
+            f_{mis}\int dR_s\,P(R_s)\frac{1}{2\pi}\int_0^{2\pi} d\theta\,
+            \Sigma_{cen}\left(\sqrt{R^2+R_s^2+2RR_s\cos\theta}\right)
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        r_mis: float
+            Scale of the miscentering offset distribution in :math:`M\!pc`.
+        mis_model: str, optional
+            Distribution of the miscentering offsets :math:`R_s`, options are:
+
+                * `rayleigh` (default): :math:`P(R_s)=\frac{R_s}{R_{mis}^2}\exp\left(-\frac{R_s^2}{2R_{mis}^2}\right)`
+                * `exponential`: :math:`P(R_s)=\frac{R_s}{R_{mis}^2}\exp\left(-\frac{R_s}{R_{mis}}\right)`
+
+        mis_fraction: float, optional
+            Fraction :math:`f_{mis}` of miscentered clusters.
+
+        Returns
+        -------
+        array_like, float
+            Miscentered surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+
+        Notes
+        -----
+        The convolution is computed with a kernel precomputed on a log-spaced grid of
+        :math:`R/R_{mis}` (see `radial_grid_npts_per_decade`), so it only requires the
+        centered profile on this grid.
+        """
+        if self.validate_input:
+            self._validate_miscentering(locals())
+
+        self._set_concentration_from_relation(z_cl)
+        if self.halo_profile_model=='einasto' and verbose:
+            print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
+
+        return self._eval_miscentered_surface_densities(
+            r_proj, z_cl, r_mis, mis_model, mis_fraction)[0]
+
+    def eval_miscentered_excess_surface_density(self, r_proj, z_cl, r_mis, mis_model='rayleigh',
+                                                mis_fraction=1., verbose=False):
+        r""" Computes the excess surface density of a miscentered cluster, see
+        `eval_miscentered_surface_density`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            Projected radial position from the cluster center in :math:`M\!pc`.
+        z_cl: float
+            Redshift of the cluster
+        r_mis: float
+            Scale of the miscentering offset distribution in :math:`M\!pc`.
+        mis_model: str, optional
+            Distribution of the miscentering offsets (`rayleigh` or `exponential`).
+        mis_fraction: float, optional
+            Fraction of miscentered clusters.
+
+        Returns
+        -------
+        array_like, float
+            Miscentered excess surface density in units of :math:`M_\odot\ Mpc^{-2}`.
+        """
+        if self.validate_input:
+            self._validate_miscentering(locals())
+
+        self._set_concentration_from_relation(z_cl)
+        if self.halo_profile_model=='einasto' and verbose:
+            print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
+
+        return self._eval_miscentered_surface_densities(
+            r_proj, z_cl, r_mis, mis_model, mis_fraction)[1]
+
+    def eval_miscentered_reduced_tangential_shear(self, r_proj, z_cl, z_src, r_mis,
+                                                  mis_model='rayleigh', mis_fraction=1.,
+                                                  verbose=False):
+        r""" Computes the reduced tangential shear of a miscentered cluster (single source
+        plane or individual source redshifts), see `eval_miscentered_surface_density`.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+        r_mis: float
+            Scale of the miscentering offset distribution in :math:`M\!pc`.
+        mis_model: str, optional
+            Distribution of the miscentering offsets (`rayleigh` or `exponential`).
+        mis_fraction: float, optional
+            Fraction of miscentered clusters.
+
+        Returns
+        -------
+        array_like, float
+            Miscentered reduced tangential shear
+        """
+        if self.validate_input:
+            self._validate_miscentering(locals())
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+
+        self._set_concentration_from_relation(z_cl)
+        if self.halo_profile_model=='einasto' and verbose:
+            print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
+
+        sigma, delta_sigma = self._eval_miscentered_surface_densities(
+            r_proj, z_cl, r_mis, mis_model, mis_fraction)
+        sigma_c = self._eval_critical_surface_density(z_cl, z_src)
+        return compute_reduced_shear_from_convergence(delta_sigma/sigma_c, sigma/sigma_c)
+
+    def _validate_miscentering(self, loc):
+        r""" Validates the arguments of the miscentered profiles"""
+        validate_argument(loc, 'r_proj', 'float_array', argmin=0)
+        validate_argument(loc, 'z_cl', float, argmin=0)
+        validate_argument(loc, 'r_mis', float, argmin=0, eqmin=True)
+        validate_argument(loc, 'mis_model', str)
+        validate_argument(loc, 'mis_fraction', float, argmin=0, argmax=1, eqmin=True, eqmax=True)
+        if loc['mis_model'] not in _MISCENTERING_MODELS:
+            raise ValueError(f"Miscentering model {loc['mis_model']} not supported, options are "
+                             f"{list(_MISCENTERING_MODELS)}")
+
+    def _get_miscentering_kernel(self, mis_model, x_max):
+        r""" Returns the miscentering kernel covering :math:`R/R_{mis}\le` `x_max`, recomputed
+        (on a larger grid) only if the cached one does not cover it.
+
+        Returns
+        -------
+        log_x : array_like
+            Logarithm of the grid of :math:`R/R_{mis}`, the kernel maps the centered profile on
+            this grid to the miscentered profile on the first `n_out` points.
+        kernel : array_like
+            Kernel with shape (n_out, len(log_x))
+        """
+        npts_per_decade = self.radial_grid_npts_per_decade
+        u_max = _MISCENTERING_MODELS[mis_model][1]
+        key = (mis_model, npts_per_decade)
+        if key in self._miscentering_kernels:
+            log_x_grid, kernel = self._miscentering_kernels[key]
+        if key not in self._miscentering_kernels \
+                or np.searchsorted(log_x_grid, np.log(x_max)) >= kernel.shape[0]:
+            x_top = 10.**np.ceil(np.log10(2.*(x_max+u_max)))
+            log_x_grid, kernel = _compute_miscentering_kernel(mis_model, x_top, npts_per_decade)
+            self._miscentering_kernels[key] = (log_x_grid, kernel)
+        # the rows up to x_max only depend on the columns up to x_max+u_max
+        n_out = np.searchsorted(log_x_grid, np.log(x_max))+1
+        n_in = min(np.searchsorted(log_x_grid, np.log(x_max+u_max))+2, log_x_grid.size)
+        return log_x_grid[:n_in], kernel[:n_out, :n_in]
+
+    def _eval_miscentered_surface_densities(self, r_proj, z_cl, r_mis, mis_model='rayleigh',
+                                            mis_fraction=1.):
+        r""" Computes the miscentered surface density and excess surface density from the
+        centered profile on the grid of the miscentering kernel.
+        """
+        r_proj = np.array(r_proj, dtype=float)
+        if r_mis == 0. or mis_fraction == 0.:
+            sigma, _, delta_sigma = self._eval_surface_densities_on_grid(r_proj, z_cl)
+            return sigma, delta_sigma
+        log_r_grid, sigma_cen, mean_sigma_cen, sigma_mis, mean_sigma_mis = \
+            self._eval_miscentered_profiles_grid(np.max(r_proj), z_cl, r_mis, mis_model)
+        sigma = (1.-mis_fraction)*sigma_cen+mis_fraction*sigma_mis
+        mean_sigma = (1.-mis_fraction)*mean_sigma_cen+mis_fraction*mean_sigma_mis
+        log_r = np.log(np.clip(r_proj, np.exp(log_r_grid[0]), None))
+        log_sigma, mean_sigma = CubicSpline(
+            log_r_grid, np.array([np.log(sigma), mean_sigma]), axis=1)(log_r)
+        sigma = np.exp(log_sigma)
+        return sigma, mean_sigma-sigma
+
+    def _eval_miscentered_profiles_grid(self, r_max, z_cl, r_mis, mis_model='rayleigh'):
+        r""" Computes the centered and miscentered profiles on the grid of the miscentering
+        kernel covering radii up to `r_max`.
+
+        Returns
+        -------
+        log_r_grid : array_like
+            Logarithm of the radial grid in :math:`M\!pc`, the miscentered profiles are flat
+            below it.
+        sigma_cen, mean_sigma_cen, sigma_mis, mean_sigma_mis : array_like
+            Centered and miscentered surface density and mean surface density on the grid.
+        """
+        log_x_grid, kernel = self._get_miscentering_kernel(mis_model, r_max/r_mis)
+        sigma_cen, mean_sigma_cen, _ = self._eval_surface_densities(
+            r_mis*np.exp(log_x_grid), z_cl)
+        sigma_mis = kernel.dot(np.array(sigma_cen, dtype=float))
+        n_out = kernel.shape[0]
+        log_x_grid, sigma_cen, mean_sigma_cen = (
+            log_x_grid[:n_out], sigma_cen[:n_out], mean_sigma_cen[:n_out])
+        # mean surface density, the miscentered profile is flat below the grid
+        x_grid = np.exp(log_x_grid)
+        mass_2d = CubicSpline(log_x_grid, 2.*x_grid**2*sigma_mis).antiderivative()(log_x_grid)
+        mean_sigma_mis = (mass_2d+x_grid[0]**2*sigma_mis[0])/x_grid**2
+        return log_x_grid+np.log(r_mis), sigma_cen, mean_sigma_cen, sigma_mis, mean_sigma_mis
 
-        ll = np.logspace( 0 , 6 , lsteps )
-        val = np.array( [ simps( __integrand__( ll , t ) , ll ) for t in theta ] )
-        return halobias * val * rho_m / ( 2 * np.pi  * ( 1 + z_cl )**3 * da**2 )
-    
-    
     def eval_tangential_shear(self, r_proj, z_cl, z_src, verbose=False):
         r"""Computes the tangential shear
 
@@ -435,14 +1256,15 @@ class CLMModeling:
             validate_argument(locals(), 'z_cl', float, argmin=0)
             validate_argument(locals(), 'z_src', 'float_array', argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
         return self._eval_tangential_shear(r_proj=r_proj, z_cl=z_cl, z_src=z_src)
 
     def _eval_tangential_shear(self, r_proj, z_cl, z_src):
-        delta_sigma = self.eval_excess_surface_density(r_proj, z_cl)
-        sigma_c = self.eval_critical_surface_density(z_cl, z_src)
+        delta_sigma = self._eval_excess_surface_density(r_proj, z_cl)
+        sigma_c = self._eval_critical_surface_density(z_cl, z_src)
         return delta_sigma/sigma_c
 
     def eval_convergence(self, r_proj, z_cl, z_src, verbose=False):
@@ -475,14 +1297,15 @@ class CLMModeling:
             validate_argument(locals(), 'z_cl', float, argmin=0)
             validate_argument(locals(), 'z_src', 'float_array', argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
         return self._eval_convergence(r_proj=r_proj, z_cl=z_cl, z_src=z_src)
 
     def _eval_convergence(self, r_proj, z_cl, z_src, verbose=False):
-        sigma = self.eval_surface_density(r_proj, z_cl, verbose=verbose)
-        sigma_c = self.eval_critical_surface_density(z_cl, z_src)
+        sigma = self._eval_surface_density(r_proj, z_cl)
+        sigma_c = self._eval_critical_surface_density(z_cl, z_src)
         return sigma/sigma_c
 
     def eval_reduced_tangential_shear(self, r_proj, z_cl, z_src, z_src_model='single_plane',
@@ -495,14 +1318,21 @@ class CLMModeling:
             The projected radial positions in :math:`M\!pc`.
         z_cl : float
             Galaxy cluster redshift
-        z_src : array_like, float
-            Background source galaxy redshift(s)
+        z_src : array_like, float, callable
+            Background source galaxy redshift(s), or source redshift distribution if
+            `z_src_model=='z_src_distribution'`
         z_src_model : str, optional
             Source redshift model, with the following supported options:
 
                 * `single_plane` (default): all sources at one redshift (if `z_source` is a float) \
                     or known individual source galaxy redshifts (if `z_source` is an array and \
                     `r_proj` is a float);
+                * `known_z_src`: `z_src` are the redshifts of the source population behind \
+                    each radius, :math:`\langle \beta_s \rangle` and \
+                    :math:`\langle \beta_s^2 \rangle` are computed from them and used in \
+                    equation (6) of Applegate et al. 2014;
+                * `z_src_distribution`: same as `known_z_src`, with `z_src` being the source \
+                    redshift distribution :math:`n(z)` (callable);
                 * `applegate14`: use the equation (6) in Weighing the Giants - III \
                     (Applegate et al. 2014; https://arxiv.org/abs/1208.0605) to evaluate tangential reduced shear;
                 * `schrabback18`: use the equation (12) in Cluster Mass Calibration at High Redshift \
@@ -527,31 +1357,38 @@ class CLMModeling:
 
         Notes
         -----
-        Need to figure out if we want to raise exceptions rather than errors here?
+        The averaged lensing efficiencies of the `known_z_src` and `z_src_distribution` models
+        are cached in the cosmology (see `Cosmology.eval_beta_s_moments`).
         """
         if self.validate_input:
             validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
             validate_argument(locals(), 'z_cl', float, argmin=0)
-            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+            if z_src_model == 'z_src_distribution':
+                if not callable(z_src):
+                    raise TypeError("z_src must be callable for the z_src_distribution model")
+            else:
+                validate_argument(locals(), 'z_src', 'float_array', argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
         if z_src_model == 'single_plane':
             gt = self._eval_reduced_tangential_shear_sp(r_proj, z_cl, z_src)
-        # elif z_src_model == 'known_z_src': # Discrete case
-        #     raise NotImplementedError('Need to implemnt Beta_s functionality, or average'+
-        #                               'sigma/sigma_c kappa_t = Beta_s*kappa_inf')
-        # elif z_src_model == 'z_src_distribution': # Continuous ( from a distribution) case
-        #     raise NotImplementedError('Need to implement Beta_s and Beta_s2 calculation from'+
-        #                               'integrating distribution of redshifts in each radial bin')
+        elif z_src_model in ('known_z_src', 'z_src_distribution'):
+            z_source = 1000. #np.inf # INF or a very large number
+            beta_s_mean, beta_s_square_mean = self.cosmo._eval_beta_s_moments(
+                z_cl, z_src, z_inf=z_source)
+            gammat, kappa = self._eval_lensing_observables(
+                r_proj, z_cl, z_source, ['tangential_shear', 'convergence']).values()
+            gt = beta_s_mean * gammat / (1. - beta_s_square_mean / beta_s_mean * kappa)
         elif z_src_model == 'applegate14':
             if beta_s_mean is None or beta_s_square_mean is None:
                 raise ValueError("beta_s_mean or beta_s_square_mean is not given.")
             else:
                 z_source = 1000. #np.inf # INF or a very large number
-                gammat = self._eval_tangential_shear(r_proj, z_cl, z_source)
-                kappa = self._eval_convergence(r_proj, z_cl, z_source)
+                gammat, kappa = self._eval_lensing_observables(
+                    r_proj, z_cl, z_source, ['tangential_shear', 'convergence']).values()
                 gt = beta_s_mean * gammat / (1. - beta_s_square_mean / beta_s_mean * kappa)
         
         elif z_src_model == 'schrabback18':
@@ -559,8 +1396,8 @@ class CLMModeling:
                 raise ValueError("beta_s_mean or beta_s_square_mean is not given.")
             else:
                 z_source = 1000. #np.inf # INF or a very large number
-                gammat = self._eval_tangential_shear(r_proj, z_cl, z_source)
-                kappa = self._eval_convergence(r_proj, z_cl, z_source)
+                gammat, kappa = self._eval_lensing_observables(
+                    r_proj, z_cl, z_source, ['tangential_shear', 'convergence']).values()
                 gt = (1. + (beta_s_square_mean / (beta_s_mean * beta_s_mean) - 1.) * beta_s_mean * kappa) * (beta_s_mean * gammat / (1. - beta_s_mean * kappa))
         
         else:
@@ -568,9 +1405,68 @@ class CLMModeling:
         return gt
 
     def _eval_reduced_tangential_shear_sp(self, r_proj, z_cl, z_src):
-        kappa = self.eval_convergence(r_proj, z_cl, z_src)
-        gamma_t = self.eval_tangential_shear(r_proj, z_cl, z_src)
-        return compute_reduced_shear_from_convergence(gamma_t, kappa)
+        return self._eval_lensing_observables(
+            r_proj, z_cl, z_src, ['reduced_tangential_shear'])['reduced_tangential_shear']
+
+    def eval_bin_averaged_tangential_shear(self, sub_radius, sub_sigma_c_inv, sub_weights, z_cl,
+                                           reduced=True):
+        r"""Computes the (reduced) tangential shear averaged over the sources of each radial bin.
+
+        The sources of each bin are described by a joint histogram of their radius and inverse
+        critical surface density, as stored by `clmm.dataops.make_radial_profile` with
+        `n_sub_bins`. The profiles are only computed at the radius sub-bins, so the cost does not
+        depend on the number of sources.
+
+        Parameters
+        ----------
+        sub_radius : array_like
+            Mean projected radius of the sources in each radius sub-bin in :math:`M\!pc`,
+            shape (nbins, n_sub_bins) (column `sub_radius_mpc` of the profile, `sub_radius` is
+            in the units of the bins).
+        sub_sigma_c_inv : array_like
+            Mean inverse critical surface density in each sub-bin in
+            :math:`M_\odot^{-1}\ Mpc^2`, shape (nbins, n_sub_bins).
+        sub_weights : array_like
+            Fraction of the sources of the bin in each (radius, inverse critical surface
+            density) sub-bin, shape (nbins, n_sub_bins, n_sub_bins).
+        z_cl : float
+            Galaxy cluster redshift
+        reduced : bool, optional
+            Average the reduced tangential shear (default) instead of the tangential shear.
+
+        Returns
+        -------
+        array_like
+            Bin averaged (reduced) tangential shear
+        """
+        if self.validate_input:
+            # multidimensional arrays are validated element wise
+            sub_dict = {'sub_radius': np.ravel(sub_radius),
+                        'sub_sigma_c_inv': np.ravel(sub_sigma_c_inv),
+                        'sub_weights': np.ravel(sub_weights)}
+            validate_argument(sub_dict, 'sub_radius', 'float_array', argmin=0)
+            validate_argument(sub_dict, 'sub_sigma_c_inv', 'float_array', argmin=0, eqmin=True)
+            validate_argument(sub_dict, 'sub_weights', 'float_array', argmin=0, eqmin=True)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'reduced', bool)
+            if (np.ndim(sub_radius) != 2 or np.shape(sub_sigma_c_inv) != np.shape(sub_radius)
+                    or np.shape(sub_weights) != np.shape(sub_radius)+np.shape(sub_radius)[1:]):
+                raise ValueError("sub_radius, sub_sigma_c_inv and sub_weights shapes must be "
+                                 "(nbins, n_sub_bins), (nbins, n_sub_bins) and "
+                                 "(nbins, n_sub_bins, n_sub_bins)")
+        self._set_concentration_from_relation(z_cl)
+        return self._eval_bin_averaged_tangential_shear(
+            np.array(sub_radius), np.array(sub_sigma_c_inv), np.array(sub_weights), z_cl, reduced)
+
+    def _eval_bin_averaged_tangential_shear(self, sub_radius, sub_sigma_c_inv, sub_weights, z_cl,
+                                            reduced=True):
+        sigma, _, delta_sigma = self._eval_surface_densities_on_grid(sub_radius.ravel(), z_cl)
+        # axis 1: radius sub-bins, axis 2: inverse critical surface density sub-bins
+        kappa = sigma.reshape(sub_radius.shape)[:, :, None]*sub_sigma_c_inv[:, None, :]
+        gamma_t = delta_sigma.reshape(sub_radius.shape)[:, :, None]*sub_sigma_c_inv[:, None, :]
+        if reduced:
+            gamma_t = compute_reduced_shear_from_convergence(gamma_t, kappa)
+        return np.sum(sub_weights*gamma_t, axis=(1, 2))
 
     def eval_magnification(self, r_proj, z_cl, z_src, verbose=False):
         r"""Computes the magnification
@@ -603,15 +1499,15 @@ class CLMModeling:
             validate_argument(locals(), 'z_cl', float, argmin=0)
             validate_argument(locals(), 'z_src', 'float_array', argmin=0)
 
+        self._set_concentration_from_relation(z_cl)
         if self.halo_profile_model=='einasto' and verbose:
             print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
 
         return self._eval_magnification(r_proj=r_proj, z_cl=z_cl, z_src=z_src)
 
     def _eval_magnification(self, r_proj, z_cl, z_src):
-        kappa = self.eval_convergence(r_proj, z_cl, z_src)
-        gamma_t = self.eval_tangential_shear(r_proj, z_cl, z_src)
-        return 1./((1-kappa)**2-abs(gamma_t)**2)
+        return self._eval_lensing_observables(
+            r_proj, z_cl, z_src, ['magnification'])['magnification']
     
     def eval_magnification_bias(self, r_proj, z_cl, z_src, alpha):
         r"""Computes the magnification bias
@@ -646,8 +1542,385 @@ class CLMModeling:
             validate_argument(locals(), 'z_cl', float, argmin=0)
             validate_argument(locals(), 'z_src', 'float_array', argmin=0)
             validate_argument(locals(), 'alpha', 'float_array')
+        self._set_concentration_from_relation(z_cl)
         return self._eval_magnification_bias(r_proj=r_proj, z_cl=z_cl, z_src=z_src, alpha=alpha)
 
     def _eval_magnification_bias(self, r_proj, z_cl, z_src, alpha):
-        magnification = self.eval_magnification(r_proj, z_cl, z_src)
-        return compute_magnification_bias_from_magnification(magnification, alpha)
+        return self._eval_lensing_observables(
+            r_proj, z_cl, z_src, ['magnification_bias'], alpha=alpha)['magnification_bias']
+
+    def eval_lensing_observables(self, r_proj, z_cl, z_src,
+                                 which=('tangential_shear', 'convergence',
+                                        'reduced_tangential_shear', 'magnification'),
+                                 alpha=None, verbose=False):
+        r"""Computes several lensing observables at once.
+
+        The surface density, mean surface density and critical surface density are computed
+        only once and all requested observables are derived from them.
+
+        Parameters
+        ----------
+        r_proj : array_like
+            The projected radial positions in :math:`M\!pc`.
+        z_cl : float
+            Galaxy cluster redshift
+        z_src : array_like, float
+            Background source galaxy redshift(s)
+        which : list, tuple, str, optional
+            Observables to be computed, options are:
+
+                * `surface_density`
+                * `mean_surface_density`
+                * `excess_surface_density`
+                * `critical_surface_density`
+                * `tangential_shear`
+                * `convergence`
+                * `reduced_tangential_shear` (`single_plane` source redshift model)
+                * `magnification`
+                * `magnification_bias` (requires `alpha`)
+
+        alpha : array_like, float, optional
+            Slope of the cummulative number count of background sources at a given magnitude,
+            used for the magnification bias.
+
+        Returns
+        -------
+        dict
+            Requested observables, with the same order as `which`.
+        """
+        if isinstance(which, str):
+            which = [which]
+        if self.validate_input:
+            validate_argument(locals(), 'r_proj', 'float_array', argmin=0)
+            validate_argument(locals(), 'z_cl', float, argmin=0)
+            validate_argument(locals(), 'z_src', 'float_array', argmin=0)
+            validate_argument(locals(), 'which', (list, tuple))
+            validate_argument(locals(), 'alpha', 'float_array', none_ok=True)
+            for name in which:
+                if name not in _LENSING_OBSERVABLES:
+                    raise ValueError(f"Lensing observable {name} not supported")
+            if 'magnification_bias' in which and alpha is None:
+                raise ValueError("alpha must be provided to compute the magnification bias")
+
+        self._set_concentration_from_relation(z_cl)
+
+        if self.halo_profile_model=='einasto' and verbose:
+            print(f"Einasto alpha = {self._get_einasto_alpha(z_cl=z_cl)}")
+
+        return self._eval_lensing_observables(r_proj=r_proj, z_cl=z_cl, z_src=z_src,
+                                              which=which, alpha=alpha)
+
+    def _eval_lensing_observables(self, r_proj, z_cl, z_src, which, alpha=None):
+        sigma, mean_sigma, delta_sigma = self._eval_surface_densities_on_grid(r_proj, z_cl)
+        sigma_c = self._eval_critical_surface_density(z_cl, z_src)
+        kappa = sigma/sigma_c
+        gamma_t = delta_sigma/sigma_c
+        values = {'surface_density': sigma,
+                  'mean_surface_density': mean_sigma,
+                  'excess_surface_density': delta_sigma,
+                  'critical_surface_density': sigma_c,
+                  'tangential_shear': gamma_t,
+                  'convergence': kappa}
+        if 'reduced_tangential_shear' in which:
+            values['reduced_tangential_shear'] = compute_reduced_shear_from_convergence(
+                gamma_t, kappa)
+        if 'magnification' in which or 'magnification_bias' in which:
+            values['magnification'] = 1./((1-kappa)**2-abs(gamma_t)**2)
+        if 'magnification_bias' in which:
+            values['magnification_bias'] = compute_magnification_bias_from_magnification(
+                values['magnification'], alpha)
+        return {name: values[name] for name in which}
+
+
+def _get_state_value(value):
+    r""" Returns a hashable value of a (possibly array) parameter, used to detect changes
+
+    Parameters
+    ----------
+    value : array_like, float, None
+        Value of the parameter
+
+    Returns
+    -------
+    float, tuple, None
+        The value itself for scalars, its shape and bytes for arrays.
+    """
+    if value is None:
+        return value
+    if np.ndim(value) == 0:
+        return float(value)
+    value = np.asarray(value, dtype=float)
+    return (value.shape, value.tobytes())
+
+
+def _fftlog_hankel_transform(k_vals, pk_vals, order, bias=1.0):
+    r""" Computes the Hankel transform
+
+    .. math::
+        F(r) = \int_0^\infty k\,dk\,P(k)J_n(kr)
+
+    with the FFTLog algorithm (Hamilton 2000) for all :math:`r=1/k` at once.
+
+    Parameters
+    ----------
+    k_vals : array_like
+        Log-spaced wavenumbers
+    pk_vals : array_like
+        Function to be transformed evaluated at `k_vals`
+    order : int
+        Order of the Bessel function
+    bias : float, optional
+        Power-law bias of the transform, must be in :math:`(-n, 3/2)`
+
+    Returns
+    -------
+    r_vals : array_like
+        Radii where the transform is evaluated (:math:`1/k`, in decreasing order)
+    transform : array_like
+        Transformed function at `r_vals`
+    """
+    npts = len(k_vals)
+    dlnk = np.log(k_vals[1]/k_vals[0])
+    # Mellin transform of the kernel J_n at s = bias + i*omega_m
+    s_vals = bias+2j*np.pi*np.arange(npts//2+1)/(npts*dlnk)
+    kernel = np.exp((s_vals-1.)*np.log(2.)+loggamma(0.5*(order+s_vals))
+                    -loggamma(0.5*(order-s_vals)+1.))
+    if npts%2 == 0:
+        # Nyquist mode must be real for a real output
+        kernel[-1] = kernel[-1].real
+    transform = np.fft.irfft(np.fft.rfft(pk_vals*k_vals**(2.-bias))*kernel, npts)
+    return 1./k_vals, transform*k_vals**bias
+
+
+def _compute_miscentering_kernel(mis_model, x_max, npts_per_decade, n_offsets=200, n_angles=64):
+    r""" Computes the kernel :math:`K_{ij}` of the miscentering convolution
+
+    .. math::
+        \Sigma_{mis}(x_i) = \int du\,P(u)\frac{1}{\pi}\int_0^{\pi} d\theta\,
+        \Sigma\left(R_{mis}\sqrt{x_i^2+u^2+2x_iu\cos\theta}\right)
+        = \sum_j K_{ij} \Sigma(R_{mis}x_j)
+
+    on a log-spaced grid of :math:`x=R/R_{mis}`, using Gauss-Legendre quadratures for the offsets
+    :math:`u=R_s/R_{mis}` and the angles, and a linear interpolation of :math:`\Sigma` in
+    :math:`\ln x`. The kernel does not depend on the profile nor on :math:`R_{mis}`.
+
+    Parameters
+    ----------
+    mis_model : str
+        Miscentering model, key of `_MISCENTERING_MODELS`
+    x_max : float
+        Maximum value of the grid, the kernel is computed for :math:`x\le` `x_max`-`u_max`
+    npts_per_decade : int
+        Number of points per decade of the grid
+    n_offsets : int, optional
+        Number of offsets in the quadrature
+    n_angles : int, optional
+        Number of angles in the quadrature
+
+    Returns
+    -------
+    log_x : array_like
+        Logarithm of the grid, from :math:`10^{-3}` to `x_max`
+    kernel : array_like
+        Kernel with shape (n_out, len(log_x)), where n_out is the number of grid points below
+        `x_max`-`u_max`
+    """
+    pdf, u_max = _MISCENTERING_MODELS[mis_model]
+    dlogx = np.log(10.)/npts_per_decade
+    log_x = dlogx*np.arange(np.floor(np.log(1.e-3)/dlogx), np.ceil(np.log(x_max)/dlogx)+1)
+    n_grid = log_x.size
+    n_out = np.searchsorted(log_x, np.log(np.exp(log_x[-1])-u_max), side='right')
+    nodes, weights = np.polynomial.legendre.leggauss(n_offsets)
+    u_vals = 0.5*u_max*(nodes+1.)
+    w_u = weights*pdf(u_vals)
+    w_u /= w_u.sum()
+    nodes, weights = np.polynomial.legendre.leggauss(n_angles)
+    cos_theta = np.cos(0.5*np.pi*(nodes+1.))
+    w_theta = 0.5*weights
+    # (radius, offset, angle) arrays
+    x_vals = np.exp(log_x[:n_out])[:, None, None]
+    log_arg = 0.5*np.log(x_vals**2+u_vals[None, :, None]**2
+                         +2.*x_vals*u_vals[None, :, None]*cos_theta[None, None, :])
+    pos = np.clip((log_arg-log_x[0])/dlogx, 0., n_grid-1.)
+    # cubic Lagrange interpolation on the points index-1, ..., index+2
+    index = np.clip(pos.astype(int), 1, n_grid-3)
+    frac = pos-index
+    lagrange = (-frac*(frac-1.)*(frac-2.)/6., (frac+1.)*(frac-1.)*(frac-2.)/2.,
+                -(frac+1.)*frac*(frac-2.)/2., (frac+1.)*frac*(frac-1.)/6.)
+    w_tot = w_u[None, :, None]*w_theta[None, None, :]
+    rows = np.arange(n_out)[:, None, None]*n_grid
+    kernel = np.zeros(n_out*n_grid)
+    for shift, weight in enumerate(lagrange):
+        kernel += np.bincount((rows+index+shift-1).ravel(), (w_tot*weight).ravel(),
+                              n_out*n_grid)
+    return log_x, kernel.reshape(n_out, n_grid)
+
+
+def _projected_profile_slope(x_vals, halo_profile_model, w_series=0.1, n_series=20):
+    r""" Computes the logarithmic slope :math:`d\ln S/d\ln x` of the projected NFW or
+    Hernquist profile shapes :math:`S(x)`.
+
+    With :math:`w=1-x^2` and :math:`h(w)={\rm arctanh}(\sqrt{w})/\sqrt{w}=\sum_n w^n/(2n+1)`,
+    the shapes are :math:`S=(h-1)/w` (NFW) and :math:`S=(3(h-1)-wh)/w^2` (Hernquist). Their
+    power series are used for :math:`|w|<` `w_series`, where the closed forms are unstable.
+
+    Parameters
+    ----------
+    x_vals : array_like
+        Projected radius in units of the scale radius
+    halo_profile_model : str
+        Profile model (`nfw` or `hernquist`)
+    w_series : float, optional
+        Maximum :math:`|w|` where the series are used
+    n_series : int, optional
+        Number of terms in the series
+
+    Returns
+    -------
+    array_like
+        Logarithmic slope of the projected profile
+    """
+    w_vals = 1.-np.array(x_vals, dtype=float)**2
+    near = np.abs(w_vals) < w_series
+    # closed forms
+    w_far = np.where(near, 0.5, w_vals)
+    sqrt_w = np.sqrt(np.abs(w_far))
+    h_vals = np.where(w_far > 0, np.arctanh(np.where(w_far > 0, sqrt_w, 0.)),
+                      np.arctan(sqrt_w))/sqrt_w
+    dh_dw = (1./(1.-w_far)-h_vals)/(2.*w_far)
+    if halo_profile_model == 'nfw':
+        shape = (h_vals-1.)/w_far
+        dshape_dw = (dh_dw-shape)/w_far
+    else:
+        shape = (3.*(h_vals-1.)-w_far*h_vals)/w_far**2
+        dshape_dw = ((3.-w_far)*dh_dw-h_vals)/w_far**2-2.*shape/w_far
+    # series
+    orders = np.arange(n_series)
+    if halo_profile_model == 'nfw':
+        coefs = 1./(2.*orders+3.)
+    else:
+        coefs = 3./(2.*orders+5.)-1./(2.*orders+3.)
+    w_near = np.where(near, w_vals, 0.)[..., None]
+    shape = np.where(near, np.sum(coefs*w_near**orders, axis=-1), shape)
+    dshape_dw = np.where(near, np.sum((orders[1:]*coefs[1:])*w_near**orders[:-1], axis=-1),
+                         dshape_dw)
+    return -2.*(1.-w_vals)*dshape_dw/shape
+
+
+def _eval_profile_mass_shape(log_x, halo_profile_model, alpha=None):
+    r""" Computes the logarithm of the mass enclosed in the radius :math:`r=xr_s` in units of
+    :math:`4\pi\rho_sr_s^3`,
+
+    .. math::
+        \mu(x) = \int_0^x y^2\frac{\rho(yr_s)}{\rho_s}dy =
+        \begin{cases}
+        \ln(1+x)-\frac{x}{1+x} & \text{NFW}\\
+        \frac{e^{2/\alpha}}{\alpha}\left(\frac{\alpha}{2}\right)^{3/\alpha}
+        \gamma\left(\frac{3}{\alpha}, \frac{2x^\alpha}{\alpha}\right) & \text{Einasto}\\
+        \frac{x^2}{2(1+x)^2} & \text{Hernquist}
+        \end{cases},
+
+    and its logarithmic slope :math:`d\ln\mu/d\ln x=x^3\rho(xr_s)/(\rho_s\mu(x))`.
+
+    Parameters
+    ----------
+    log_x : array_like
+        Logarithm of the radius in units of the scale radius
+    halo_profile_model : str
+        Profile model (`nfw`, `einasto` or `hernquist`)
+    alpha : array_like, None
+        Einasto slope (`einasto` profile only)
+
+    Returns
+    -------
+    log_mu : array_like
+        :math:`\ln\mu(x)`
+    slope : array_like
+        :math:`d\ln\mu/d\ln x`
+    """
+    x_vals = np.exp(log_x)
+    if halo_profile_model == 'nfw':
+        mu_vals = np.log1p(x_vals)-x_vals/(1.+x_vals)
+        return np.log(mu_vals), x_vals**2/((1.+x_vals)**2*mu_vals)
+    if halo_profile_model == 'hernquist':
+        return 2.*np.log(x_vals/(1.+x_vals))-np.log(2.), 2./(1.+x_vals)
+    shape = 3./alpha
+    log_mu = (2./alpha-np.log(alpha)+shape*np.log(0.5*alpha)+loggamma(shape).real
+              +np.log(gammainc(shape, 2.*x_vals**alpha/alpha)))
+    return log_mu, np.exp(3.*log_x-2./alpha*np.expm1(alpha*log_x)-log_mu)
+
+
+def _convert_profile_mass_concentration(mdelta, cdelta, log_density_ratio, halo_profile_model,
+                                        alpha=None, tol=1.0e-12, max_iter=100):
+    r""" Converts the masses and concentrations of halos to a mass definition whose density
+    :math:`\Delta'\rho'` (see `CLMModeling._get_overdensity_density`) differs by
+    `log_density_ratio` (:math:`\ln\Delta'\rho'/\Delta\rho`), keeping the scale radius and
+    density (vectorized).
+
+    The new concentration solves :math:`g(\ln c')=g(\ln c)+\ln\Delta'\rho'/\Delta\rho`, with
+    :math:`g=\ln\mu-3\ln x` the logarithm of the mean enclosed density (see
+    `_eval_profile_mass_shape`). As :math:`-3<dg/d\ln x<0`, the root is on the side of
+    :math:`\ln c-\ln(\Delta'\rho'/\Delta\rho)/3` opposite to :math:`\ln c`; the bracket is
+    extended on this side and the root is refined with Newton steps, replaced by bisections
+    when they leave the bracket.
+
+    Parameters
+    ----------
+    mdelta : array_like
+        Masses in the initial mass definition
+    cdelta : array_like
+        Concentrations in the initial mass definition
+    log_density_ratio : array_like
+        Logarithm of the ratio of the densities of the mass definitions
+    halo_profile_model : str
+        Profile model (`nfw`, `einasto` or `hernquist`)
+    alpha : array_like, None
+        Einasto slope (`einasto` profile only)
+    tol : float, optional
+        Absolute tolerance on the logarithm of the new concentration
+    max_iter : int, optional
+        Maximum number of iterations
+
+    Returns
+    -------
+    mdelta2 : numpy.ndarray
+        Masses in the new mass definition
+    cdelta2 : numpy.ndarray
+        Concentrations in the new mass definition
+    """
+    mdelta, log_c, log_ratio = np.broadcast_arrays(
+        np.array(mdelta, dtype=float), np.log(cdelta), np.array(log_density_ratio, dtype=float))
+    if halo_profile_model == 'einasto':
+        mdelta, log_c, log_ratio, alpha = np.broadcast_arrays(
+            mdelta, log_c, log_ratio, np.array(alpha, dtype=float))
+
+    def func(log_x):
+        log_mu, slope = _eval_profile_mass_shape(log_x, halo_profile_model, alpha)
+        return log_mu-3.*log_x, slope-3.
+
+    log_mu_c = _eval_profile_mass_shape(log_c, halo_profile_model, alpha)[0]
+    target = log_mu_c-3.*log_c+log_ratio
+    # the decreasing function func-target is positive on the left of the root
+    inner = log_c-log_ratio/3.
+    step = -log_ratio
+    outer = inner+step
+    for _ in range(max_iter):
+        outside = (func(outer)[0]-target)*np.sign(log_ratio) < 0.
+        if not np.any(outside):
+            break
+        step = np.where(outside, 2.*step, step)
+        outer = np.where(outside, inner+step, outer)
+    low, high = np.minimum(inner, outer), np.maximum(inner, outer)
+    log_x = inner
+    for _ in range(max_iter):
+        value, deriv = func(log_x)
+        value = value-target
+        low, high = np.where(value > 0., log_x, low), np.where(value > 0., high, log_x)
+        newton = log_x-value/deriv
+        log_x_new = np.where((newton >= low) & (newton <= high), newton, 0.5*(low+high))
+        converged = np.all(np.abs(log_x_new-log_x) < tol)
+        log_x = log_x_new
+        if converged:
+            break
+    log_mu = _eval_profile_mass_shape(log_x, halo_profile_model, alpha)[0]
+    return mdelta*np.exp(log_mu-log_mu_c), np.exp(log_x)
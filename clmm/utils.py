@@ -132,6 +132,43 @@ def make_bins(rmin, rmax, nbins=10, method='evenwidth', source_seps=None):
     return binedges
 
 
+# Conversion factors of the supported units (letter case independent) to radians for the
+# angular units and to Mpc for the physical units
+_ANGULAR_UNITS = {name: unit.to(u.rad) for name, unit in
+                  (("radians", u.rad), ("degrees", u.deg), ("arcmin", u.arcmin),
+                   ("arcsec", u.arcsec))}
+_PHYSICAL_UNITS = {name: unit.to(u.Mpc) for name, unit in
+                   (("pc", u.pc), ("kpc", u.kpc), ("mpc", u.Mpc))}
+
+
+def _get_da_conversion(cosmo, redshift):
+    r"""Angular diameter distances (in :math:`M\!pc`) used to convert between angular and
+    physical units, evaluated once for each distinct redshift and kept in the cache of the
+    cosmology (emptied when its parameters change).
+
+    Parameters
+    ----------
+    cosmo : CLMM.Cosmology
+        CLMM Cosmology object
+    redshift : array_like
+        Redshift(s)
+
+    Returns
+    -------
+    numpy.ndarray
+        Angular diameter distances, with the shape of redshift.
+    """
+    # pylint: disable=protected-access
+    cache = cosmo._get_cache().setdefault('convert_units_da', {})
+    redshift = np.array(redshift, dtype=float)
+    z_unique, inverse = np.unique(redshift, return_inverse=True)
+    missing = [z_val for z_val in z_unique.tolist() if z_val not in cache]
+    if missing:
+        cache.update(zip(missing, np.atleast_1d(cosmo.eval_da(np.array(missing))).tolist()))
+    return np.array([cache[z_val] for z_val in z_unique.tolist()])[inverse].reshape(
+        redshift.shape)
+
+
 def convert_units(dist1, unit1, unit2, redshift=None, cosmo=None):
     """ Convenience wrapper to convert between a combination of angular and physical units.
 
@@ -141,6 +178,10 @@ def convert_units(dist1, unit1, unit2, redshift=None, cosmo=None):
     To convert between angular and physical units you must provide both
     a redshift and a cosmology object.
 
+    Conversions within angular or within physical units are a multiplication by a tabulated
+    factor. Conversions between angular and physical units use the angular diameter distance,
+    which is computed once for each redshift and cosmology and cached in the cosmology object.
+
     Parameters
     ----------
     dist1 : array_like
@@ -149,8 +190,9 @@ def convert_units(dist1, unit1, unit2, redshift=None, cosmo=None):
         Unit for the input distances
     unit2 : str
         Unit for the output distances
-    redshift : float
-        Redshift used to convert between angular and physical units
+    redshift : array_like, float
+        Redshift used to convert between angular and physical units. It can be an array
+        broadcastable with dist1 (e.g. the redshift of the cluster of each distance).
     cosmo : CLMM.Cosmology
         CLMM Cosmology object to compute angular diameter distance to
         convert between physical and angular units
@@ -162,40 +204,32 @@ def convert_units(dist1, unit1, unit2, redshift=None, cosmo=None):
     """
     # make case independent
     unit1, unit2 = unit1.lower(), unit2.lower()
-    # Available units
-    angular_bank = {"radians": u.rad, "degrees": u.deg,
-                    "arcmin": u.arcmin, "arcsec": u.arcsec}
-    physical_bank = {"pc": u.pc, "kpc": u.kpc, "mpc": u.Mpc}
-    units_bank = {**angular_bank, **physical_bank}
     # Some error checking
-    if unit1 not in units_bank:
+    if unit1 not in _ANGULAR_UNITS and unit1 not in _PHYSICAL_UNITS:
         raise ValueError(f"Input units ({unit1}) not supported")
-    if unit2 not in units_bank:
+    if unit2 not in _ANGULAR_UNITS and unit2 not in _PHYSICAL_UNITS:
         raise ValueError(f"Output units ({unit2}) not supported")
-    # Try automated astropy unit conversion
-    try:
-        dist2 = (dist1*units_bank[unit1]).to(units_bank[unit2]).value
-    # Otherwise do manual conversion
-    except u.UnitConversionError:
-        # Make sure that we were passed a redshift and cosmology
-        if redshift is None or cosmo is None:
-            raise TypeError(
-                "Redshift and cosmology must be specified to convert units") \
-                from u.UnitConversionError
-        # Redshift must be greater than zero for this approx
-        if not redshift > 0.0:
-            raise ValueError("Redshift must be greater than 0.") from u.UnitConversionError
-        # Convert angular to physical
-        if (unit1 in angular_bank) and (unit2 in physical_bank):
-            dist1_rad = (dist1*units_bank[unit1]).to(u.rad).value
-            dist1_mpc = cosmo.rad2mpc(dist1_rad, redshift)
-            dist2 = (dist1_mpc*u.Mpc).to(units_bank[unit2]).value
-        # Otherwise physical to angular
-        else:
-            dist1_mpc = (dist1*units_bank[unit1]).to(u.Mpc).value
-            dist1_rad = cosmo.mpc2rad(dist1_mpc, redshift)
-            dist2 = (dist1_rad*u.rad).to(units_bank[unit2]).value
-    return dist2
+    # Conversion within angular or physical units
+    if unit1 in _ANGULAR_UNITS and unit2 in _ANGULAR_UNITS:
+        return np.multiply(dist1, _ANGULAR_UNITS[unit1]/_ANGULAR_UNITS[unit2])
+    if unit1 in _PHYSICAL_UNITS and unit2 in _PHYSICAL_UNITS:
+        return np.multiply(dist1, _PHYSICAL_UNITS[unit1]/_PHYSICAL_UNITS[unit2])
+    # Make sure that we were passed a redshift and cosmology
+    if redshift is None or cosmo is None:
+        raise TypeError(
+            "Redshift and cosmology must be specified to convert units") \
+            from u.UnitConversionError
+    # Redshift must be greater than zero for this approx
+    if not np.all(np.array(redshift, dtype=float) > 0.0):
+        raise ValueError("Redshift must be greater than 0.") from u.UnitConversionError
+    d_a = _get_da_conversion(cosmo, redshift)
+    # Convert angular to physical
+    if unit1 in _ANGULAR_UNITS:
+        dist2 = np.multiply(dist1, _ANGULAR_UNITS[unit1]/_PHYSICAL_UNITS[unit2])*d_a
+    # Otherwise physical to angular
+    else:
+        dist2 = np.multiply(dist1, _PHYSICAL_UNITS[unit1]/_ANGULAR_UNITS[unit2])/d_a
+    return dist2 if np.ndim(dist2) > 0 else float(dist2)
 
 
 def convert_shapes_to_epsilon(shape_1, shape_2, shape_definition='epsilon', kappa=0):
@@ -1,9 +1,13 @@
 """Tests for clmm_cosmo.py"""
 import json
 import numpy as np
+import pytest
+from scipy import integrate
 from numpy.testing import assert_raises, assert_allclose, assert_equal
+import clmm
 import clmm.theory as theo
-from clmm.cosmology.parent_class import CLMMCosmology
+from clmm.cosmology.parent_class import CLMMCosmology, _SIGMA_CRIT_CONSTANT
+from clmm.cosmology.cluster_toolkit import AstroPyCosmology
 from clmm.constants import Constants as const
 # ----------- Some Helper Functions for the Validation Tests ---------------
 
@@ -43,8 +47,6 @@ def test_class(modeling_data):
     assert_raises(NotImplementedError,
                   CLMMCosmology._eval_sigma_crit, None, None, None)
     assert_raises(NotImplementedError, CLMMCosmology._get_E2Omega_m, None, None)
-    assert_raises(NotImplementedError,
-                  CLMMCosmology._eval_linear_matter_powerspectrum, None, None, None)
 
 
 TOLERANCE = {'rtol': 1.0e-12}
@@ -171,12 +173,304 @@ def test_cosmo_basic(modeling_data, cosmo_init):
             cosmo.eval_linear_matter_powerspectrum(k, 0.1),
             rtol=1e-5)
 
+def test_fingerprint(modeling_data):
+    """ Unit tests for the fingerprint and interned instances of the cosmology """
+    params = {'H0': 70.0, 'Omega_dm0': 0.25, 'Omega_b0': 0.05, 'Omega_k0': 0.0}
+    cosmo = theo.Cosmology(**params)
+    fingerprint = cosmo._get_fingerprint()
+    assert_equal(fingerprint[0], type(cosmo).__name__)
+    assert_allclose(fingerprint[1:], [params[key] for key in ('H0', 'Omega_dm0', 'Omega_b0',
+                                                               'Omega_k0')], 1.0e-12)
+    assert hash(fingerprint) == hash(theo.Cosmology(**params)._get_fingerprint())
+    assert fingerprint != theo.Cosmology(**{**params, 'H0': 71.0})._get_fingerprint()
+    assert_equal(cosmo.get_desc(),
+                 f"{type(cosmo).__name__}(H0={cosmo['H0']}, Omega_dm0={cosmo['Omega_dm0']}, "
+                 f"Omega_b0={cosmo['Omega_b0']}, Omega_k0={cosmo['Omega_k0']})")
+    # Interned instances
+    cosmo1 = theo.Cosmology.interned(**params)
+    assert theo.Cosmology.interned(**params) is cosmo1
+    assert theo.Cosmology.interned(**params, validate_input=False) is not cosmo1
+    assert theo.Cosmology.interned(**{**params, 'H0': 71.0}) is not cosmo1
+    assert cosmo1 is not cosmo and cosmo1.get_desc() == cosmo.get_desc()
+    # Version, updated when the parameters change
+    version = cosmo._get_version()
+    cache = cosmo._get_cache()
+    cache['test'] = 1.
+    assert cosmo._get_version() == version and 'test' in cosmo._get_cache()
+    cosmo.set_be_cosmo(**{**params, 'H0': 71.0})
+    assert cosmo._get_version() > version and 'test' not in cosmo._get_cache()
+    assert_allclose(cosmo._get_fingerprint()[1], 71.0, 1.0e-12)
+    if cosmo.backend == 'nc':
+        # Parameters changed in place
+        version = cosmo1._get_version()
+        cosmo1.be_cosmo.param_set_by_name('w0', -0.9)
+        assert cosmo1._get_version() > version
+        cosmo1['H0'] = 71.0
+        assert cosmo1._get_fingerprint()[1] == 71.0
+        cosmo1.be_cosmo.param_set_by_name('H0', 72.0)
+        assert cosmo1._get_fingerprint()[1] == 72.0
+        # Parameters of the primordial power spectrum
+        cosmo1.eval_linear_matter_powerspectrum([0.1], 0.)
+        version = cosmo1._get_version()
+        assert cosmo1._get_version() == version
+        cosmo1.be_cosmo.prim.param_set_by_name('n_SA', 0.97)
+        assert cosmo1._get_version() > version
+        assert theo.Cosmology.interned(**params) is not cosmo1
+
+
+def test_cosmology_batch(modeling_data):
+    """ Unit tests for the vectorized set of cosmologies """
+    params = {'H0': [60.0, 70.0, 75.0], 'Omega_dm0': [0.2, 0.25, 0.3], 'Omega_b0': 0.045,
+              'Omega_k0': [0.0, 0.05, 0.0]}
+    batch = clmm.CosmologyBatch(**params)
+    assert_equal(len(batch), 3)
+    assert_allclose(batch['h'], [0.6, 0.7, 0.75], 1.0e-12)
+    assert_allclose(batch['Omega_b0'], [0.045]*3, 1.0e-12)
+    assert_raises(TypeError, batch.__getitem__, 0)
+    assert_raises(ValueError, batch.__getitem__, 'not_a_param')
+    assert_raises(TypeError, clmm.CosmologyBatch, H0=np.full((2, 2), 70.0))
+    assert_raises(ValueError, batch.eval_da, -1.0)
+    z_vals = np.linspace(0.01, 3.0, 7)
+    da_vals = batch.eval_da(z_vals)
+    da_z1z2_vals = batch.eval_da_z1z2(0.2, z_vals[z_vals > 0.2])
+    sigma_c_vals = batch.eval_sigma_crit(0.3, z_vals)
+    rho_m_vals = batch.get_rho_m(z_vals)
+    assert_equal(da_vals.shape, (3, 7))
+    assert_equal(batch.eval_sigma_crit(0.3, 1.0).shape, (3,))
+    assert_equal(batch.eval_sigma_crit(np.full(7, 0.3), z_vals), sigma_c_vals)
+    assert np.all(np.isinf(sigma_c_vals[:, z_vals <= 0.3]))
+    # the back-end cosmologies are only created when needed
+    assert all(cosmo is None for cosmo in batch._cosmologies)
+    # the background matches the one of CCL, the other back-ends have different neutrinos
+    reltol = 1.0e-6 if modeling_data['nick'] == 'ccl' else 5.0e-5
+    for i in range(len(batch)):
+        cosmo = theo.Cosmology(**{key: np.atleast_1d(value)[i % np.size(value)]
+                                  for key, value in params.items()})
+        assert_allclose(da_vals[i], cosmo.eval_da(z_vals), reltol)
+        assert_allclose(da_z1z2_vals[i], cosmo.eval_da_z1z2(0.2, z_vals[z_vals > 0.2]), reltol)
+        assert_allclose(sigma_c_vals[i, z_vals > 0.3],
+                        cosmo.eval_sigma_crit(0.3, z_vals[z_vals > 0.3]), reltol)
+        if cosmo.backend == 'ccl':
+            assert_allclose(rho_m_vals[i], cosmo.get_rho_m(z_vals), reltol)
+            assert_allclose(batch['Omega_m0'][i], cosmo['Omega_m0'], reltol)
+    # back-end quantities and redshifts above the distance spline
+    cosmo = batch.get_cosmo(1)
+    assert batch.get_cosmo(-2) is cosmo and batch._cosmologies[0] is None
+    assert_raises(ValueError, batch.get_cosmo, 3)
+    assert_allclose(batch.eval_da(2000.0)[1], cosmo.eval_da(2000.0), 1.0e-12)
+    assert_allclose(batch.eval_linear_matter_powerspectrum([0.1, 1.0], 0.5)[1],
+                    cosmo.eval_linear_matter_powerspectrum([0.1, 1.0], 0.5), 1.0e-5)
+
+
+def test_lcdm_cosmology(modeling_data):
+    """ Unit tests for the cosmology without external dependencies """
+    params = {'H0': 70.0, 'Omega_dm0': 0.25, 'Omega_b0': 0.045, 'Omega_k0': 0.05}
+    cosmo = clmm.LCDMCosmology(**params)
+    assert_equal(cosmo.backend, 'lcdm')
+    for key, value in params.items():
+        assert_allclose(cosmo[key], value, **TOLERANCE)
+    assert_raises(ValueError, cosmo._get_param, 'nonexistent')
+    assert_raises(ValueError, cosmo._set_param, 'nonexistent', 0.0)
+    z_vals = np.linspace(0.01, 5.0, 9)
+    assert_allclose(cosmo.get_Omega_m(0.0), cosmo['Omega_m0'], **TOLERANCE)
+    assert_allclose(cosmo.get_E2Omega_m(0.0), cosmo['Omega_m0'], **TOLERANCE)
+    assert_allclose(cosmo.eval_da(z_vals), cosmo.eval_da_z1z2(0.0, z_vals), **TOLERANCE)
+    assert isinstance(cosmo.eval_da(1.0), float)
+    assert isinstance(cosmo.eval_sigma_crit(0.3, 1.0), float)
+    assert np.isinf(cosmo.eval_sigma_crit(0.3, 0.2))
+    # same background as the CCL cosmology
+    ref = theo.Cosmology(**params)
+    if ref.backend == 'ccl':
+        assert_allclose(cosmo['Omega_m0'], ref['Omega_m0'], 1.0e-8)
+        assert_allclose(cosmo.eval_da(z_vals), ref.eval_da(z_vals), 1.0e-6)
+        assert_allclose(cosmo.eval_da_z1z2(0.5, 2000.0), ref.eval_da_z1z2(0.5, 2000.0), 1.0e-6)
+        assert_allclose(cosmo.eval_sigma_crit(0.3, z_vals[1:]),
+                        ref.eval_sigma_crit(0.3, z_vals[1:]), 1.0e-6)
+        assert_allclose(cosmo.get_rho_m(z_vals), ref.get_rho_m(z_vals), 1.0e-8)
+        assert_allclose(cosmo.get_Omega_m(z_vals), ref.get_Omega_m(z_vals), 1.0e-8)
+        assert_allclose(cosmo.get_E2Omega_m(z_vals), ref.get_E2Omega_m(z_vals), 1.0e-5)
+    # mutable parameters
+    da_val = cosmo.eval_da(1.0)
+    version = cosmo._get_version()
+    cosmo['h'] = 0.75
+    assert cosmo._get_version() > version
+    assert_allclose(cosmo['H0'], 75.0, **TOLERANCE)
+    assert_allclose(cosmo.eval_da(1.0), da_val*70.0/75.0, 1.0e-3)
+    assert_allclose(cosmo.eval_da(1.0),
+                    clmm.LCDMCosmology(**{**params, 'H0': 75.0}).eval_da(1.0), **TOLERANCE)
+    cosmo['Omega_k0'] = 0.0
+    assert_allclose(clmm.LCDMCosmology(be_cosmo=cosmo.be_cosmo).eval_da(z_vals),
+                    cosmo.eval_da(z_vals), **TOLERANCE)
+    # distance table set by the spline settings of the parent class
+    da_vals = cosmo.eval_da(z_vals)
+    cosmo.distance_spline_npts = 500
+    assert_allclose(cosmo.eval_da(z_vals), da_vals, 1.0e-6)
+    assert ('comoving_distance', 500) in cosmo._get_cache()
+    cosmo_spline = clmm.LCDMCosmology(be_cosmo=cosmo.be_cosmo, use_distance_spline=True)
+    cosmo_spline.distance_spline_zmax = 10.
+    assert_allclose(cosmo_spline.eval_da(z_vals), da_vals, 1.0e-6)
+    assert_allclose(cosmo_spline.eval_da(20.), cosmo.eval_da(20.), 1.0e-6)
+
+
+def test_astropy_sigma_crit():
+    """ Unit tests for the critical surface density of the AstroPy cosmology """
+    z_len, z_src = 0.3, np.linspace(0.05, 5.0, 50)
+    back = z_src > z_len
+    for Omega_k0 in (0.0, 0.05):
+        cosmo = AstroPyCosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05, Omega_k0=Omega_k0)
+        # from the angular diameter distances of AstroPy
+        sigma_c = (_SIGMA_CRIT_CONSTANT*cosmo.eval_da(z_src[back])
+                   /(cosmo.eval_da(z_len)*cosmo.eval_da_z1z2(z_len, z_src[back])))
+        with pytest.warns(UserWarning):
+            sigma_c_vals = cosmo.eval_sigma_crit(z_len, z_src)
+        assert_allclose(sigma_c_vals[back], sigma_c, 1.0e-8)
+        assert np.all(np.isinf(sigma_c_vals[~back]))
+        assert ('comoving_distance', 1100., 2000) in cosmo._get_cache()
+        assert isinstance(cosmo.eval_sigma_crit(z_len, 1.0), float)
+        # the spline is rebuilt when its range changes
+        cosmo.distance_spline_zmax = 2.0
+        cosmo.eval_sigma_crit(z_len, 1.5)
+        cosmo.distance_spline_zmax = 1100.
+        assert_allclose(cosmo.eval_sigma_crit(z_len, 500.0),
+                        _SIGMA_CRIT_CONSTANT*cosmo.eval_da(500.0)
+                        /(cosmo.eval_da(z_len)*cosmo.eval_da_z1z2(z_len, 500.0)), 1.0e-8)
+        assert_allclose(cosmo.eval_sigma_crit(z_len, 2000.0),
+                        _SIGMA_CRIT_CONSTANT*cosmo.eval_da(2000.0)
+                        /(cosmo.eval_da(z_len)*cosmo.eval_da_z1z2(z_len, 2000.0)), 1.0e-8)
+
+
 def test_matter_power_spectrum(modeling_data):
     cosmo_ps, testcase, ps = load_validation_config()
     if cosmo_ps.backend in ('ccl', 'nc'):
         reltol = modeling_data['ps_reltol']
         kvals = ps['k']
         assert_allclose(cosmo_ps.eval_linear_matter_powerspectrum(kvals, testcase['z_cluster']), ps['P_of_k'], reltol)
+        # Cached spline
+        assert_allclose(cosmo_ps._eval_linear_matter_powerspectrum_cached(kvals, testcase['z_cluster']),
+                        cosmo_ps.eval_linear_matter_powerspectrum(kvals, testcase['z_cluster']), 1.0e-5)
+        assert ('linear_matter_powerspectrum', testcase['z_cluster']) in cosmo_ps._get_cache()
+        if cosmo_ps.backend == 'nc':
+            # Cache must be emptied when parameters change
+            cosmo_ps['H0'] = 70.0
+            assert len(cosmo_ps._get_cache()) == 0
+    # Built-in Eisenstein & Hu power spectrum, also used by the back-ends without one
+    kvals, z_vals = ps['k'], np.array([0.0, testcase['z_cluster'], 1.0])
+    cosmo_eh = theo.Cosmology(H0=testcase['cosmo_H0'], Omega_dm0=testcase['cosmo_Odm0'],
+                              Omega_b0=testcase['cosmo_Ob0'], use_eh_powerspectrum=True)
+    pk_eh = cosmo_eh.eval_linear_matter_powerspectrum(kvals, testcase['z_cluster'])
+    assert_allclose(pk_eh, ps['P_of_k'], 2.0e-3)
+    assert 'eisenstein_hu' in cosmo_eh._get_cache()
+    assert_allclose(cosmo_eh._eval_linear_matter_powerspectrum_cached(kvals, testcase['z_cluster']),
+                    pk_eh, **TOLERANCE)
+    assert_allclose(cosmo_eh.eval_linear_matter_powerspectrum(0.1, z_vals),
+                    [cosmo_eh.eval_linear_matter_powerspectrum(0.1, z) for z in z_vals],
+                    **TOLERANCE)
+    cosmo_lcdm = clmm.LCDMCosmology(H0=testcase['cosmo_H0'], Omega_dm0=testcase['cosmo_Odm0'],
+                                    Omega_b0=testcase['cosmo_Ob0'])
+    assert_allclose(cosmo_lcdm.eval_linear_matter_powerspectrum(kvals, testcase['z_cluster']),
+                    pk_eh, **TOLERANCE)
+    if cosmo_ps.backend == 'ccl':
+        assert_allclose(pk_eh, cosmo_ps.eval_linear_matter_powerspectrum(
+            kvals, testcase['z_cluster']), 1.0e-3)
+
+
+
+def test_beta_s_moments(modeling_data):
+    """ Unit tests for the averaged lensing efficiencies """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    z_len, z_inf = 0.3, 1000.
+
+    def beta_s(z_src):
+        """ Lensing efficiency from the critical surface density """
+        z_src = np.array(z_src)
+        res = np.zeros(z_src.shape)
+        res[z_src > z_len] = (cosmo.eval_sigma_crit(z_len, z_inf)
+                              /cosmo.eval_sigma_crit(z_len, z_src[z_src > z_len]))
+        return res
+
+    # Sample of source redshifts, including foreground sources
+    z_src = np.array([0.1, 0.5, 0.5, 0.8, 1.2, 2.0])
+    beta_s_vals = beta_s(z_src)
+    beta_s_mean, beta_s_square_mean = cosmo.eval_beta_s_moments(z_len, z_src)
+    assert_allclose(beta_s_mean, np.mean(beta_s_vals), 1.0e-10)
+    assert_allclose(beta_s_square_mean, np.mean(beta_s_vals**2), 1.0e-10)
+    # Vectorized over lens redshift and cached
+    z_lens = np.array([0.2, z_len, 0.6])
+    beta_s_means, beta_s_square_means = cosmo.eval_beta_s_moments(z_lens, z_src)
+    assert_equal(beta_s_means.shape, z_lens.shape)
+    assert_allclose(beta_s_means[1], beta_s_mean, 1.0e-10)
+    assert_allclose(beta_s_square_means[1], beta_s_square_mean, 1.0e-10)
+    assert ('beta_s_moments', (z_src.shape, z_src.tobytes()), z_inf, 0.6) in cosmo._get_cache()
+
+    # Source redshift distribution, compared to a trapezoidal integration
+    def z_distrib(z_src):
+        return z_src**2*np.exp(-(z_src/0.5)**1.5)
+    z_grid = np.linspace(z_len, 10., 5000)
+    z_grid_norm = np.linspace(0., 10., 5000)
+    norm = np.trapz(z_distrib(z_grid_norm), z_grid_norm)
+    beta_s_grid = beta_s(z_grid)
+    beta_s_mean, beta_s_square_mean = cosmo.eval_beta_s_moments(z_len, z_distrib)
+    assert_allclose(beta_s_mean, np.trapz(z_distrib(z_grid)*beta_s_grid, z_grid)/norm, 1.0e-5)
+    assert_allclose(beta_s_square_mean,
+                    np.trapz(z_distrib(z_grid)*beta_s_grid**2, z_grid)/norm, 1.0e-5)
+    # Sharply peaked distribution, compared to an adaptive integration
+    def z_peak(z_src):
+        return np.exp(-0.5*((z_src-1.)/0.02)**2)
+    def beta_s_moment(power):
+        return integrate.quad(lambda z: beta_s(np.array([z]))[0]**power*z_peak(z), z_len, 10.,
+                              points=[1.], limit=200)[0]
+    norm = integrate.quad(z_peak, 0., 10., points=[1.], limit=200)[0]
+    assert_allclose(cosmo.eval_beta_s_moments(z_len, z_peak),
+                    (beta_s_moment(1)/norm, beta_s_moment(2)/norm), 1.0e-8)
+    # Only the results of the last function are kept without key
+    cache = cosmo._get_cache()
+    n_cache = len(cache)
+    for z_mean in (0.8, 1.0, 1.2):
+        cosmo.eval_beta_s_moments([0.2, z_len], lambda z, z_mean=z_mean: np.exp(-(z-z_mean)**2))
+    assert len(cache) == n_cache
+    assert cache['beta_s_moments_last_function'][2]
+    # Explicit keys of the distributions
+    moments = cosmo.eval_beta_s_moments(z_len, lambda z: z_distrib(z), z_src_key='z_distrib')
+    assert_allclose(moments, (beta_s_mean, beta_s_square_mean), 1.0e-12)
+    assert ('beta_s_moments', ('n(z)', 'z_distrib', 10.), 1000., z_len) in cache
+    assert_equal(cosmo.eval_beta_s_moments(z_len, lambda z: 0.*z, z_src_key='z_distrib'),
+                 moments)
+    assert_raises(ValueError, cosmo.eval_beta_s_moments, -1., z_src)
+
+def test_distance_spline(modeling_data):
+    """ Unit tests for the distances computed from the comoving distance spline """
+    for Omega_k0 in (0.0, 0.1):
+        params = {'H0': 70.0, 'Omega_dm0': 0.25, 'Omega_b0': 0.05, 'Omega_k0': Omega_k0}
+        cosmo = theo.Cosmology(**params)
+        cosmo_spline = theo.Cosmology(**params, use_distance_spline=True)
+        z_vals = np.linspace(0.01, 5.0, 50)
+        z_len = np.linspace(0.05, 1.0, 50)
+        assert_allclose(cosmo_spline.eval_da(z_vals), cosmo.eval_da(z_vals), 1.0e-6)
+        assert_allclose(cosmo_spline.eval_da_z1z2(z_len, z_vals+z_len),
+                        cosmo.eval_da_z1z2(z_len, z_vals+z_len), 1.0e-6)
+        assert_allclose(cosmo_spline.eval_da_a1a2(0.5, 0.8), cosmo.eval_da_a1a2(0.5, 0.8), 1.0e-6)
+        assert_allclose(cosmo_spline.rad2mpc(0.003, 0.3), cosmo.rad2mpc(0.003, 0.3), 1.0e-6)
+        assert_allclose(cosmo_spline.mpc2rad(1.0, z_vals), cosmo.mpc2rad(1.0, z_vals), 1.0e-6)
+        assert ('distance_spline', 1100., 2000) in cosmo_spline._get_cache()
+        # Critical surface density, infinite for foreground sources
+        assert_allclose(cosmo_spline.eval_sigma_crit(0.3, z_vals[z_vals > 0.3]),
+                        cosmo.eval_sigma_crit(0.3, z_vals[z_vals > 0.3]), 1.0e-6)
+        assert_allclose(cosmo_spline.eval_sigma_crit(0.3, 1.0), cosmo.eval_sigma_crit(0.3, 1.0),
+                        1.0e-6)
+        assert_equal(cosmo_spline.eval_sigma_crit(0.3, [0.1, 0.3]), [np.inf, np.inf])
+        assert_allclose(cosmo_spline.eval_beta_s_moments(0.3, z_vals),
+                        cosmo.eval_beta_s_moments(0.3, z_vals), 1.0e-6)
+        # Redshifts beyond the spline are computed with the back-end
+        cosmo_spline.distance_spline_zmax = 3.0
+        assert_allclose(cosmo_spline.eval_da(z_vals), cosmo.eval_da(z_vals), 1.0e-12)
+        # The spline is rebuilt when its range or number of points change
+        cosmo_spline.distance_spline_zmax = 2.0
+        assert_allclose(cosmo_spline.eval_da(1.5), cosmo.eval_da(1.5), 1.0e-6)
+        cosmo_spline.distance_spline_zmax = 1100.
+        assert_allclose(cosmo_spline.eval_da([50., 500.]), cosmo.eval_da([50., 500.]), 1.0e-6)
+        cosmo_spline.distance_spline_npts = 1000
+        assert_allclose(cosmo_spline.eval_da(z_vals), cosmo.eval_da(z_vals), 1.0e-6)
+        assert ('distance_spline', 1100., 1000) in cosmo_spline._get_cache()
 
 
 def _rad2mpc_helper(dist, redshift, cosmo, do_inverse):
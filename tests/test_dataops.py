@@ -463,6 +463,24 @@ def test_make_radial_profiles():
         _test_profile_table_output(profile, bins_radians[:-1], expected_radius, bins_radians[1:],
                                    expected['tan_shear'][:-1], expected['cross_shear'][:-1], [1, 2])
         testing.assert_array_equal(binnumber, [1, 2, 2])
+        # test with sub-bin histograms
+        sigma_c = np.array([2.0e15, 1.0e15, 4.0e15])
+        profile = da.make_radial_profile(
+            [tshear, xshear, gals['z']], angsep, angsep_units, bin_units, bins=bins_radians,
+            include_empty_bins=True, sigma_c=sigma_c, n_sub_bins=2)
+        testing.assert_equal(profile['sub_weights'].shape, (2, 2, 2))
+        testing.assert_allclose(profile['sub_weights'].sum(axis=(1, 2)), [1., 1.], **TOLERANCE)
+        testing.assert_allclose(profile['sub_sigma_c_inv'][1], [1./sigma_c[2], 1./sigma_c[1]],
+                                **TOLERANCE)
+        testing.assert_allclose(profile['sub_radius'][1], [0.00325, expected_radius[1]],
+                                **TOLERANCE)
+        testing.assert_allclose(profile['sub_weights'][1], [[0., 0.], [0.5, 0.5]], **TOLERANCE)
+        testing.assert_allclose(profile['sub_radius'][0, 0], expected_radius[0], **TOLERANCE)
+        # no radius in Mpc for angular bins without cosmology
+        assert 'sub_radius_mpc' not in profile.columns
+        testing.assert_raises(TypeError, da.make_radial_profile,
+                              [tshear, xshear, gals['z']], angsep, angsep_units, bin_units,
+                              bins=bins_radians, n_sub_bins=2)
         ###################################
         ### Test with cluster object ######
         ###################################
@@ -156,6 +156,18 @@ def test_integrity_of_lensfuncs():
     cluster = clmm.GalaxyCluster(unique_id='1', ra=161.3,
                             dec=34., z=0.3, galcat=galcat_noz)
     assert_raises(TypeError, cluster.add_critical_surface_density, cosmo)
+    # Recomputed only if the cosmology changes
+    cluster = clmm.GalaxyCluster(unique_id='1', ra=161.3,
+                            dec=34., z=0.3, galcat=galcat)
+    cluster.add_critical_surface_density(cosmo)
+    sigma_c = np.array(cluster.galcat['sigma_c'])
+    cluster.galcat['sigma_c'] = 0.
+    cluster.add_critical_surface_density(
+        clmm.Cosmology(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025))
+    assert_equal(cluster.galcat['sigma_c'], 0.)
+    cosmo.set_be_cosmo(H0=70.0, Omega_dm0=0.275, Omega_b0=0.025)
+    cluster.add_critical_surface_density(cosmo)
+    assert_allclose(cluster.galcat['sigma_c'], sigma_c, **TOLERANCE)
 
 def test_integrity_of_probfuncs():
     """test integrity of prob funcs"""
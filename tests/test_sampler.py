@@ -9,3 +9,15 @@ def test_samplers():
     assert_allclose(samplers['minimize'](test_func, 0, args=[-1]), 1, 1e-3)
     assert_allclose(samplers['basinhopping'](test_func, 0, minimizer_kwargs={'args':[-1]}), 1, 1e-3)
     assert_allclose(fitters['curve_fit'](test_func, [0, 0], [1, 1], [.01, .01])[0], 1, 1e-3)
+
+
+def test_samplers_jacobian():
+    """test samplers with the jacobian of the function"""
+    test_func = lambda x, a: (x+a)**2
+    test_jac = lambda x, a: 2*(x+a)
+    assert_allclose(samplers['minimize'](test_func, 0, jac=test_jac, args=[-1]), 1, 1e-3)
+    assert_allclose(samplers['basinhopping'](test_func, 0, jac=test_jac,
+                                             minimizer_kwargs={'args':[-1]}), 1, 1e-3)
+    test_model = lambda x, a: a*x
+    assert_allclose(fitters['curve_fit'](test_model, [1, 2], [1, 2], [.01, .01],
+                                         jac=lambda x, a: [[val] for val in x])[0], 1, 1e-3)
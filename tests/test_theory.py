@@ -3,10 +3,14 @@ import json
 import numpy as np
 from numpy.testing import assert_raises, assert_allclose, assert_equal
 from astropy.cosmology import FlatLambdaCDM, LambdaCDM
+from scipy import special, integrate
+from scipy.interpolate import CubicSpline
 import clmm.theory as theo
 from clmm.constants import Constants as clc
 from clmm.galaxycluster import GalaxyCluster
 from clmm import GCData
+import clmm.dataops as da
+from clmm.support.sampler import fitters
 
 TOLERANCE = {'rtol': 1.0e-8}
 
@@ -289,6 +293,34 @@ def test_profiles(modeling_data, profile_init):
         if mod.backend == 'ct':
             assert_raises(ValueError, mod.eval_excess_surface_density,
                           1e-12, cfg['SIGMA_PARAMS']['z_cl'])
+            # The sigma grid used for the excess surface density is reused
+            grid = mod._get_sigma_grid(cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'])
+            assert mod._get_sigma_grid(cfg['SIGMA_PARAMS']['r_proj'],
+                                       cfg['SIGMA_PARAMS']['z_cl'])[1] is grid[1]
+        # Joint evaluation
+        sigma, mean_sigma, deltasigma = mod.eval_surface_densities(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'])
+        assert_allclose(sigma, cfg['numcosmo_profiles']['Sigma'], reltol)
+        assert_allclose(deltasigma, cfg['numcosmo_profiles']['DeltaSigma'], reltol)
+        assert_allclose(mean_sigma,
+                        mod.eval_mean_surface_density(cfg['SIGMA_PARAMS']['r_proj'],
+                                                      cfg['SIGMA_PARAMS']['z_cl']), reltol)
+        if mod.backend == 'ccl' and profile_init != 'nfw':
+            # Projected profiles are interpolated from a grid shared by all quantities
+            splines = mod._get_projected_grid(cfg['SIGMA_PARAMS']['r_proj'],
+                                              cfg['SIGMA_PARAMS']['z_cl'])
+            assert mod._get_projected_grid(1.0, cfg['SIGMA_PARAMS']['z_cl']) is splines
+            assert_allclose(
+                mod.eval_excess_surface_density(cfg['SIGMA_PARAMS']['r_proj'],
+                                                cfg['SIGMA_PARAMS']['z_cl']),
+                mod.eval_mean_surface_density(cfg['SIGMA_PARAMS']['r_proj'],
+                                              cfg['SIGMA_PARAMS']['z_cl'])
+                -mod.eval_surface_density(cfg['SIGMA_PARAMS']['r_proj'],
+                                          cfg['SIGMA_PARAMS']['z_cl']), 1.0e-10)
+            # Changing the mass rebuilds the grid
+            mod.set_mass(2.*cfg['SIGMA_PARAMS']['mdelta'])
+            assert mod._get_projected_grid(1.0, cfg['SIGMA_PARAMS']['z_cl']) is not splines
+            mod.set_mass(cfg['SIGMA_PARAMS']['mdelta'])
 
         # Functional interface tests
         # alpha_ein is None unless testing Einasto with the NC backend
@@ -322,6 +354,51 @@ def test_profiles(modeling_data, profile_init):
         mod = theo.Modeling()
         assert_raises(ValueError, mod.get_einasto_alpha) 
 
+def test_einasto_alpha_table(modeling_data):
+    """ Tests for the cached Einasto slope of the CCL backend """
+    if theo.be_nick != 'ccl':
+        return
+    mod = theo.Modeling(halo_profile_model='einasto')
+    mod.set_cosmo(theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05))
+    mod.set_concentration(4.)
+    r3d = np.logspace(-1, 1, 10)
+    for mdelta in (5.e9, 1.e13, 3.3e14, 2.e15):
+        mod.set_mass(mdelta)
+        rho = mod.eval_3d_density(r3d, 0.3)
+        alpha = mod.get_einasto_alpha(0.3)
+        mod.hdpm.update_parameters(alpha='cosmo')
+        a_cl = mod.cosmo.get_a_from_z(0.3)
+        assert_allclose(alpha, mod.hdpm._get_alpha(mod.cosmo.be_cosmo, mod.mdelta, a_cl, mod.mdef),
+                        1.0e-6)
+        assert_allclose(rho, mod.hdpm.real(mod.cosmo.be_cosmo, r3d/a_cl, mod.mdelta, a_cl, mod.mdef)
+                        *mod.cor_factor/a_cl**3, 1.0e-6)
+    # the table is updated with the concentration and cosmology
+    splines = mod._einasto_alpha_splines
+    mod.set_mass(1.e15)
+    mod.get_einasto_alpha(0.3)
+    assert mod._einasto_alpha_splines is splines
+    for cdelta, cosmo in ((6., mod.cosmo),
+                          (6., theo.Cosmology(H0=60.0, Omega_dm0=0.3, Omega_b0=0.05))):
+        mod.set_concentration(cdelta)
+        mod.set_cosmo(cosmo)
+        mod_ref = theo.Modeling(halo_profile_model='einasto')
+        mod_ref.set_cosmo(cosmo)
+        mod_ref.set_concentration(cdelta)
+        mod_ref.set_mass(1.e15)
+        mod_ref.hdpm.update_parameters(alpha='cosmo')
+        a_cl = mod.cosmo.get_a_from_z(0.3)
+        assert_allclose(mod.get_einasto_alpha(0.3), mod_ref.hdpm._get_alpha(
+            cosmo.be_cosmo, mod_ref.mdelta, a_cl, mod_ref.mdef), 1.0e-6)
+    assert_allclose(mod.get_einasto_alpha(np.array([0.3, 0.3])), mod.get_einasto_alpha(0.3),
+                    1.0e-10)
+    # slopes of several halos, used in the conversions of mass definitions
+    alpha = mod._get_einasto_alpha_halos([1.e14, 1.e15], [4., 6.], 0.3)
+    for i, (mdelta, cdelta) in enumerate(((1.e14, 4.), (1.e15, 6.))):
+        mod.set_mass(mdelta)
+        mod.set_concentration(cdelta)
+        assert_allclose(alpha[i], mod.get_einasto_alpha(0.3), 1.0e-6)
+
+
 def test_2halo_term(modeling_data):
 
     cfg = load_validation_config()
@@ -331,35 +408,485 @@ def test_2halo_term(modeling_data):
     mod = theo.Modeling()
     mod.set_cosmo(cosmo)
 
-    if mod.backend not in ['ccl','nc']:
-        assert_raises(NotImplementedError, mod.eval_surface_density_2h,
-                      1., cfg['SIGMA_PARAMS']['z_cl'])
-        assert_raises(NotImplementedError, mod.eval_excess_surface_density_2h,
-                      1., cfg['SIGMA_PARAMS']['z_cl'])
-    else:
-        # Just checking that it runs and returns array of the right length
-        # To be updated with proper comparison to benchmark when available
-        assert_equal(len(mod.eval_surface_density_2h(cfg['SIGMA_PARAMS']['r_proj'],
-                                                               cfg['SIGMA_PARAMS']['z_cl'])),
-                        len(cfg['SIGMA_PARAMS']['r_proj'])) 
-        assert_equal(len(mod.eval_excess_surface_density_2h(cfg['SIGMA_PARAMS']['r_proj'],
-                                                               cfg['SIGMA_PARAMS']['z_cl'])),
-                        len(cfg['SIGMA_PARAMS']['r_proj'])) 
-
-        # Checks that OO-oriented and functional interface give the same results
-        assert_allclose(
-            theo.compute_excess_surface_density_2h(
-                cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], cosmo),
-            mod.eval_excess_surface_density_2h(
-                cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
-            1.0e-10)
+    # Just checking that it runs and returns array of the right length
+    # To be updated with proper comparison to benchmark when available
+    assert_equal(len(mod.eval_surface_density_2h(cfg['SIGMA_PARAMS']['r_proj'],
+                                                           cfg['SIGMA_PARAMS']['z_cl'])),
+                    len(cfg['SIGMA_PARAMS']['r_proj'])) 
+    assert_equal(len(mod.eval_excess_surface_density_2h(cfg['SIGMA_PARAMS']['r_proj'],
+                                                           cfg['SIGMA_PARAMS']['z_cl'])),
+                    len(cfg['SIGMA_PARAMS']['r_proj'])) 
 
+    # Checks that OO-oriented and functional interface give the same results
+    assert_allclose(
+        theo.compute_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], cosmo),
+        mod.eval_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
+        1.0e-10)
+
+    assert_allclose(
+        theo.compute_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], cosmo),
+        mod.eval_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
+        1.0e-10)
+
+    # Checks that the tabulated 2-halo terms are cached and reused
+    assert ('2h_hankel_transform', 0, cfg['SIGMA_PARAMS']['z_cl'], 2048) in cosmo._get_cache()
+    assert ('2h_hankel_transform', 2, cfg['SIGMA_PARAMS']['z_cl'], 2048) in cosmo._get_cache()
+    assert_allclose(
+        mod.eval_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], halobias=2.),
+        2.*mod.eval_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
+        1.0e-10)
+    # At least 2048 wavenumbers are used in the transform
+    assert_allclose(
+        mod.eval_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], lsteps=100),
+        mod.eval_excess_surface_density_2h(
+            cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
+        1.0e-10)
+
+    # Comparison with a direct integration of the matter power spectrum of NumCosmo
+    if cosmo.backend in ('ccl', 'nc'):
+        ps = np.genfromtxt('tests/data/numcosmo/matter_power_spectrum.txt', names=True)
+        z_cl = cfg['TEST_CASE']['z_cluster']
+        r_proj = np.logspace(np.log10(0.3), 1., 8)
+        log_k = np.linspace(np.log(ps['k'][0]), np.log(ps['k'][-1]), 100000)
+        k_vals = np.exp(log_k)
+        pk_vals = np.exp(CubicSpline(np.log(ps['k']), np.log(ps['P_of_k']))(log_k))
+        for order, func in ((0, mod.eval_surface_density_2h),
+                            (2, mod.eval_excess_surface_density_2h)):
+            integral = integrate.simpson(
+                k_vals**2*pk_vals*special.jv(order, k_vals*r_proj[:, None]*(1.+z_cl)),
+                x=log_k, axis=1)
+            assert_allclose(func(r_proj, z_cl),
+                            cosmo.get_rho_m(z_cl)/(2.*np.pi*(1.+z_cl))*integral,
+                            modeling_data['ps_reltol'])
+
+def test_jacobians(modeling_data):
+    """ Tests for the derivatives with respect to the mass and concentration """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    z_cl, z_src = 0.3, 1.
+    r_proj = np.append(np.logspace(-1, 1, 10), [0.29, 0.3])
+    step = 1.0e-4
+    for profile, massdef in (('nfw', 'mean'), ('hernquist', 'critical'), ('nfw', 'virial'),
+                             ('einasto', 'mean')):
+        mod = theo.Modeling()
+        mod.set_cosmo(cosmo)
+        try:
+            mod.set_halo_density_profile(profile, massdef)
+        except ValueError:
+            continue
+        def profiles(log10_mdelta, cdelta):
+            mod.set_mass(10.**log10_mdelta)
+            mod.set_concentration(cdelta)
+            return np.array([mod.eval_surface_density(r_proj, z_cl),
+                             mod.eval_excess_surface_density(r_proj, z_cl),
+                             mod.eval_convergence(r_proj, z_cl, z_src),
+                             mod.eval_tangential_shear(r_proj, z_cl, z_src),
+                             mod.eval_reduced_tangential_shear(r_proj, z_cl, z_src)])
+        jac_ref = np.stack([(profiles(15.+step, 4.)-profiles(15.-step, 4.))/(2.*step),
+                            (profiles(15., 4.+step)-profiles(15., 4.-step))/(2.*step)], -1)
+        mod.set_mass(1.e15)
+        mod.set_concentration(4.)
+        jacs = [mod.eval_surface_density_jacobian(r_proj, z_cl),
+                mod.eval_excess_surface_density_jacobian(r_proj, z_cl),
+                mod.eval_convergence_jacobian(r_proj, z_cl, z_src),
+                mod.eval_tangential_shear_jacobian(r_proj, z_cl, z_src),
+                mod.eval_reduced_tangential_shear_jacobian(r_proj, z_cl, z_src)]
+        for jac, ref in zip(jacs, jac_ref):
+            assert_equal(jac.shape, (r_proj.size, 2))
+            assert_allclose(jac, ref, 1.0e-5)
+        # parameters are not changed
+        assert_allclose(mod.eval_surface_density(r_proj, z_cl), profiles(15., 4.)[0], 1.0e-10)
+        assert_equal(mod.eval_reduced_tangential_shear_jacobian(1., z_cl, [1., 2., 3.]).shape,
+                     (3, 2))
+
+    # fit with the jacobian
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    def model(radius, log10_mdelta, cdelta):
+        mod.set_mass(10.**log10_mdelta)
+        mod.set_concentration(cdelta)
+        return mod.eval_reduced_tangential_shear(radius, z_cl, z_src)
+    def model_jac(radius, log10_mdelta, cdelta):
+        mod.set_mass(10.**log10_mdelta)
+        mod.set_concentration(cdelta)
+        return mod.eval_reduced_tangential_shear_jacobian(radius, z_cl, z_src)
+    data = model(r_proj, 14.5, 5.)
+    popt = fitters['curve_fit'](model, r_proj, data, 1.0e-3*data, p0=[15., 4.], jac=model_jac)[0]
+    assert_allclose(popt, [14.5, 5.], 1.0e-6)
+
+
+def test_miscentering(modeling_data):
+    """ Tests for the miscentered profiles """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mod.set_concentration(4.)
+    mod.set_mass(1.e15)
+    z_cl, r_mis = 0.3, 0.3
+    r_proj = np.logspace(-1, 1, 10)
+    sigma_mis = mod.eval_miscentered_surface_density(r_proj, z_cl, r_mis)
+    dsigma_mis = mod.eval_miscentered_excess_surface_density(r_proj, z_cl, r_mis)
+    # Rayleigh offsets have a Bessel function kernel (Yang et al. 2006)
+    r_fine = np.logspace(-6, 2, 8000)
+    sigma_fine = mod.eval_surface_density(r_fine, z_cl)
+    def rayleigh_sigma(radius):
+        kernel = (r_fine**2/r_mis**2*np.exp(-(radius[:, None]-r_fine)**2/(2.*r_mis**2))
+                  *special.ive(0, radius[:, None]*r_fine/r_mis**2))
+        return np.trapz(kernel*sigma_fine, np.log(r_fine), axis=1)
+    r_ref = np.logspace(-4, 1.1, 500)
+    sigma_ref = rayleigh_sigma(r_ref)
+    mass_ref = (CubicSpline(np.log(r_ref), 2.*r_ref**2*sigma_ref).antiderivative()(np.log(r_proj))
+                +r_ref[0]**2*sigma_ref[0])
+    sigma_ref = rayleigh_sigma(r_proj)
+    assert_allclose(sigma_mis, sigma_ref, 1.0e-4)
+    assert_allclose(dsigma_mis, mass_ref/r_proj**2-sigma_ref, 5.0e-3)
+    # exponential offsets with a direct integration
+    u_vals = np.linspace(0., 30., 1501)[1:, None]
+    theta = np.linspace(0., np.pi, 201)
+    for radius in (0.2, 1.):
+        r_off = r_mis*np.sqrt((radius/r_mis)**2+u_vals**2+2.*radius/r_mis*u_vals*np.cos(theta))
+        sigma_off = mod.eval_surface_density(r_off.ravel(), z_cl).reshape(r_off.shape)
         assert_allclose(
-            theo.compute_surface_density_2h(
-                cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl'], cosmo),
-            mod.eval_surface_density_2h(
-                cfg['SIGMA_PARAMS']['r_proj'], cfg['SIGMA_PARAMS']['z_cl']),
-            1.0e-10)
+            mod.eval_miscentered_surface_density(radius, z_cl, r_mis, 'exponential'),
+            np.trapz(u_vals[:, 0]*np.exp(-u_vals[:, 0])*np.trapz(sigma_off, theta)/np.pi,
+                     u_vals[:, 0]), 1.0e-3)
+    # miscentered fraction
+    sigma_cen = mod.eval_surface_density(r_proj, z_cl)
+    assert_allclose(mod.eval_miscentered_surface_density(r_proj, z_cl, r_mis, mis_fraction=0.),
+                    sigma_cen, 1.0e-10)
+    assert_allclose(mod.eval_miscentered_surface_density(r_proj, z_cl, 0.), sigma_cen, 1.0e-10)
+    assert_allclose(mod.eval_miscentered_surface_density(r_proj, z_cl, r_mis, mis_fraction=0.2),
+                    0.8*sigma_cen+0.2*sigma_mis, 1.0e-4)
+    assert_allclose(mod.eval_miscentered_excess_surface_density(r_proj, z_cl, r_mis,
+                                                                mis_fraction=0.2),
+                    0.8*mod.eval_excess_surface_density(r_proj, z_cl)+0.2*dsigma_mis, 1.0e-4)
+    # reduced shear
+    sigma_c = mod.eval_critical_surface_density(z_cl, 1.)
+    assert_allclose(mod.eval_miscentered_reduced_tangential_shear(r_proj, z_cl, 1., r_mis),
+                    dsigma_mis/(sigma_c-sigma_mis), 1.0e-10)
+    # kernel is reused for smaller radii
+    kernel = mod._miscentering_kernels[('rayleigh', mod.radial_grid_npts_per_decade)]
+    mod.eval_miscentered_surface_density(r_proj[:5], z_cl, r_mis)
+    assert mod._miscentering_kernels[('rayleigh', mod.radial_grid_npts_per_decade)] is kernel
+    assert_raises(ValueError, mod.eval_miscentered_surface_density, r_proj, z_cl, r_mis, 'gauss')
+    assert_raises(ValueError, mod.eval_miscentered_surface_density, r_proj, z_cl, r_mis,
+                  mis_fraction=2.)
+
+
+def test_composite_modeling(modeling_data):
+    """ Tests for the composite halo model """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mod.set_concentration(4.)
+    mod.set_mass(1.e15)
+    z_cl, z_src = 0.3, 1.
+    r_proj = np.logspace(-1, 1, 10)
+    assert_raises(ValueError, theo.CompositeModeling, mod, ['1h', '3h'])
+    assert_raises(ValueError, theo.CompositeModeling, mod, ['miscentering'])
+    assert_raises(ValueError, theo.CompositeModeling, mod, ['1h'], 'gauss')
+    components = ['1h', 'miscentering', '2h']
+    comp = theo.CompositeModeling(mod, components)
+    comp.set_params(halobias=2., r_mis=0.2, mis_fraction=0.3)
+    assert_raises(ValueError, comp.set_params, mass=1.e14)
+    assert_raises(ValueError, comp.set_params, mis_fraction=1.5)
+    assert_raises(ValueError, comp.eval_profiles, r_proj, z_cl, which='shear')
+    assert_raises(ValueError, comp.eval_profiles, r_proj, z_cl, which='tangential_shear')
+
+    # components
+    profiles = comp.eval_profiles(r_proj, z_cl)
+    assert_equal(list(profiles), components+['total'])
+    assert_allclose(profiles['1h'], 0.7*mod.eval_excess_surface_density(r_proj, z_cl), 1.0e-4)
+    assert_allclose(profiles['miscentering'], mod.eval_miscentered_excess_surface_density(
+        r_proj, z_cl, 0.2, mis_fraction=1.)*0.3, 1.0e-4)
+    if '2h' in components:
+        assert_allclose(profiles['2h'], mod.eval_excess_surface_density_2h(
+            r_proj, z_cl, halobias=2.), 1.0e-10)
+    assert_allclose(profiles['total'], sum(profiles[name] for name in components), 1.0e-10)
+    sigma = comp.eval_profiles(r_proj, z_cl, which='surface_density')
+    sigma_c = mod.eval_critical_surface_density(z_cl, z_src)
+    for which, ref in (('convergence', sigma['total']/sigma_c),
+                       ('tangential_shear', profiles['total']/sigma_c),
+                       ('reduced_tangential_shear',
+                        profiles['total']/(sigma_c-sigma['total']))):
+        assert_allclose(comp.eval_profiles(r_proj, z_cl, z_src, which)['total'], ref, 1.0e-10)
+    # without miscentering
+    comp.set_params(mis_fraction=0.)
+    profiles = comp.eval_profiles(r_proj, z_cl)
+    assert_allclose(profiles['1h'], mod.eval_excess_surface_density(r_proj, z_cl), 1.0e-10)
+    assert_equal(profiles['miscentering'], np.zeros(r_proj.size))
+
+    # model function for fitters
+    comp.set_params(mis_fraction=0.3)
+    model = comp.get_model_function(z_cl, ['log10_mdelta', 'cdelta'], z_src)
+    assert_raises(ValueError, comp.get_model_function, z_cl, ['mass'])
+    data = model(r_proj, 14.5, 5.)
+    assert_allclose(comp.eval_profiles(r_proj, z_cl, z_src, 'reduced_tangential_shear')['total'],
+                    data, 1.0e-10)
+    comp.set_params(log10_mdelta=15., cdelta=4.)
+    popt = fitters['curve_fit'](model, r_proj, data, 1.0e-3*data, p0=[15., 4.])[0]
+    assert_allclose(popt, [14.5, 5.], 1.0e-4)
+
+
+def test_state_tracking(modeling_data):
+    """ Tests for the tracking of the parameters between evaluations """
+    mod = theo.Modeling()
+    mod.set_cosmo(theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05))
+    mod.set_concentration(4.)
+    mod.set_mass(1.e15)
+    r_proj, z_src = np.logspace(-1, 1, 10), np.linspace(0.8, 1.5, 10)
+    versions = mod._update_state(0.3)
+    assert_equal(mod._update_state(0.3), versions)
+    mod.set_mass(2.e15)
+    new_versions = mod._update_state(0.3)
+    assert_equal(np.array(new_versions)-versions, [0, 0, 1, 0, 0])
+    mod.set_concentration(5.)
+    versions, new_versions = new_versions, mod._update_state(0.5)
+    assert_equal(np.array(new_versions)-versions, [0, 0, 0, 1, 1])
+
+    # cosmology-level prefactors are reused while the cosmology is unchanged
+    sigma_c = mod._eval_critical_surface_density(0.3, z_src)
+    assert_raises(ValueError, sigma_c.__setitem__, 0, 1.)
+    mod.set_mass(1.e15)
+    assert mod._eval_critical_surface_density(0.3, z_src) is sigma_c
+    assert_allclose(sigma_c, mod.cosmo.eval_sigma_crit(0.3, z_src), 1.0e-12)
+    # only the last large input (e.g. per-galaxy redshifts) is kept, compared by value
+    z_src_gal = np.linspace(0.8, 1.5, 5000)
+    n_prefactors = len(mod._prefactors)
+    sigma_c_gal = mod._eval_critical_surface_density(0.3, z_src_gal)
+    assert mod._eval_critical_surface_density(0.3, z_src_gal.copy()) is sigma_c_gal
+    z_src_gal[0] = 0.9
+    assert mod._eval_critical_surface_density(0.3, z_src_gal) is not sigma_c_gal
+    assert_allclose(mod._eval_critical_surface_density(0.3, z_src_gal),
+                    mod.cosmo.eval_sigma_crit(0.3, z_src_gal), 1.0e-12)
+    mod._eval_critical_surface_density(0.3, z_src_gal[::-1])
+    assert len(mod._prefactors) == n_prefactors+1
+
+    # results are updated when any parameter changes
+    gt_vals = mod.eval_reduced_tangential_shear(r_proj, 0.3, z_src)
+    mod_ref = theo.Modeling()
+    for cosmo in (theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05),
+                  theo.Cosmology(H0=60.0, Omega_dm0=0.3, Omega_b0=0.05)):
+        mod.set_cosmo(cosmo)
+        mod_ref.set_cosmo(cosmo)
+        for mdelta, cdelta, z_cl in ((1.e15, 4., 0.3), (2.e15, 4., 0.3), (2.e15, 5., 0.3),
+                                     (2.e15, 5., 0.4)):
+            mod.set_mass(mdelta)
+            mod.set_concentration(cdelta)
+            mod_ref.set_mass(mdelta)
+            mod_ref.set_concentration(cdelta)
+            assert_allclose(mod.eval_excess_surface_density(r_proj, z_cl),
+                            mod_ref.eval_excess_surface_density(r_proj, z_cl), 1.0e-10)
+            assert_allclose(mod.eval_reduced_tangential_shear(r_proj, z_cl, z_src),
+                            mod_ref.eval_reduced_tangential_shear(r_proj, z_cl, z_src), 1.0e-10)
+    mod.set_cosmo(theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05))
+    mod.set_mass(1.e15)
+    mod.set_concentration(5.)
+    assert_allclose(mod.eval_reduced_tangential_shear(r_proj, 0.3, z_src), gt_vals, 1.0e-10)
+
+
+def test_mass_concentration_conversion(modeling_data):
+    """ Tests for the conversion of masses and concentrations between mass definitions """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mdelta, cdelta = np.array([1.e13, 3.e14, 2.e15]), np.array([7., 4., 2.5])
+    z_cl, alpha = np.array([0.2, 0.5, 1.2]), np.array([0.15, 0.2, 0.3])
+    densities = {
+        'nfw': lambda x: 1./(x*(1.+x)**2),
+        'einasto': lambda x, a: np.exp(-2./a*(x**a-1.)),
+        'hernquist': lambda x: 1./(x*(1.+x)**3)}
+    for profile in mod.hdpm_dict:
+        for massdef, massdef2 in ((massdef, massdef2) for massdef in mod.mdef_dict
+                                  for massdef2 in mod.mdef_dict):
+            mod.set_halo_density_profile(profile, massdef, 200)
+            alpha_vals = alpha if profile == 'einasto' else None
+            mdelta2, cdelta2 = mod.convert_mass_concentration(
+                z_cl, massdef2, 500, mdelta=mdelta, cdelta=cdelta, alpha=alpha_vals)
+            # same mass and density in the scale radius, and mean density of the new definition
+            for i in range(3):
+                args = (alpha[i],) if profile == 'einasto' else ()
+                mass = [integrate.quad(lambda x: x**2*densities[profile](x, *args), 0, conc)[0]
+                        for conc in (cdelta[i], cdelta2[i])]
+                assert_allclose(mdelta2[i]/mdelta[i], mass[1]/mass[0], 1.0e-8)
+                assert_allclose(
+                    mass[1]/cdelta2[i]**3/(mass[0]/cdelta[i]**3),
+                    mod._get_overdensity_density(massdef2, 500, z_cl[i])
+                    /mod._get_overdensity_density(massdef, 200, z_cl[i]), 1.0e-8)
+            # conversion back, and functional interface
+            mod.set_halo_density_profile(profile, massdef2, 500)
+            assert_allclose(mod.convert_mass_concentration(
+                z_cl, massdef, 200, mdelta=mdelta2, cdelta=cdelta2, alpha=alpha_vals),
+                            (mdelta, cdelta), 1.0e-10)
+            assert_allclose(theo.convert_mass_concentration(
+                mdelta, cdelta, z_cl, cosmo, massdef2, 500, delta_mdef=200,
+                halo_profile_model=profile, massdef=massdef, alpha_ein=alpha_vals),
+                            (mdelta2, cdelta2), 1.0e-12)
+    # scalar inputs and current mass and concentration
+    mod.set_halo_density_profile(list(mod.hdpm_dict)[-1], 'mean', 200)
+    mod.set_mass(1.e14)
+    mod.set_concentration(5.)
+    alpha_vals = (mod.get_einasto_alpha(0.4) if mod.halo_profile_model == 'einasto'
+                  else None)
+    mdelta2, cdelta2 = mod.convert_mass_concentration(0.4, 'mean', 500)
+    assert isinstance(mdelta2, float) and isinstance(cdelta2, float)
+    assert_allclose(
+        (mdelta2, cdelta2),
+        [vals[0] for vals in mod.convert_mass_concentration(
+            [0.4], 'mean', 500, mdelta=[1.e14], cdelta=[5.], alpha=alpha_vals)], 1.0e-12)
+    assert_allclose(mod.convert_mass_concentration(0.4), (1.e14, 5.), 1.0e-12)
+    assert_raises(ValueError, mod.convert_mass_concentration, 0.4, 'unknown', 500)
+    assert_raises(ValueError, mod.convert_mass_concentration, 0.4, 'mean', 500, -1.e14)
+
+
+def test_concentration_relations(modeling_data):
+    """ Tests for the concentration-mass relations """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mdelta = np.array([1.e13, 3.e14, 2.e15])
+    duffy08 = {'critical': (5.71, -0.084, -0.47), 'mean': (10.14, -0.081, -1.01),
+               'virial': (7.85, -0.081, -0.71)}
+    # values of CCL (Eisenstein & Hu power spectrum)
+    ref = {('bhattacharya13', 'critical', 0.3): [4.94944444, 3.91186572, 3.30874069],
+           ('bhattacharya13', 'mean', 0.3): [6.97403189, 5.73887417, 4.99541978],
+           ('bhattacharya13', 'virial', 0.3): [6.20367987, 5.10495775, 4.44362538],
+           ('bhattacharya13', 'critical', 1.0): [3.66629784, 2.89771205, 2.45094757],
+           ('bhattacharya13', 'mean', 1.0): [4.29451906, 3.53392483, 3.07611519],
+           ('bhattacharya13', 'virial', 1.0): [4.15511061, 3.41920675, 2.9762585],
+           ('diemer15', 'critical', 0.3): [5.31162957, 3.79983123, 3.90634445],
+           ('diemer15', 'critical', 1.0): [4.03813426, 3.68013053, 5.08645383]}
+    for massdef in mod.mdef_dict:
+        mod.set_halo_density_profile(massdef=massdef, delta_mdef=200)
+        for z_cl in (0.3, 1.0):
+            amp, mass_slope, z_slope = duffy08[massdef]
+            assert_allclose(mod.eval_concentration(mdelta, z_cl, 'Duffy08'),
+                            amp*(mdelta*0.7/2.e12)**mass_slope*(1.+z_cl)**z_slope, 1.0e-10)
+            for (relation, massdef_ref, z_ref), values in ref.items():
+                if (massdef_ref, z_ref) == (massdef, z_cl):
+                    assert_allclose(mod.eval_concentration(mdelta, z_cl, relation), values,
+                                    5.0e-3)
+    # vectorized in mass and redshift, including masses outside of the tables
+    mod.set_halo_density_profile(massdef='mean', delta_mdef=200)
+    mdelta_grid, z_grid = np.logspace(9, 17, 7), np.linspace(0.1, 1.3, 7)
+    assert_allclose(mod.eval_concentration(mdelta_grid, z_grid, 'bhattacharya13'),
+                    [mod.eval_concentration(m, z, 'bhattacharya13')
+                     for m, z in zip(mdelta_grid, z_grid)], 1.0e-12)
+    assert ('concentration', 'bhattacharya13', '200m', 0.3) in mod._prefactors
+    # concentration of the evaluations set from the mass and redshift
+    r_proj = np.logspace(-1, 1, 10)
+    mod.set_concentration('duffy08')
+    mod_ref = theo.Modeling()
+    mod_ref.set_cosmo(cosmo)
+    for mass, z_cl in ((1.e14, 0.3), (1.e15, 0.3), (1.e15, 0.5)):
+        mod.set_mass(mass)
+        mod_ref.set_mass(mass)
+        mod_ref.set_concentration(mod.eval_concentration(mass, z_cl))
+        assert_allclose(mod.eval_excess_surface_density(r_proj, z_cl),
+                        mod_ref.eval_excess_surface_density(r_proj, z_cl), 1.0e-10)
+        assert_allclose(mod.eval_tangential_shear(r_proj, z_cl, 2.),
+                        mod_ref.eval_tangential_shear(r_proj, z_cl, 2.), 1.0e-10)
+    assert_allclose(theo.compute_excess_surface_density(
+        r_proj, 1.e15, 'duffy08', 0.5, cosmo), mod_ref.eval_excess_surface_density(r_proj, 0.5),
+                    1.0e-10)
+    assert_allclose(mod.convert_mass_concentration([0.3, 0.5], mdelta=[1.e15, 1.e15])[1],
+                    mod.eval_concentration(1.e15, [0.3, 0.5]), 1.0e-10)
+    mod.set_concentration(4.)
+    assert mod.cdelta_relation is None
+    assert_raises(ValueError, mod.eval_concentration, 1.e15, 0.5)
+    assert_raises(ValueError, mod.set_concentration, 'unknown')
+    assert_raises(ValueError, mod.set_concentration, 'diemer15')
+    mod.set_concentration('duffy08')
+    assert_raises(ValueError, mod.eval_3d_density, r_proj, [0.3, 0.5])
+
+
+def test_profile_emulator(modeling_data, tmp_path):
+    """ Tests for the emulator of the profiles """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mod.set_concentration(4.)
+    mod.set_mass(1.e15)
+    assert_raises(ValueError, theo.ProfileEmulator, mod, (15., 14.), build=False)
+    assert_raises(ValueError, theo.ProfileEmulator, mod, n_nodes=(9, 9, 5), build=False)
+    emulator = theo.ProfileEmulator(mod, log10_mdelta_range=(14., 15.), cdelta_range=(3., 6.),
+                                    z_cl_range=(0.2, 0.4), r_proj_range=(0.3, 3.), tol=1.0e-4)
+    assert max(emulator.validation_error.values()) < 1.0e-4
+    # parameters are not changed
+    assert_allclose(mod._get_mass(), 1.e15, 1.0e-10)
+    assert_allclose(mod._get_concentration(), 4., 1.0e-10)
+
+    rng = np.random.default_rng(1)
+    log10_mdelta, cdelta, z_cl = rng.uniform(14., 15., 5), rng.uniform(3., 6., 5), 0.3
+    r_proj = np.logspace(np.log10(0.3), np.log10(3.), 7)
+    sigma = emulator.eval_surface_density(r_proj, log10_mdelta, cdelta, z_cl)
+    delta_sigma = emulator.eval_excess_surface_density(r_proj, log10_mdelta, cdelta, z_cl)
+    g_t = emulator.eval_reduced_tangential_shear(r_proj, log10_mdelta, cdelta, z_cl, 1.)
+    assert_equal(sigma.shape, (5, 7))
+    for i in range(5):
+        mod.set_mass(10.**log10_mdelta[i])
+        mod.set_concentration(cdelta[i])
+        assert_allclose(sigma[i], mod.eval_surface_density(r_proj, z_cl), 1.0e-4)
+        assert_allclose(delta_sigma[i], mod.eval_excess_surface_density(r_proj, z_cl), 1.0e-4)
+        assert_allclose(g_t[i], mod.eval_reduced_tangential_shear(r_proj, z_cl, 1.), 1.0e-4)
+    assert_allclose(emulator.eval_excess_surface_density(1., log10_mdelta[-1], cdelta[-1], z_cl),
+                    mod.eval_excess_surface_density(1., z_cl), 1.0e-4)
+    # redshift of the sources of each radius, and cluster redshifts
+    z_src = np.linspace(0.8, 1.5, 7)
+    z_cls = np.array([0.25, 0.3, 0.35])
+    g_t = emulator.eval_reduced_tangential_shear(r_proj, 14.5, 4., z_cls, z_src)
+    assert_equal(g_t.shape, (3, 7))
+    mod.set_mass(10.**14.5)
+    mod.set_concentration(4.)
+    assert_allclose(g_t[2], mod.eval_reduced_tangential_shear(r_proj, 0.35, z_src), 1.0e-4)
+    # logarithm of the profiles broadcast over the parameters
+    log_sigma, log_delta_sigma = emulator._eval_log_profiles(
+        r_proj, log10_mdelta[:, None], cdelta[:3], (z_cl,))
+    assert_equal(log_sigma.shape, (5, 3, 7))
+    assert_allclose(np.exp(log_delta_sigma[:, 0]),
+                    emulator.eval_excess_surface_density(r_proj, log10_mdelta, cdelta[0], z_cl),
+                    1.0e-12)
+    assert_raises(ValueError, emulator.eval_excess_surface_density, r_proj, 16., 4., 0.3)
+    assert_raises(ValueError, emulator.eval_excess_surface_density, 10., 14.5, 4., 0.3)
+
+    # persistence
+    emulator.save(tmp_path/'emulator.npz')
+    loaded = theo.ProfileEmulator.load(tmp_path/'emulator.npz', mod)
+    assert_equal(loaded.n_nodes, emulator.n_nodes)
+    assert_equal(loaded.validation_error, emulator.validation_error)
+    assert_allclose(loaded.eval_excess_surface_density(r_proj, log10_mdelta, cdelta, z_cl),
+                    delta_sigma, 1.0e-12)
+    mod.set_cosmo(theo.Cosmology(H0=67.0, Omega_dm0=0.25, Omega_b0=0.05))
+    assert_raises(ValueError, theo.ProfileEmulator.load, tmp_path/'emulator.npz', mod)
+    mod.set_cosmo(cosmo)
+    # emulator built with another backend
+    with np.load(tmp_path/'emulator.npz') as data:
+        metadata = json.loads(str(data['metadata']))
+        metadata['backend'] = 'other'
+        np.savez(tmp_path/'emulator_other.npz', metadata=json.dumps(metadata),
+                 coefs=data['coefs'])
+    assert_raises(ValueError, theo.ProfileEmulator.load, tmp_path/'emulator_other.npz', mod)
+    mod.set_halo_density_profile('nfw', 'critical')
+    assert_raises(ValueError, theo.ProfileEmulator.load, tmp_path/'emulator.npz', mod)
+    if mod.backend == 'nc':
+        # Einasto slopes set by the user
+        mod.set_halo_density_profile('einasto', 'mean')
+        mod.set_einasto_alpha(0.25)
+        emulator = theo.ProfileEmulator(mod, log10_mdelta_range=(14., 15.),
+                                        cdelta_range=(3., 6.), z_cl_range=(0.2, 0.4),
+                                        r_proj_range=(0.3, 3.), build=False)
+        emulator.coefs = np.zeros(emulator.n_nodes)
+        emulator.save(tmp_path/'emulator_einasto.npz')
+        mod.set_einasto_alpha(0.3)
+        assert_raises(ValueError, theo.ProfileEmulator.load, tmp_path/'emulator_einasto.npz',
+                      mod)
+
 
 def test_compute_critical_surface_density(modeling_data):
     """ Validation test for critical surface density """
@@ -632,6 +1159,20 @@ def test_shear_convergence_unittests(modeling_data):
     assert_allclose(mod.eval_reduced_tangential_shear(*profile_pars, 'applegate14', beta_s_mean, beta_s_square_mean), beta_s_mean * gammat_inf/(1.0 - beta_s_square_mean / beta_s_mean * kappa_inf), 1.0e-10)
     assert_allclose(mod.eval_reduced_tangential_shear(*profile_pars, 'schrabback18', beta_s_mean, beta_s_square_mean), (1. + (beta_s_square_mean / (beta_s_mean * beta_s_mean) - 1.) * beta_s_mean * kappa_inf) * (beta_s_mean * gammat_inf / (1. - beta_s_mean * kappa_inf)), 1.0e-10)
 
+    # Source redshift models with averaged lensing efficiencies
+    z_src_sample = np.array([0.1, 0.6, 0.9, 0.9, 1.5, 2.5])
+    def z_distrib(z_src):
+        return z_src**2*np.exp(-(z_src/0.5)**1.5)
+    for z_src_model, z_src in (('known_z_src', z_src_sample), ('z_src_distribution', z_distrib)):
+        beta_s_mean, beta_s_square_mean = cosmo.eval_beta_s_moments(profile_pars[1], z_src)
+        assert_allclose(
+            mod.eval_reduced_tangential_shear(profile_pars[0], profile_pars[1], z_src,
+                                              z_src_model),
+            mod.eval_reduced_tangential_shear(*profile_pars, 'applegate14', beta_s_mean,
+                                              beta_s_square_mean), 1.0e-10)
+    assert_raises(TypeError, mod.eval_reduced_tangential_shear, profile_pars[0],
+                  profile_pars[1], z_src_sample, 'z_src_distribution')
+
     assert_allclose(gammat*sigmac_corr/(1.-(kappa*sigmac_corr)),
                     cfg['numcosmo_profiles']['gt'], 1.e2*reltol)
 
@@ -647,7 +1188,49 @@ def test_shear_convergence_unittests(modeling_data):
                     1./((1-kappa)**2-abs(gammat)**2)**(alpha-1), 1.0e-10)
     assert_allclose(1./((1-kappa*sigmac_corr)**2-abs(gammat*sigmac_corr)**2)**(alpha-1),
                     cfg['numcosmo_profiles']['mu']**(alpha-1), 1.e3*reltol)
-    
+
+    # Validate fused evaluation of the lensing observables
+    observables = mod.eval_lensing_observables(
+        *profile_pars, which=['convergence', 'tangential_shear', 'reduced_tangential_shear',
+                              'magnification', 'magnification_bias'], alpha=alpha)
+    assert_equal(list(observables), ['convergence', 'tangential_shear',
+                                     'reduced_tangential_shear', 'magnification',
+                                     'magnification_bias'])
+    assert_allclose(observables['convergence'], kappa, 1.0e-10)
+    assert_allclose(observables['tangential_shear'], gammat, 1.0e-10)
+    assert_allclose(observables['reduced_tangential_shear'], gammat/(1.0-kappa), 1.0e-10)
+    assert_allclose(observables['magnification'], 1./((1-kappa)**2-abs(gammat)**2), 1.0e-10)
+    assert_allclose(observables['magnification_bias'],
+                    mod.eval_magnification_bias(*profile_pars, alpha=alpha), 1.0e-10)
+    assert_allclose(mod.eval_lensing_observables(*profile_pars, which='excess_surface_density')
+                    ['excess_surface_density'],
+                    mod.eval_excess_surface_density(*profile_pars[:2]), 1.0e-10)
+    assert_raises(ValueError, mod.eval_lensing_observables, *profile_pars, which=['blah'])
+    assert_raises(ValueError, mod.eval_lensing_observables, *profile_pars,
+                  which=['magnification_bias'])
+
+    # Per galaxy evaluation: profiles interpolated from a radial grid
+    # and critical surface density computed once per distinct source redshift
+    rng = np.random.default_rng(1)
+    r_gal = rng.uniform(0.1, 5., 2000)
+    z_gal = rng.choice([0.25, 0.8, 1.2], 2000)
+    assert mod._get_radial_grid(r_gal) is not None
+    assert mod._get_radial_grid(r_gal[:10]) is None
+    sigma_c_gal = mod.eval_critical_surface_density(cfg['GAMMA_PARAMS']['z_cluster'], z_gal)
+    assert_allclose(sigma_c_gal[z_gal==0.8],
+                    mod.eval_critical_surface_density(cfg['GAMMA_PARAMS']['z_cluster'], 0.8),
+                    1.0e-10)
+    gammat_gal = mod.eval_tangential_shear(r_gal, cfg['GAMMA_PARAMS']['z_cluster'], z_gal)
+    kappa_gal = mod.eval_convergence(r_gal, cfg['GAMMA_PARAMS']['z_cluster'], z_gal)
+    assert_allclose(mod.eval_reduced_tangential_shear(r_gal, cfg['GAMMA_PARAMS']['z_cluster'],
+                                                      z_gal),
+                    gammat_gal/(1.0-kappa_gal), 1.0e-6)
+    # Repeated radii are computed only once
+    r_rep = np.repeat([0.5, 1., 2.], 4)
+    assert_allclose(mod.eval_lensing_observables(r_rep, cfg['GAMMA_PARAMS']['z_cluster'], 1.,
+                                                 which='convergence')['convergence'],
+                    mod.eval_convergence(r_rep, cfg['GAMMA_PARAMS']['z_cluster'], 1.), 1.0e-10)
+
     # Check that shear, reduced shear and convergence return zero and magnification returns one if
     # source is in front of the cluster
     # First, check for a array of radius and single source z
@@ -682,6 +1265,52 @@ def test_shear_convergence_unittests(modeling_data):
     assert_allclose(mod.eval_magnification_bias(radius, z_cluster, z_source, alpha),
                     np.ones(len(z_source)), 1.0e-10)
 
+def test_bin_averaged_tangential_shear(modeling_data):
+    """ Tests for the model averaged over the sources of each radial bin """
+    cosmo = theo.Cosmology(H0=70.0, Omega_dm0=0.25, Omega_b0=0.05)
+    mod = theo.Modeling()
+    mod.set_cosmo(cosmo)
+    mod.set_concentration(4.)
+    mod.set_mass(1.e15)
+    z_cl = 0.3
+    rng = np.random.default_rng(2)
+    r_gal = rng.uniform(0.3, 3., 5000)
+    z_gal = rng.uniform(0.2, 2., 5000)
+    sigma_c = mod.eval_critical_surface_density(z_cl, z_gal)
+    bins = np.linspace(0.3, 3., 5)
+    gt_gal = mod.eval_reduced_tangential_shear(r_gal, z_cl, z_gal)
+    gt_true = np.histogram(r_gal, bins, weights=gt_gal)[0]/np.histogram(r_gal, bins)[0]
+
+    profile = da.make_radial_profile([gt_gal], r_gal, 'Mpc', 'Mpc', bins=bins,
+                                     include_empty_bins=True, sigma_c=sigma_c, n_sub_bins=20)
+    sub_pars = [profile[col].data for col in ('sub_radius_mpc', 'sub_sigma_c_inv',
+                                              'sub_weights')]
+    gt_binned = mod.eval_bin_averaged_tangential_shear(*sub_pars, z_cl)
+    assert_allclose(gt_binned, gt_true, 1.0e-3)
+    assert_allclose(profile['p_0'], gt_true, 1.0e-10)
+    # model at the mean radius is biased
+    assert np.max(np.abs(mod.eval_reduced_tangential_shear(profile['radius'], z_cl, z_gal.mean())
+                         /gt_true-1)) > 1.0e-3
+    # non reduced shear
+    gammat_gal = mod.eval_tangential_shear(r_gal, z_cl, z_gal)
+    assert_allclose(mod.eval_bin_averaged_tangential_shear(*sub_pars, z_cl, reduced=False),
+                    np.histogram(r_gal, bins, weights=gammat_gal)[0]/np.histogram(r_gal, bins)[0],
+                    1.0e-3)
+    assert_raises(ValueError, mod.eval_bin_averaged_tangential_shear, sub_pars[0], sub_pars[1],
+                  sub_pars[2][:, 0], z_cl)
+    # angular bins, the radius of the sub-bins is also stored in Mpc
+    theta_gal = r_gal/cosmo.eval_da(z_cl)*180./np.pi
+    profile = da.make_radial_profile([gt_gal], theta_gal, 'degrees', 'degrees',
+                                     bins=bins/cosmo.eval_da(z_cl)*180./np.pi,
+                                     include_empty_bins=True, sigma_c=sigma_c, n_sub_bins=20,
+                                     cosmo=cosmo, z_lens=z_cl)
+    assert_allclose(profile['sub_radius_mpc'],
+                    profile['sub_radius']*np.pi/180.*cosmo.eval_da(z_cl), 1.0e-10)
+    assert_allclose(mod.eval_bin_averaged_tangential_shear(
+        *(profile[col].data for col in ('sub_radius_mpc', 'sub_sigma_c_inv', 'sub_weights')),
+        z_cl), gt_binned, 1.0e-8)
+
+
 def test_compute_magnification_bias(modeling_data):
     """ Unit tests for compute_magnification_bias_from_magnification """
     # Make some base objects
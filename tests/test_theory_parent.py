@@ -2,8 +2,9 @@
 
 import numpy as np
 from numpy.testing import assert_raises, assert_allclose
+from scipy.interpolate import CubicSpline
 import clmm.theory as theo
-from clmm.theory.parent_class import CLMModeling
+from clmm.theory.parent_class import CLMModeling, _fftlog_hankel_transform
 
 
 def test_unimplemented(modeling_data):
@@ -107,3 +108,16 @@ def test_einasto(modeling_data):
         mod.eval_convergence(0.1,0.1,0.5, verbose=True)
         mod.eval_reduced_tangential_shear(0.1,0.1,0.5, verbose=True)
         mod.eval_magnification(0.1,0.1,0.5, verbose=True)
+
+def test_fftlog_hankel_transform():
+    """ Unit tests the FFTLog Hankel transform used in the 2-halo term """
+    k_vals = np.logspace(-6, 3, 1024)
+    r_vals = np.logspace(-1, 0.3, 20)
+    # int k dk exp(-k^2/2) J_0(kr) = exp(-r^2/2)
+    r_fft, transf = _fftlog_hankel_transform(k_vals, np.exp(-0.5*k_vals**2), 0)
+    assert_allclose(CubicSpline(np.log(r_fft[::-1]), transf[::-1])(np.log(r_vals)), np.exp(-0.5*r_vals**2),
+                    rtol=1.0e-4)
+    # int k dk k^2 exp(-k^2/2) J_2(kr) = r^2 exp(-r^2/2)
+    r_fft, transf = _fftlog_hankel_transform(k_vals, k_vals**2*np.exp(-0.5*k_vals**2), 2)
+    assert_allclose(CubicSpline(np.log(r_fft[::-1]), transf[::-1])(np.log(r_vals)), r_vals**2*np.exp(-0.5*r_vals**2),
+                    rtol=1.0e-4)
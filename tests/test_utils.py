@@ -217,6 +217,21 @@ def test_convert_units():
     assert_allclose(utils.convert_units(r_kpc, 'kpc', 'arcmin', redshift, cosmo),
                     truth, **TOLERANCE)
 
+    # Test conversion with a redshift for each distance
+    r_mpc, redshifts = np.array([0.5, 1.0, 2.0, 3.0]), np.array([0.2, 0.5, 0.2, 1.0])
+    truth = np.array([cosmo.mpc2rad(r, z) for r, z in zip(r_mpc, redshifts)])
+    assert_allclose(utils.convert_units(r_mpc, 'Mpc', 'radians', redshifts, cosmo),
+                    truth, **TOLERANCE)
+    assert_allclose(utils.convert_units(truth, 'radians', 'Mpc', redshifts, cosmo),
+                    r_mpc, **TOLERANCE)
+    assert_raises(ValueError, utils.convert_units,
+                  r_mpc, 'Mpc', 'radians', np.array([0.2, 0., 0.2, 1.0]), cosmo)
+
+    # Test that the cached angular diameter distances follow the cosmology
+    cosmo.set_be_cosmo(H0=60.0, Omega_dm0=0.3-0.045, Omega_b0=0.045)
+    assert_allclose(utils.convert_units(r_kpc, 'kpc', 'arcmin', redshift, cosmo),
+                    r_kpc/(cosmo.eval_da(redshift)*1.e3)*(180./np.pi)*60., **TOLERANCE)
+
 
 def test_build_ellipticities():
     """test build ellipticities"""